@@ -0,0 +1,57 @@
+import { readFileSync } from 'node:fs';
+
+import { describe, expect, it } from 'vitest';
+
+import { computeYallopQTest } from '../src/yallop.js';
+
+// Shared with scripts/yallop.py, whose NumPy batch engine is checked against
+// the same cases, tolerances and zone rule (`python scripts/yallop.py check`,
+// scripts/tests/test_yallop.py): the zone must match unless the case's q is
+// within the q tolerance of a zone limit.
+type FixtureCase = {
+  date: string;
+  latitude: number;
+  longitude: number;
+  zone: string;
+  [field: string]: number | string;
+};
+
+const fixture: {
+  tolerances: Record<string, number>;
+  zoneLimits: Record<string, number>;
+  cases: FixtureCase[];
+} = JSON.parse(
+  readFileSync(new URL('./fixtures/yallop_q_test.json', import.meta.url), 'utf8')
+);
+
+describe('computeYallopQTest fixture', () => {
+  it('has cases', () => {
+    expect(fixture.cases.length).toBeGreaterThan(0);
+  });
+
+  it.each(fixture.cases.map((c) => [`${c.date} @ ${c.latitude},${c.longitude}`, c] as const))(
+    '%s',
+    (_label, c) => {
+      const [year, month, day] = c.date.split('-').map(Number);
+      const result = computeYallopQTest(
+        { year, month, day },
+        { latitude: c.latitude, longitude: c.longitude }
+      );
+      expect(result).not.toBeNull();
+      if (!result) return;
+
+      for (const [field, tolerance] of Object.entries(fixture.tolerances)) {
+        const actual = result[field as keyof typeof result];
+        const expected = c[field];
+        const diff = field.endsWith('UtcIso')
+          ? (Date.parse(actual as string) - Date.parse(expected as string)) / 1000
+          : (actual as number) - (expected as number);
+        expect(Math.abs(diff), field).toBeLessThanOrEqual(tolerance);
+      }
+      const nearLimit = Object.values(fixture.zoneLimits).some(
+        (limit) => Math.abs((c.q as number) - limit) <= fixture.tolerances.q
+      );
+      if (!nearLimit) expect(result.zone).toBe(c.zone);
+    }
+  );
+});
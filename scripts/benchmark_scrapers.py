@@ -0,0 +1,541 @@
+"""
+benchmark_scrapers.py
+
+Timing benchmarks for the moonsighting scraping/extraction scripts, run over
+the pages in the local page archive (see page_archive.py) or over the
+deterministic synthetic corpus (synthetic_corpus.py), which has every page
+layout and is the same on every machine.
+
+Each case times one or more variants on the same corpus (the first one is
+the baseline), checks that they all produce the same output, and prints the
+best-of-N wall time and speed-up over the baseline.  Single-variant cases
+time the current code of one function or script pass: parse_date, the three
+extraction strategies, extract_text, and the whole extract_table_from_text
+and merge_into_master main() runs (in a scratch directory; the merge case
+includes copying the master CSV it updates).
+
+With --save the run is appended to scripts/benchmark_results.json, keyed by
+commit (git describe --dirty); that file is local to the checkout.  Every
+run prints the change against the latest saved run of another commit on
+the same corpus (or --against), else against the committed baseline,
+scripts/benchmark_baseline.json: one synthetic-corpus run, so regressions
+between commits show up as numbers on any checkout.  Refresh it with
+--save-baseline (synthetic corpus only) in the commit that moves the
+numbers.  The cases' outputs are checked for equality by
+tests/test_benchmark_scrapers.py.
+
+Usage:
+  python scripts/benchmark_scrapers.py [--case parse-once] [--repeat 3]
+                                       [--corpus auto|archive|synthetic]
+                                       [--archive scripts/moonsighting_archive]
+                                       [--save] [--save-baseline] [--against COMMIT]
+"""
+
+import argparse
+import io
+import json
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+import date_tokens
+from master_store import MASTER_CSV
+from page_archive import ARCHIVE_DIR, MONTH_CODES, PageArchive
+from page_document import PageDocument, available_backends
+from sighting_records import GREG_MONTH_NUMS
+from synthetic_corpus import synthetic_pages
+import extract_table_from_text as text_table
+import extract_text_from_html as text_html
+import lunation_index
+import merge_into_master as merge
+import scrape_moonsighting_all as scrape_all
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+RESULTS_JSON = SCRIPTS_DIR / "benchmark_results.json"
+BASELINE_JSON = SCRIPTS_DIR / "benchmark_baseline.json"
+
+CASES = {}
+
+
+def bench_case(name):
+    def register(fn):
+        CASES[name] = fn
+        return fn
+    return register
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def load_pages(archive_dir: Path) -> list[tuple[int, int, str]]:
+    """(hijri_year, hijri_month, html) for every non-stub archived page."""
+    pages = []
+    with PageArchive(archive_dir) as archive:
+        years = sorted({int(k[:4]) for k in archive.pages})
+        for year in years:
+            for code, month_num, _ in scrape_all.HIJRI_MONTHS:
+                stored = archive.latest(year, code)
+                if stored is None or stored["size"] < 500:
+                    continue
+                pages.append((year, month_num, archive.get(year, code)))
+    return pages
+
+
+def load_corpus(kind: str, archive_dir: Path) -> tuple[str, list[tuple[int, int, str]]]:
+    """(corpus name, pages) for --corpus."""
+    if kind in ("auto", "archive"):
+        pages = load_pages(archive_dir)
+        if pages or kind == "archive":
+            return "archive", pages
+    return "synthetic", synthetic_pages()
+
+
+class PageMap:
+    """get(year, code) over a list of pages, for extract_text_from_html."""
+
+    def __init__(self, pages):
+        self.html = {(year, MONTH_CODES[month - 1]): html for year, month, html in pages}
+
+    def get(self, year, code):
+        return self.html.get((year, code))
+
+
+_WORK_DIR = None
+
+
+def work_dir() -> Path:
+    """Scratch directory for the script-level cases, removed at exit."""
+    global _WORK_DIR
+    if _WORK_DIR is None:
+        _WORK_DIR = tempfile.TemporaryDirectory(prefix="benchmark_scrapers_")
+    return Path(_WORK_DIR.name)
+
+
+@contextmanager
+def patched(module, **attrs):
+    """Temporarily replace module globals (e.g. a script's input path)."""
+    saved = {name: getattr(module, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+
+def parsed_docs(pages) -> list[tuple[int, int, PageDocument]]:
+    """Pages as PageDocuments with text and tables already built, so the
+    strategy cases time only the strategy."""
+    docs = []
+    for year, month, html in pages:
+        doc = PageDocument(html)
+        doc.text, doc.tables
+        docs.append((year, month, doc))
+    return docs
+
+
+def run_text_table(pages) -> Path:
+    """extract_table_from_text.main() over the text of `pages`; returns the
+    written table."""
+    text_file = work_dir() / "moonsighting_all_text.txt"
+    if not text_file.exists():
+        text_file.write_text("\n".join(text_html.build_lines(PageMap(pages))), encoding="utf-8")
+    table = work_dir() / "moonsighting_extracted_table.csv"
+    with patched(text_table, INPUT=text_file, OUTPUT=table), redirect_stdout(io.StringIO()):
+        text_table.main([])
+    return table
+
+
+def run_strategies(doc, year, month):
+    return (scrape_all.extract_official_list(doc, year, month)
+            + scrape_all.extract_official_table(doc, year, month)
+            + scrape_all.extract_announcements(doc, year, month))
+
+
+# ---------------------------------------------------------------------------
+# Reference implementations (the code as it was before an optimisation)
+# ---------------------------------------------------------------------------
+def legacy_parse_location(location_str):
+    """parse_location before LocationResolver: rebuilt everything per call."""
+    loc = location_str.strip().rstrip('.')
+    if not loc:
+        return ('', '')
+    loc = re.sub(r'^from\s+(near\s+)?', '', loc, flags=re.IGNORECASE).strip()
+    paren_country = re.search(r'\(.*?(' + '|'.join(re.escape(c) for c in text_table.KNOWN_COUNTRIES)
+                              + r')\s*\)', loc, re.IGNORECASE)
+    if paren_country:
+        country = paren_country.group(1)
+        city = re.sub(r'\s*\([^)]*\)', '', loc).strip()
+        return (city, text_table.COUNTRY_ALIASES.get(country, country))
+    for country in sorted(text_table.KNOWN_COUNTRIES, key=len, reverse=True):
+        if loc.endswith(country) or loc.lower().endswith(country.lower()):
+            city_part = loc[:len(loc) - len(country)].strip().rstrip(',').strip()
+            return (city_part, text_table.COUNTRY_ALIASES.get(country, country))
+    provinces = set(text_table.CANADIAN_PROVINCES)
+    parts = loc.split(',')
+    last_part = parts[-1].strip() if parts else loc
+    if last_part in text_table.US_STATES:
+        return (','.join(parts[:-1]).strip() if len(parts) > 1 else '', 'USA')
+    if last_part in provinces:
+        return (','.join(parts[:-1]).strip() if len(parts) > 1 else '', 'Canada')
+    words = loc.split()
+    for n in (2, 1):
+        if len(words) >= n + 1 and ' '.join(words[-n:]) in text_table.US_STATES:
+            return (' '.join(words[:-n]).rstrip(',').strip(), 'USA')
+    for city_name, country_name in dict(text_table.CITY_COUNTRY).items():
+        if loc == city_name or loc.startswith(city_name + ',') or loc.startswith(city_name + ' '):
+            return (loc, country_name)
+    return (loc, '')
+
+
+_MONTHS = r"(January|February|March|April|May|June|July|August|September|October|November|December)"
+_WEEKDAYS = r"(?:Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday)"
+LEGACY_PARSE_DATE = [  # scrape_moonsighting_all: US, UK, table cell
+    re.compile(r"(?P<month>[A-Za-z]+)\s+(?P<day>\d{1,2}),?\s+(?P<year>\d{4})\s*\(", re.I),
+    re.compile(_WEEKDAYS + r",?\s+(?P<day>\d{1,2})\s+(?P<month>[A-Za-z]+)\s+(?P<year>\d{4})", re.I),
+    re.compile(r"(?P<month>[A-Za-z]+)\s+(?P<day>\d{1,2}),?\s+(?P<year>\d{4})", re.I),
+]
+LEGACY_RE_DATE = re.compile("^" + _MONTHS + r"\s+(\d{1,2}),\s+(\d{4})\s+\(")
+LEGACY_RE_DATE_EU = re.compile("^" + _WEEKDAYS + r",?\s+(\d{1,2})\s+" + _MONTHS + r"\s+(\d{4})")
+LEGACY_RE_DECL_DATE = re.compile(r"(?:on\s+)?" + _WEEKDAYS + r",?\s+" + _MONTHS
+                                 + r"\s+(\d{1,2}),?\s+(\d{4})")
+LEGACY_RE_BLOCK_DATE = re.compile(_MONTHS + r"\s+(\d{1,2}),?\s+(\d{4})")
+
+
+def legacy_parse_date(text):
+    """scrape_moonsighting_all.parse_date before date_tokens: three searches."""
+    for pattern in LEGACY_PARSE_DATE:
+        m = pattern.search(text)
+        if m:
+            mn = m.group("month").lower()
+            if mn in scrape_all.MONTH_NAMES:
+                try:
+                    return date(int(m.group("year")), scrape_all.MONTH_NAMES[mn], int(m.group("day")))
+                except ValueError:
+                    pass
+    return None
+
+
+def legacy_text_dates(line):
+    """(header, declaration, block) dates as the text pass read them before
+    date_tokens, as (year, month, day)."""
+    header = None
+    m = LEGACY_RE_DATE.match(line)
+    if m:
+        header = (int(m.group(3)), GREG_MONTH_NUMS[m.group(1)], int(m.group(2)))
+    else:
+        m = LEGACY_RE_DATE_EU.match(line)
+        if m:
+            header = (int(m.group(3)), GREG_MONTH_NUMS[m.group(2)], int(m.group(1)))
+    found = [header]
+    for pattern in (LEGACY_RE_DECL_DATE, LEGACY_RE_BLOCK_DATE):
+        m = pattern.search(line)
+        found.append(m and (int(m.group(3)), GREG_MONTH_NUMS[m.group(1)], int(m.group(2))))
+    return tuple(found)
+
+
+# ---------------------------------------------------------------------------
+# Cases
+# ---------------------------------------------------------------------------
+@bench_case("parse-once")
+def bench_parse_once(pages, repeat):
+    """Old main(): one soup for the text and a second one for the tables."""
+
+    def before():
+        out = []
+        for year, month, html in pages:
+            doc = PageDocument(html, "html.parser")
+            doc.text = BeautifulSoup(html, "html.parser").get_text("\n", strip=True)
+            doc.tables = [
+                [[td.get_text(strip=True) for td in tr.find_all("td")]
+                 for tr in table.find_all("tr")]
+                for table in BeautifulSoup(html, "html.parser").find_all("table")
+            ]
+            out.append(run_strategies(doc, year, month))
+        return out
+
+    def after():
+        return [run_strategies(PageDocument(html, "html.parser"), year, month)
+                for year, month, html in pages]
+
+    return {"parse twice": before, "parse once": after}
+
+
+@bench_case("parser-backends")
+def bench_parser_backends(pages, repeat):
+    """Text + table extraction per installed parser backend."""
+
+    def variant(backend):
+        def run():
+            out = []
+            for _, _, html in pages:
+                doc = PageDocument(html, backend)
+                out.append((doc.text, doc.tables))
+            return out
+        return run
+
+    backends = sorted(available_backends(), key=lambda b: b != "html.parser")
+    return {b: variant(b) for b in backends}
+
+
+@bench_case("country-matcher")
+def bench_country_matcher(pages, repeat):
+    """match_country over every text line, and the KNOWN_COUNTRIES prefix test."""
+    lines = [line for _, _, html in pages for line in PageDocument(html).lines]
+
+    def linear():
+        out = []
+        for line in lines:
+            lower = line.strip().rstrip(" -–—").strip().lower()
+            cid = scrape_all.COUNTRY_MAP.get(lower)
+            if not cid:
+                for key, kid in scrape_all.COUNTRY_MAP.items():
+                    if key in lower or lower in key:
+                        cid = kid
+                        break
+            prefix = None
+            for kc in text_table.KNOWN_COUNTRIES:
+                if line == kc or line.startswith(kc):
+                    prefix = kc
+                    break
+            out.append((cid, prefix))
+        return out
+
+    def compiled():
+        return [(scrape_all.match_country(line)[0],
+                 text_table.KNOWN_COUNTRY_MATCHER.first_prefix(line))
+                for line in lines]
+
+    return {"linear scan": linear, "compiled": compiled}
+
+
+@bench_case("location-resolver")
+def bench_location_resolver(pages, repeat):
+    """parse_location over every reporter line of the corpus."""
+    locations = [line.replace('reported:', '').strip()
+                 for _, _, html in pages for line in PageDocument(html).lines
+                 if text_table.RE_REPORTER.match(line)]
+    resolver = text_table.LOCATION_RESOLVER
+
+    def legacy():
+        return [legacy_parse_location(loc) for loc in locations]
+
+    def precompiled():
+        return [resolver._resolve(loc.strip().rstrip('.')) for loc in locations]
+
+    def cached():
+        resolver.resolve.cache_clear()
+        return [text_table.parse_location(loc) for loc in locations]
+
+    return {"per-call rebuild": legacy, "precompiled": precompiled,
+            "precompiled + LRU": cached}
+
+
+@bench_case("parse-date")
+def bench_parse_date(pages, repeat):
+    """scrape_moonsighting_all.parse_date over every text line."""
+    lines = [line for _, _, doc in parsed_docs(pages) for line in doc.lines]
+    return {"current": lambda: [scrape_all.parse_date(line) for line in lines]}
+
+
+@bench_case("date-tokens")
+def bench_date_tokens(pages, repeat):
+    """Every date read of the scraper and the text pass, on every line of
+    the corpus' text dump: the regex cascades against the fused tokenizer,
+    with its memo cleared before each run and kept warm."""
+    lines = "\n".join(text_html.build_lines(PageMap(pages))).split("\n")
+    lines = [line.rstrip() for line in lines]
+
+    def ymd(tok):
+        return tok and (tok.year, tok.month, tok.day)
+
+    def fused():
+        return [(date_tokens.first_date(line), ymd(date_tokens.header_date(line)),
+                 ymd(date_tokens.weekday_date(line)), ymd(date_tokens.month_date(line)))
+                for line in lines]
+
+    def cold():
+        date_tokens.tokens.cache_clear()
+        date_tokens._leading.cache_clear()
+        return fused()
+
+    return {"regex cascades": lambda: [(legacy_parse_date(line), *legacy_text_dates(line))
+                                       for line in lines],
+            "fused tokenizer": cold, "fused + warm memo": fused}
+
+
+@bench_case("official-list")
+def bench_official_list(pages, repeat):
+    docs = parsed_docs(pages)
+    return {"current": lambda: [scrape_all.extract_official_list(doc, y, m) for y, m, doc in docs]}
+
+
+@bench_case("official-table")
+def bench_official_table(pages, repeat):
+    docs = parsed_docs(pages)
+    return {"current": lambda: [scrape_all.extract_official_table(doc, y, m) for y, m, doc in docs]}
+
+
+@bench_case("announcements")
+def bench_announcements(pages, repeat):
+    docs = parsed_docs(pages)
+    return {"current": lambda: [scrape_all.extract_announcements(doc, y, m) for y, m, doc in docs]}
+
+
+@bench_case("extract-text")
+def bench_extract_text(pages, repeat):
+    """extract_text_from_html.extract_text (parse + flatten) per page."""
+    return {"current": lambda: [text_html.extract_text(html) for _, _, html in pages]}
+
+
+@bench_case("extract-table-main")
+def bench_extract_table_main(pages, repeat):
+    """The whole extract_table_from_text.main() pass over the corpus text."""
+    return {"current": lambda: run_text_table(pages).read_text(encoding="utf-8")}
+
+
+@bench_case("merge-main")
+def bench_merge_main(pages, repeat):
+    """merge_into_master.main() of the corpus' extracted table into a copy
+    of the master CSV.  The reference CSV and the lunation index are local,
+    untracked files: the case runs without the one and with a fresh build
+    of the other, so it does the same work on every checkout."""
+    table = run_text_table(pages)
+    master = work_dir() / MASTER_CSV.name
+    index = work_dir() / "lunation_index.npy"
+    lunation_index.save_index(index)
+
+    def run():
+        shutil.copyfile(MASTER_CSV, master)
+        with patched(merge, EXTRACTED_TABLE=table, MASTER_CSV=master,
+                     REFERENCE_CSV=work_dir() / "no_reference.csv"), \
+                patched(lunation_index.LunationIndex.__init__, __defaults__=(index,)), \
+                redirect_stdout(io.StringIO()):
+            merge.main([])
+        return master.read_text(encoding="utf-8")
+
+    return {"current": run}
+
+
+# ---------------------------------------------------------------------------
+# Stored results
+# ---------------------------------------------------------------------------
+def current_commit() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=SCRIPTS_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_results(path: Path) -> list[dict]:
+    if not path.exists():
+        return []
+    return json.loads(path.read_text(encoding="utf-8"))["runs"]
+
+
+def save_results(path: Path, runs: list[dict]):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"runs": runs}, indent=1) + "\n", encoding="utf-8")
+    tmp.replace(path)
+
+
+def baseline_run(runs: list[dict], corpus: dict, commit: str, against: str = None):
+    """Latest saved run on the same corpus: of commit `against`, else of any
+    commit other than `commit`."""
+    for run in reversed(runs):
+        if run["corpus"] != corpus:
+            continue
+        if (run["commit"] == against) if against else (run["commit"] != commit):
+            return run
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the moonsighting scrapers.")
+    ap.add_argument("--case", action="append", choices=sorted(CASES),
+                    help="case(s) to run (default: all)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--corpus", choices=["auto", "archive", "synthetic"], default="auto",
+                    help="auto: the archive if it has pages, else the synthetic corpus")
+    ap.add_argument("--archive", type=Path, default=ARCHIVE_DIR)
+    ap.add_argument("--results", type=Path, default=RESULTS_JSON)
+    ap.add_argument("--save", action="store_true", help="append this run to --results")
+    ap.add_argument("--baseline", type=Path, default=BASELINE_JSON)
+    ap.add_argument("--save-baseline", action="store_true",
+                    help="make this run the committed baseline (--corpus synthetic)")
+    ap.add_argument("--against", metavar="COMMIT",
+                    help="compare with the latest saved run of this commit")
+    args = ap.parse_args(argv)
+    if args.save_baseline and args.corpus != "synthetic":
+        ap.error("--save-baseline needs --corpus synthetic, the corpus every checkout has")
+
+    corpus_name, pages = load_corpus(args.corpus, args.archive)
+    if not pages:
+        print(f"No pages in {args.archive}; run download_moonsighting_pages.py first.")
+        return 1
+    corpus = {"name": corpus_name, "pages": len(pages),
+              "bytes": sum(len(h) for _, _, h in pages)}
+    print(f"Corpus: {corpus_name}, {len(pages)} pages, {corpus['bytes'] / 1024:.0f} KB")
+
+    commit = current_commit()
+    runs = load_results(args.results)
+    base = (baseline_run(runs, corpus, commit, args.against)
+            or baseline_run(load_results(args.baseline), corpus, commit, args.against))
+    base_times = base["results"] if base else {}
+    print(f"Commit: {commit}" + (f", compared with {base['commit']} ({base['date']})" if base else ""))
+    print()
+
+    failed = False
+    results = {}
+    print(f"{'case':20s} {'variant':20s} {'time':>10s} {'speedup':>8s}  {'output':10s} "
+          f"{'vs saved':>9s}")
+    for name in args.case or sorted(CASES):
+        variants = CASES[name](pages, args.repeat)
+        baseline = t_base = None
+        for label, fn in variants.items():
+            out = fn()
+            t = best_of(fn, args.repeat)
+            if baseline is None:
+                baseline, t_base = out, t
+            same = out == baseline
+            failed |= not same
+            key = f"{name}/{label}"
+            results[key] = round(t, 6)
+            change = (f"{(t / base_times[key] - 1) * 100:+8.1f}%" if key in base_times else "")
+            print(f"{name:20s} {label:20s} {t:9.3f}s {t_base / t:7.2f}x  "
+                  f"{'identical' if same else 'DIFFERENT':10s} {change:>9s}")
+
+    run = {"commit": commit,
+           "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+           "python": sys.version.split()[0], "repeat": args.repeat,
+           "corpus": corpus, "results": results}
+    if args.save:
+        save_results(args.results, runs + [run])
+        print(f"\nSaved to {args.results}")
+    if args.save_baseline:
+        save_results(args.baseline, [run])
+        print(f"\nBaseline saved to {args.baseline}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
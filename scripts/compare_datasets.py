@@ -1,65 +1,40 @@
 #!/usr/bin/env python3
 """
-Compare the extracted table from moonsighting_all_text.txt with
+Compare the table extracted from moonsighting_all_text.txt
+(moonsighting_extracted_table.csv) with
 primary_countries_all_years_inferred.csv to find mismatches.
+
+Two engines give the same report: plain Python, and a vectorized pandas one
+(compare_frames.py) for large tables; "auto" uses pandas when installed.
+
+Usage:
+  python scripts/compare_datasets.py [--engine auto|python|pandas]
+                                     [--output results.csv|results.json]
+                                     [--summary-only]
 """
 
+import argparse
 import csv
-from collections import defaultdict
+import importlib.util
+import json
+import os
+from collections import Counter, defaultdict
 from pathlib import Path
 
-EXTRACTED = Path(r"C:\Users\saaamar\repos\hijri\scripts\moonsighting_all_text.txt")
-REFERENCE = Path(r"C:\Users\saaamar\repos\hijri\scripts\primary_countries_all_years_inferred.csv")
-
-HIJRI_MONTH_NAMES = {
-    1: 'Muharram', 2: 'Safar', 3: "Rabi al-Awwal", 4: "Rabi al-Thani",
-    5: 'Jumada al-Ula', 6: 'Jumada al-Thani', 7: 'Rajab', 8: "Sha'ban",
-    9: 'Ramadan', 10: 'Shawwal', 11: "Dhul Qi'dah", 12: 'Dhul Hijjah',
-}
-HIJRI_MONTH_NUMS = {v: k for k, v in HIJRI_MONTH_NAMES.items()}
-# Handle alternate spellings
-HIJRI_MONTH_NUMS["Rabi' al-Awwal"] = 3
-HIJRI_MONTH_NUMS["Rabi' al-Thani"] = 4
-HIJRI_MONTH_NUMS["Jumada al-Ula"] = 5
-
-# Map "North America" -> "USA" for comparison, etc.
-COUNTRY_NORMALIZE = {
-    'North America': 'USA',
-    'United Kingdom': 'UK',
-}
+from sighting_records import (COUNTRY_NORMALIZE, EXTRACTED_TABLE, HIJRI_MONTH_NAMES,
+                              HIJRI_MONTH_NUMS, REFERENCE_CSV, read_records)
 
 
 def load_extracted():
-    """Load the pipe-delimited table from moonsighting_all_text.txt"""
-    rows = []
-    with open(EXTRACTED, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith('#') or line.startswith('='):
-                break  # End of table, start of original content
-            parts = line.split('|')
-            if len(parts) == 7 and parts[0] != 'year_greg':
-                try:
-                    rows.append({
-                        'greg_year': int(parts[0]),
-                        'greg_month': int(parts[1]) if parts[1] else None,
-                        'hijri_year': int(parts[2]),
-                        'hijri_month': int(parts[3]),
-                        'country': parts[4],
-                        'city': parts[5],
-                        'status': parts[6],
-                    })
-                except (ValueError, IndexError):
-                    pass
-    return rows
+    """Load moonsighting_extracted_table.csv (see sighting_records.py);
+    rows without a Gregorian year are left out."""
+    return [r for r in read_records(EXTRACTED_TABLE) if r.year_greg is not None]
 
 
 def load_reference():
     """Load the reference CSV"""
     rows = []
-    with open(REFERENCE, 'r', encoding='utf-8') as f:
+    with open(REFERENCE_CSV, 'r', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         for row in reader:
             hijri_month_name = row['Hijri_Month'].strip()
@@ -105,42 +80,44 @@ def normalize_country(country):
     return COUNTRY_NORMALIZE.get(country, country)
 
 
-def main():
-    extracted = load_extracted()
-    reference = load_reference()
+# One row per reference row; ext_statuses/ext_cities are the distinct raw
+# statuses/cities extracted for the same (hijri_year, hijri_month, country)
+RESULT_COLUMNS = ['greg_year', 'hijri_year', 'hijri_month', 'hijri_month_name',
+                  'country', 'city', 'status', 'confidence', 'category',
+                  'ext_statuses', 'ext_cities']
 
-    print(f"Extracted rows: {len(extracted)}")
-    print(f"Reference rows: {len(reference)}")
-    print()
 
+def compare_rows(extracted, reference):
+    """Classify every reference row as 'match', 'mismatch' or 'missing'
+    against the extracted records; returns RESULT_COLUMNS dicts."""
     # Build lookup from extracted: key = (hijri_year, hijri_month, country_normalized)
     # Value = list of statuses seen for that combination
     ext_lookup = defaultdict(list)
     for r in extracted:
-        country = normalize_country(r['country'])
-        key = (r['hijri_year'], r['hijri_month'], country)
+        country = normalize_country(r.country)
+        key = (r.year_hijri, r.month_hijri, country)
         ext_lookup[key].append({
-            'status': normalize_status(r['status']),
-            'city': r['city'],
-            'greg_year': r['greg_year'],
-            'greg_month': r['greg_month'],
-            'raw_status': r['status'],
+            'status': normalize_status(r.status),
+            'city': r.city,
+            'raw_status': r.status,
         })
 
     # Now check each reference row against extracted data
-    matches = 0
-    mismatches = []
-    missing = []
-
+    results = []
     for ref in reference:
         ref_country = normalize_country(ref['country'])
         ref_status = ref['status']
         key = (ref['hijri_year'], ref['hijri_month'], ref_country)
 
         ext_entries = ext_lookup.get(key, [])
+        result = {col: ref[col] for col in RESULT_COLUMNS[:8]}
+        result['category'] = None
+        result['ext_statuses'] = list(dict.fromkeys(e['raw_status'] for e in ext_entries))
+        result['ext_cities'] = list(dict.fromkeys(e['city'] for e in ext_entries))
+        results.append(result)
 
         if not ext_entries:
-            missing.append(ref)
+            result['category'] = 'missing'
             continue
 
         # Check if any extracted entry has a matching status
@@ -148,38 +125,84 @@ def main():
         ext_raw_statuses = set(e['raw_status'] for e in ext_entries)
 
         if ref_status in ext_statuses:
-            matches += 1
+            result['category'] = 'match'
         elif ref_status == 'Declared' and ('Declared' in ext_statuses or
               any('Declar' in s for s in ext_raw_statuses) or
               'Official Declaration' in ext_raw_statuses):
-            matches += 1
+            result['category'] = 'match'
         elif ref_status == 'Calculations' and any('Calculation' in s or 'calculation' in s for s in ext_raw_statuses):
-            matches += 1
+            result['category'] = 'match'
         else:
-            mismatches.append({
-                'ref': ref,
-                'ext_statuses': ext_raw_statuses,
-                'ext_entries': ext_entries,
-            })
+            result['category'] = 'mismatch'
+    return results
+
+
+def run_python():
+    """Plain-Python engine: (results, extracted summary)."""
+    extracted = load_extracted()
+    reference = load_reference()
+    summary = {
+        'rows': len(extracted),
+        'countries': set(r.country for r in extracted),
+        'hijri_combos': set((r.year_hijri, r.month_hijri) for r in extracted),
+        'greg_years': set(r.year_greg for r in extracted),
+    }
+    return compare_rows(extracted, reference), summary
+
+
+def run_pandas():
+    """pandas engine (compare_frames.py): (results, extracted summary)."""
+    import compare_frames
+
+    ext = compare_frames.load_extracted_frame(EXTRACTED_TABLE)
+    ref = compare_frames.load_reference_frame(REFERENCE_CSV)
+    results = compare_frames.compare_frames(ext, ref)[RESULT_COLUMNS]
+    summary = {
+        'rows': len(ext),
+        'countries': set(ext['country'].unique()),
+        'hijri_combos': set(zip(ext['hijri_year'].tolist(), ext['hijri_month'].tolist())),
+        'greg_years': set(ext['greg_year'].unique().tolist()),
+    }
+    # Column-wise tolist() + zip is much faster than DataFrame.to_dict
+    records = [dict(zip(RESULT_COLUMNS, values))
+               for values in zip(*(results[c].tolist() for c in RESULT_COLUMNS))]
+    return records, summary
+
+
+ENGINES = {'python': run_python, 'pandas': run_pandas}
+
+
+def resolve_engine(name):
+    if name == 'auto':
+        return 'pandas' if importlib.util.find_spec('pandas') else 'python'
+    return name
+
+
+def print_report(results, ext_summary, details=True):
+    matches = [r for r in results if r['category'] == 'match']
+    mismatches = [r for r in results if r['category'] == 'mismatch']
+    missing = [r for r in results if r['category'] == 'missing']
+
+    print(f"Extracted rows: {ext_summary['rows']}")
+    print(f"Reference rows: {len(results)}")
+    print()
 
     print("=" * 80)
-    print(f"SUMMARY: {matches} matches, {len(mismatches)} status mismatches, {len(missing)} not found in extracted")
+    print(f"SUMMARY: {len(matches)} matches, {len(mismatches)} status mismatches, {len(missing)} not found in extracted")
     print("=" * 80)
 
-    if mismatches:
+    if mismatches and details:
         print(f"\n--- STATUS MISMATCHES ({len(mismatches)}) ---")
-        for m in mismatches:
-            ref = m['ref']
+        for ref in mismatches:
             print(f"  Hijri {ref['hijri_year']}/{ref['hijri_month_name']}, "
                   f"Country={ref['country']}, City={ref['city']}")
             print(f"    Reference status: {ref['status']} (confidence={ref['confidence']})")
-            print(f"    Extracted statuses: {m['ext_statuses']}")
+            print(f"    Extracted statuses: {set(ref['ext_statuses'])}")
             # Show cities from extracted
-            ext_cities = set(e['city'] for e in m['ext_entries'])
-            print(f"    Extracted cities: {ext_cities}")
+            print(f"    Extracted cities: {set(ref['ext_cities'])}")
             print()
 
-    if missing:
+    if missing and details:
         print(f"\n--- NOT FOUND IN EXTRACTED ({len(missing)}) ---")
         for ref in missing:
             print(f"  Hijri {ref['hijri_year']}/{ref['hijri_month_name']}, "
@@ -188,15 +211,13 @@ def main():
 
     # Also check: reference has "North America" - see if extracted has USA entries
     print("\n--- COUNTRY MAPPING NOTES ---")
-    ref_countries = set(r['country'] for r in reference)
-    ext_countries = set(r['country'] for r in extracted)
+    ref_countries = set(r['country'] for r in results)
     print(f"  Reference countries: {sorted(ref_countries)}")
-    print(f"  Extracted countries (sample): {sorted(list(ext_countries))[:20]}")
+    print(f"  Extracted countries (sample): {sorted(list(ext_summary['countries']))[:20]}")
 
     # Check for reference entries where Hijri year/month combos don't appear at all in extracted
-    ext_hijri_combos = set((r['hijri_year'], r['hijri_month']) for r in extracted)
-    ref_hijri_combos = set((r['hijri_year'], r['hijri_month']) for r in reference)
-    missing_combos = ref_hijri_combos - ext_hijri_combos
+    ref_hijri_combos = set((r['hijri_year'], r['hijri_month']) for r in results)
+    missing_combos = ref_hijri_combos - ext_summary['hijri_combos']
     if missing_combos:
         print(f"\n  Hijri year/month combos in reference but NOT in extracted ({len(missing_combos)}):")
         for yy, mm in sorted(missing_combos):
@@ -204,10 +225,55 @@ def main():
 
     # Check reference entries with specific countries not in extracted
     print(f"\n--- GREG YEAR CROSS-CHECK ---")
-    ref_years = set(r['greg_year'] for r in reference)
-    ext_years = set(r['greg_year'] for r in extracted)
+    ref_years = set(r['greg_year'] for r in results)
     print(f"  Reference greg years: {sorted(ref_years)}")
-    print(f"  Extracted greg years: {sorted(ext_years)}")
+    print(f"  Extracted greg years: {sorted(ext_summary['greg_years'])}")
+
+
+def write_results(results, ext_summary, path):
+    """Write the per-row results as CSV (list columns joined with '; ') or,
+    for a .json path, as {"summary": {...}, "rows": [...]}."""
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    if path.suffix.lower() == '.json':
+        counts = Counter(r['category'] for r in results)
+        summary = {
+            'extracted_rows': ext_summary['rows'],
+            'reference_rows': len(results),
+            'matches': counts['match'],
+            'mismatches': counts['mismatch'],
+            'missing': counts['missing'],
+            'missing_hijri_combos': sorted(
+                set((r['hijri_year'], r['hijri_month']) for r in results)
+                - ext_summary['hijri_combos']),
+        }
+        tmp.write_text(json.dumps({'summary': summary, 'rows': results},
+                                  ensure_ascii=False, indent=1), encoding='utf-8')
+    else:
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(RESULT_COLUMNS)
+            for r in results:
+                writer.writerow('; '.join(v) if isinstance(v, list) else v
+                                for v in (r[c] for c in RESULT_COLUMNS))
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compare the extracted table with the reference CSV.")
+    ap.add_argument("--engine", choices=['auto', *ENGINES], default='auto',
+                    help="comparison engine (auto: pandas if installed)")
+    ap.add_argument("--output", type=Path,
+                    help="also write per-row results to this .csv or .json file")
+    ap.add_argument("--summary-only", action="store_true",
+                    help="skip the per-row mismatch/missing listings")
+    args = ap.parse_args(argv)
+
+    results, ext_summary = ENGINES[resolve_engine(args.engine)]()
+    print_report(results, ext_summary, details=not args.summary_only)
+    if args.output:
+        write_results(results, ext_summary, args.output)
+        print(f"\nResults written to {args.output}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,135 @@
+"""
+compare_frames.py
+
+pandas engine for compare_datasets.py (optional: pip install pandas).
+
+Both tables are loaded as DataFrames with categorical country and status
+columns.  Statuses are normalized once per distinct value, the reference
+rows are joined to the extracted rows on (hijri_year, hijri_month, country),
+and every reference row is classified as match / mismatch / missing with
+column operations; there is no per-row Python loop.  The rules are the same
+as compare_datasets.compare_rows, and so is the result table (see
+compare_datasets.RESULT_COLUMNS).
+"""
+
+import numpy as np
+import pandas as pd
+
+from sighting_records import COUNTRY_NORMALIZE, HIJRI_MONTH_NUMS, TABLE_COLUMNS
+
+KEY = ['hijri_year', 'hijri_month', 'country_n']
+
+
+def _per_category(s: pd.Series, fn) -> pd.Series:
+    """Apply a vectorized Series -> Series function to the distinct values
+    of `s` only, and broadcast the result back as a categorical."""
+    cat = s.astype('category')
+    mapped = fn(pd.Series(cat.cat.categories, dtype=object)).to_numpy(dtype=object)
+    return pd.Series(mapped[cat.cat.codes], index=s.index, dtype='category')
+
+
+def normalize_statuses(s: pd.Series) -> pd.Series:
+    """Vectorized compare_datasets.normalize_status."""
+    low = s.str.lower().str.strip()
+    conditions = [
+        low == 'seen',
+        low == 'not seen',
+        low.str.contains('30 days', regex=False),
+        low.str.contains('declar', regex=False),
+        low.str.contains('official', regex=False),
+        low.str.contains('pending', regex=False),
+        low.str.contains('calculation', regex=False),
+    ]
+    choices = ['Seen', 'Not Seen', '30 days completed', 'Declared', 'Declared',
+               'Pending', 'Calculations']
+    return pd.Series(np.select(conditions, choices, default=s.to_numpy(dtype=object)),
+                     index=s.index, dtype=object)
+
+
+def normalize_countries(s: pd.Series) -> pd.Series:
+    return s.map(lambda c: COUNTRY_NORMALIZE.get(c, c))
+
+
+def load_extracted_frame(path) -> pd.DataFrame:
+    """moonsighting_extracted_table.csv with the rows load_extracted keeps:
+    integer Hijri year/month and a Gregorian year."""
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    if list(df.columns) != TABLE_COLUMNS:
+        raise ValueError(f"unexpected extracted-table header {list(df.columns)}; "
+                         f"expected {TABLE_COLUMNS}")
+    nums = {c: pd.to_numeric(df[c], errors='coerce')
+            for c in ('year_greg', 'month_greg', 'day_greg', 'year_hijri', 'month_hijri')}
+    keep = (nums['year_greg'].notna() & nums['year_hijri'].notna()
+            & nums['month_hijri'].notna())
+    for c in ('month_greg', 'day_greg'):
+        keep &= nums[c].notna() | (df[c] == '')  # read_records drops non-numeric text
+    df = df[keep]
+    return pd.DataFrame({
+        'greg_year': nums['year_greg'][keep].astype(int),
+        'hijri_year': nums['year_hijri'][keep].astype(int),
+        'hijri_month': nums['month_hijri'][keep].astype(int),
+        'country': df['country'].astype('category'),
+        'city': df['city'],
+        'status': df['status'].astype('category'),
+    }).reset_index(drop=True)
+
+
+def _strip(s: pd.Series) -> pd.Series:
+    return s.str.strip()
+
+
+def load_reference_frame(path) -> pd.DataFrame:
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    # Low-cardinality text columns: strip each distinct value once
+    text = {c: _per_category(df[c], _strip)
+            for c in ('Hijri_Month', 'Country', 'City', 'Official_Status')}
+    months = text['Hijri_Month'].map(HIJRI_MONTH_NUMS).astype(float)
+    for name in text['Hijri_Month'][months.isna()]:
+        print(f"  WARNING: Unknown hijri month name: '{name}'")
+    keep = months.notna()
+    return pd.DataFrame({
+        'greg_year': df['Gregorian_Year'][keep].astype(int),
+        'hijri_year': df['Hijri_Year'][keep].astype(int),
+        'hijri_month': months[keep].astype(int),
+        'hijri_month_name': text['Hijri_Month'][keep].astype(object),
+        'country': text['Country'][keep],
+        'city': text['City'][keep].astype(object),
+        'status': text['Official_Status'][keep],
+        'confidence': df['Confidence'][keep].astype(float),
+    }).reset_index(drop=True)
+
+
+def _distinct(s: pd.Series) -> list:
+    return list(dict.fromkeys(s))
+
+
+def compare_frames(ext: pd.DataFrame, ref: pd.DataFrame) -> pd.DataFrame:
+    """One row per reference row, in reference order, with the columns of
+    compare_datasets.RESULT_COLUMNS."""
+    ext = ext.assign(country_n=_per_category(ext['country'].astype(object), normalize_countries),
+                     status_n=_per_category(ext['status'].astype(object), normalize_statuses))
+    raw = ext['raw_status'] = ext['status'].astype(object)
+    ext['declared'] = ((ext['status_n'] == 'Declared') | raw.str.contains('Declar', regex=False)
+                       | (raw == 'Official Declaration'))
+    ext['calculated'] = (raw.str.contains('Calculation', regex=False)
+                         | raw.str.contains('calculation', regex=False))
+    ext = ext.astype({'country_n': object, 'status_n': object})
+
+    groups = ext.groupby(KEY, sort=False)
+    per_key = groups.agg(declared=('declared', 'any'), calculated=('calculated', 'any'),
+                         ext_statuses=('raw_status', _distinct), ext_cities=('city', _distinct))
+    statuses = ext[KEY + ['status_n']].drop_duplicates().assign(exact=True)
+
+    out = ref.assign(country_n=_per_category(ref['country'].astype(object), normalize_countries)
+                     .astype(object),
+                     status_n=ref['status'].astype(object))
+    out = out.merge(per_key, how='left', left_on=KEY, right_index=True)
+    out = out.merge(statuses, how='left', on=KEY + ['status_n'])
+    found = out['ext_statuses'].notna()
+    matched = (out['exact'].eq(True)
+               | ((out['status_n'] == 'Declared') & out['declared'].eq(True))
+               | ((out['status_n'] == 'Calculations') & out['calculated'].eq(True)))
+    out['category'] = np.select([~found, matched], ['missing', 'match'], default='mismatch')
+    for col in ('ext_statuses', 'ext_cities'):
+        out[col] = [v if isinstance(v, list) else [] for v in out[col]]
+    return out.drop(columns=['country_n', 'status_n', 'declared', 'calculated', 'exact'])
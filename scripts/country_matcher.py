@@ -0,0 +1,104 @@
+"""
+country_matcher.py
+
+Precompiled substring matcher over an ordered list of country names/aliases.
+
+The scrapers resolve free-text country names with a linear scan:
+
+    for key in COUNTRY_MAP:                    # dict order matters
+        if key in text or text in key:
+            return key
+
+CountryMatcher gives the same answer from one compiled regex scan plus one
+str.find, however many aliases there are.  Matching is case-sensitive:
+callers pass keys and text in the same case (the scrapers lower-case both).
+
+  m = CountryMatcher(COUNTRY_MAP)        # any iterable of keys, order kept
+  m.lookup(text)        exact key, else first key contained in / containing text
+  m.first_contained(text)   first key (in order) that occurs inside text
+  m.first_containing(text)  first key (in order) that contains text
+  m.first_prefix(text)      first key (in order) that text starts with
+"""
+
+import re
+from bisect import bisect_right
+
+
+class CountryMatcher:
+    def __init__(self, keys):
+        self.keys = list(dict.fromkeys(keys))
+        self.index = {k: i for i, k in enumerate(self.keys)}
+
+        # Longest-first alternation: at any position the regex picks the
+        # longest key that matches there.  Every other key matching at that
+        # position is a prefix of it, so precompute, per key, the earliest
+        # (in list order) key among its prefixes.
+        alternation = "|".join(re.escape(k) for k in
+                               sorted(self.keys, key=len, reverse=True) if k)
+        self._scan = re.compile(f"(?=({alternation}))") if alternation else None
+        self._prefix = re.compile(alternation) if alternation else None
+        self._best_prefix = {
+            k: min(i for i, p in enumerate(self.keys) if k.startswith(p))
+            for k in self.keys
+        }
+
+        # "text in key": search all keys joined by a separator that never
+        # occurs in text; the first hit lies in the earliest such key.
+        self._joined = "\x00".join(self.keys)
+        self._offsets = []
+        pos = 0
+        for k in self.keys:
+            self._offsets.append(pos)
+            pos += len(k) + 1
+
+    def _first_contained_index(self, text: str):
+        if self._scan is None:
+            return 0 if self.keys else None  # only the empty key exists
+        best = None
+        for m in self._scan.finditer(text):
+            i = self._best_prefix[m.group(1)]
+            if best is None or i < best:
+                best = i
+                if best == 0:
+                    break
+        if "" in self.index:
+            i = self.index[""]
+            best = i if best is None else min(best, i)
+        return best
+
+    def _first_containing_index(self, text: str):
+        if "\x00" in text:
+            return None
+        pos = self._joined.find(text)
+        if pos < 0:
+            return None
+        return bisect_right(self._offsets, pos) - 1
+
+    def first_contained(self, text: str):
+        i = self._first_contained_index(text)
+        return None if i is None else self.keys[i]
+
+    def first_containing(self, text: str):
+        i = self._first_containing_index(text)
+        return None if i is None else self.keys[i]
+
+    def first_prefix(self, text: str):
+        if self._prefix is None:
+            return self.keys[0] if self.keys else None
+        m = self._prefix.match(text)
+        if m is None:
+            return "" if "" in self.index else None
+        i = self._best_prefix[m.group(0)]
+        return self.keys[i]
+
+    def lookup(self, text: str):
+        """Exact key, else the first key k in order with k in text or text in k."""
+        if text in self.index:
+            return text
+        a = self._first_contained_index(text)
+        b = self._first_containing_index(text)
+        if a is None and b is None:
+            return None
+        if a is None or (b is not None and b < a):
+            return self.keys[b]
+        return self.keys[a]
@@ -9,12 +9,18 @@
  *
  * Only rows with a non-empty GregorianStartDate are emitted as declarations.
  * The CSV remains the single source of truth.
+ *
+ * If scripts/ephemeris_table.bin exists (python scripts/ephemeris_table.py
+ * build), declarations that start on or before the conjunction day are
+ * reported; the generated file is the same either way.
  */
 
 import { readFileSync, writeFileSync } from 'node:fs';
 import { resolve, dirname } from 'node:path';
 import { fileURLToPath } from 'node:url';
 
+import { loadEphemerisTable, tableExists } from './ephemeris-table.mjs';
+
 const __dirname = dirname(fileURLToPath(import.meta.url));
 const ROOT = resolve(__dirname, '..');
 
@@ -238,3 +244,21 @@ ts += `}\n`;
 writeFileSync(OUT_PATH, ts, 'utf-8');
 console.log(`Written ${OUT_PATH}`);
 console.log(`  ${filled.length} declarations across ${byCountry.size} country/countries`);
+
+// ---------------------------------------------------------------------------
+// Sanity check against the precomputed ephemeris table (optional)
+// ---------------------------------------------------------------------------
+if (tableExists()) {
+  const table = loadEphemerisTable();
+  const early = [];
+  for (const r of filled) {
+    const year = Number(r.HijriYear);
+    if (year < table.firstYear || year > table.lastYear || !table.countries.includes(r.Country)) continue;
+    const { conjunction } = table.lookup(r.Country, year, Number(r.HijriMonth));
+    if (r.GregorianStartDate <= conjunction.toISOString().slice(0, 10)) early.push(r);
+  }
+  console.log(`  ${early.length} declaration(s) start on or before the conjunction day`);
+  for (const r of early.slice(0, 10)) {
+    console.log(`    ${r.Country} ${r.HijriYear}-${r.HijriMonth}: ${r.GregorianStartDate}`);
+  }
+}
@@ -0,0 +1,149 @@
+"""
+date_tokens.py
+
+One compiled tokenizer for the Gregorian dates in moonsighting pages and in
+the text dump, shared by scrape_moonsighting_all.py and
+extract_table_from_text.py.
+
+The scripts used to try a cascade of overlapping patterns on every line
+(three in parse_date, four in the text pass).  DATE_TOKEN_RE recognises all
+the shapes in one left-to-right pass:
+
+    "August 22, 2009 (Saturday):"      month-day, "(" after
+    "May 27, 2017"                     month-day
+    "Friday, 20 July 2012:"            weekday, day-month
+    "on Tuesday, December 30, 2008."   weekday, month-day
+
+Every match becomes a DateToken holding the raw fields, its span and the
+typed date.  Token lists are memoised per string, because date headers
+and table date cells repeat within and across pages.  The functions below
+pick, from the tokens, what each old pattern matched, with the same case
+rules: the scraper ignores case, the text pass wants capitalised names.
+
+  tokens(text)           every DateToken in text, left to right
+  first_date(text)       scrape_moonsighting_all.parse_date
+  header_date(line)      text pass: "Month D, YYYY (..." or
+                         "Weekday, D Month YYYY" starting the line
+  weekday_date(text)     text pass: first "Weekday, Month D, YYYY"
+  month_date(text)       text pass: first "Month D, YYYY"
+The text-pass functions return the token, not a date: the fields are kept
+as written even when they do not form a valid date.
+"""
+
+import functools
+import re
+from datetime import date
+from typing import NamedTuple
+
+from sighting_records import GREG_MONTH_NUMS
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+MONTH_NUMS_LOWER = {name.lower(): num for name, num in GREG_MONTH_NUMS.items()}
+CACHE_SIZE = 16384
+# A text-dump date header starts with a capitalised month or weekday name;
+# checking the first three letters rules out most lines before any regex
+HEADER_STARTS = frozenset(name[:3] for name in (*GREG_MONTH_NUMS, *WEEKDAYS))
+
+DATE_TOKEN_RE = re.compile(
+    r'(?:(?P<weekday>' + '|'.join(WEEKDAYS) + r'),?\s+)?'
+    r'(?:(?P<dm_day>\d{1,2})\s+(?P<dm_month>[A-Za-z]+)\s+(?P<dm_year>\d{4})'
+    r'|(?P<month>[A-Za-z]+)\s+(?P<day>\d{1,2})(?P<comma>,?)\s+(?P<year>\d{4})(?P<paren>\s*\()?)',
+    re.IGNORECASE,
+)
+
+# Regex families timed per page with --trace (see tracing.py)
+TRACE_FAMILIES = {'dates': ('DATE_TOKEN_RE',)}
+
+
+class DateToken(NamedTuple):
+    start: int
+    end: int
+    weekday: str            # as written, '' if none
+    day: int
+    month_name: str         # as written; need not be a month
+    year: int
+    day_first: bool         # "20 July 2012"
+    comma: bool             # "May 27, 2017"
+    paren: str              # the "(" after month-day with the space before it, or ''
+
+    @property
+    def month(self) -> int:
+        """Month number, any case; 0 if month_name is not a month."""
+        return MONTH_NUMS_LOWER.get(self.month_name.lower(), 0)
+
+    @property
+    def capitalised(self) -> bool:
+        """Month (and weekday, if any) names spelled as in GREG_MONTH_NUMS."""
+        return self.month_name in GREG_MONTH_NUMS and (not self.weekday or self.weekday in WEEKDAYS)
+
+    @property
+    def date(self) -> date | None:
+        try:
+            return date(self.year, self.month, self.day)
+        except ValueError:
+            return None
+
+
+def _token(m: re.Match) -> DateToken:
+    if m.group('dm_day') is not None:
+        return DateToken(m.start(), m.end(), m.group('weekday') or '', int(m.group('dm_day')),
+                         m.group('dm_month'), int(m.group('dm_year')), True, False, '')
+    return DateToken(m.start(), m.end(), m.group('weekday') or '', int(m.group('day')),
+                     m.group('month'), int(m.group('year')), False, bool(m.group('comma')),
+                     m.group('paren') or '')
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def tokens(text: str) -> tuple[DateToken, ...]:
+    return tuple(_token(m) for m in DATE_TOKEN_RE.finditer(text))
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _leading(raw: str) -> DateToken:
+    return _token(DATE_TOKEN_RE.match(raw))
+
+
+def first_date(text: str) -> date | None:
+    """The date of the first "Month D, YYYY (", else of the first
+    "Weekday, D Month YYYY", else of the first "Month D, YYYY" in text.
+    As with the pattern cascade this replaces, a first match that is not a
+    valid date hands over to the next shape instead of to a later match."""
+    toks = tokens(text)
+    for shape in (lambda t: not t.day_first and t.paren,
+                  lambda t: t.day_first and t.weekday,
+                  lambda t: not t.day_first):
+        tok = next((t for t in toks if shape(t)), None)
+        if tok is not None and tok.date is not None:
+            return tok.date
+    return None
+
+
+def header_date(line: str) -> DateToken | None:
+    """The date a text-dump date header starts with: "August 30, 2011 (..."
+    or "Friday, 20 July 2012" (comma after the weekday optional)."""
+    if line[:3] not in HEADER_STARTS:
+        return None
+    # Lines are mostly unique, so only the matched header text is memoised
+    m = DATE_TOKEN_RE.match(line)
+    if m is None:
+        return None
+    tok = _leading(m.group(0))
+    if not tok.capitalised:
+        return None
+    if tok.day_first:
+        return tok if tok.weekday else None
+    if tok.weekday or not tok.comma or not tok.paren[:1].isspace():
+        return None
+    return tok
+
+
+def weekday_date(text: str) -> DateToken | None:
+    """First "Weekday, Month D, YYYY" ("... to be on Tuesday, December 30, 2008.")."""
+    return next((t for t in tokens(text)
+                 if t.weekday and not t.day_first and t.capitalised), None)
+
+
+def month_date(text: str) -> DateToken | None:
+    """First "Month D, YYYY" ("Shawwal 1, 1438 AH: Saturday, June 26, 2017")."""
+    return next((t for t in tokens(text)
+                 if not t.day_first and t.month_name in GREG_MONTH_NUMS), None)
@@ -1,17 +1,44 @@
 """
 download_moonsighting_pages.py
 
-Downloads all moonsighting.com month pages to a local folder for offline parsing.
+Downloads all moonsighting.com month pages into the local page archive
+(see page_archive.py) for offline parsing.
 Years 1430–1447, all 12 months = up to 216 pages.
 
-Output: scripts/moonsighting_html/{year}{month_code}.html
+Pages are fetched by a small pool of worker threads sharing one pooled
+requests.Session.  Politeness is enforced per host by a token bucket instead
+of a fixed sleep between requests.
+
+Every fetch is recorded in a sidecar metadata file keyed by URL (ETag,
+Last-Modified, content hash, fetch/check times).  Pages of past Hijri years
+are never revalidated once on disk; pages of recent years are revalidated
+with a conditional GET once their TTL has expired, so a nightly re-crawl
+only transfers pages that actually changed.
+
+Usage:
+  python scripts/download_moonsighting_pages.py [--jobs 4] [--rate 2.0]
+                                                [--burst 4] [--base-url URL]
+                                                [--ttl-hours 24] [--recent-years 1]
+
+Output: scripts/moonsighting_archive/pages.pack, index.json
+        scripts/moonsighting_archive/fetch_meta.json
 """
 
+import argparse
+import hashlib
+import json
+import os
+import threading
 import time
-import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
 from pathlib import Path
+from urllib.parse import urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from page_archive import ARCHIVE_DIR, PageArchive
 
 START_YEAR = 1430
 END_YEAR = 1447
@@ -20,56 +47,331 @@ MONTH_CODES = ["muh", "sfr", "rba", "rbt", "jmo", "jmt",
                "rjb", "shb", "rmd", "shw", "zqd", "zhj"]
 
 BASE_URL = "https://www.moonsighting.com/{year}{code}.html"
-OUT_DIR = Path(__file__).resolve().parent / "moonsighting_html"
+META_FILENAME = "fetch_meta.json"
+
+DEFAULT_JOBS = 4
+DEFAULT_RATE = 2.0    # requests per second, per host
+DEFAULT_BURST = 4     # requests allowed back-to-back before throttling
+DEFAULT_TTL_HOURS = 24.0
+DEFAULT_RECENT_YEARS = 1  # current Hijri year and this many before it are "recent"
+MIN_PAGE_BYTES = 500      # smaller files are stubs and always refetched
+
+
+# ---------------------------------------------------------------------------
+# Rate limiting
+# ---------------------------------------------------------------------------
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens/second, at most `burst` banked."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity,
+                                  self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """One TokenBucket per host, created on first use."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url: str):
+        host = urlsplit(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        bucket.acquire()
+
+
+# ---------------------------------------------------------------------------
+# Revalidation metadata
+# ---------------------------------------------------------------------------
+def utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def approx_hijri_year(today: date) -> int:
+    """Tabular Hijri year for a Gregorian date (good to +/- 1 day)."""
+    days = today.toordinal() - date(622, 7, 16).toordinal()
+    return (30 * days + 10646) // 10631
+
+
+class FetchMetaStore:
+    """Sidecar JSON store: URL -> {etag, lastModified, sha256, fetchedAt, checkedAt, ...}."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        if path.exists():
+            self.entries = json.loads(path.read_text(encoding="utf-8"))
+        else:
+            self.entries = {}
+
+    def get(self, url: str) -> dict:
+        with self.lock:
+            return dict(self.entries.get(url, {}))
+
+    def update(self, url: str, **fields):
+        with self.lock:
+            self.entries.setdefault(url, {}).update(fields)
+
+    def save(self):
+        tmp = self.path.with_suffix(".tmp")
+        with self.lock:
+            tmp.write_text(json.dumps(self.entries, indent=2, sort_keys=True),
+                           encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def needs_fetch(meta: dict, stored, hijri_year: int,
+                current_year: int, recent_years: int, ttl_hours: float) -> str:
+    """Decide what to do with one page: 'fetch', 'revalidate' or 'skip'.
+
+    `stored` is the archive's latest-snapshot entry for the page (or None).
+    """
+    if stored is None or stored["size"] <= MIN_PAGE_BYTES:
+        return "fetch"
+    if hijri_year < current_year - recent_years:
+        return "skip"  # past years are frozen
+    checked = meta.get("checkedAt")
+    if checked:
+        age_h = (datetime.now(timezone.utc)
+                 - datetime.fromisoformat(checked)).total_seconds() / 3600
+        if age_h < ttl_hours:
+            return "skip"
+    return "revalidate"
+
+
+# ---------------------------------------------------------------------------
+# Fetch engine
+# ---------------------------------------------------------------------------
+def make_session(pool_size: int) -> requests.Session:
+    """A Session whose connection pool is large enough for every worker."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
-def main():
-    OUT_DIR.mkdir(exist_ok=True)
+class FetchStats:
+    """Collects per-request latency and byte counts across worker threads."""
+
+    def __init__(self):
+        self.latencies = []
+        self.bytes = 0
+        self.started = time.monotonic()
+        self.finished = None
+        self.lock = threading.Lock()
+
+    def record(self, latency: float, size: int):
+        with self.lock:
+            self.latencies.append(latency)
+            self.bytes += size
+
+    def stop(self):
+        self.finished = time.monotonic()
+
+    def summary(self) -> dict:
+        elapsed = (self.finished or time.monotonic()) - self.started
+        lat = sorted(self.latencies)
+        n = len(lat)
+
+        def pct(p):
+            return lat[min(n - 1, int(p * n))] if n else 0.0
+
+        return {
+            "requests": n,
+            "bytes": self.bytes,
+            "elapsed_s": elapsed,
+            "pages_per_s": n / elapsed if elapsed > 0 else 0.0,
+            "kb_per_s": self.bytes / 1024 / elapsed if elapsed > 0 else 0.0,
+            "latency_mean_s": sum(lat) / n if n else 0.0,
+            "latency_p50_s": pct(0.50),
+            "latency_p95_s": pct(0.95),
+            "latency_max_s": lat[-1] if n else 0.0,
+        }
+
+
+def fetch_page(session, limiter, stats, meta_store, archive, url: str,
+               year: int, code: str, conditional: bool):
+    """Fetch one page and add it to the archive if it changed.
+
+    Returns (outcome, size_bytes, error) where outcome is 'changed',
+    'unchanged' (same content as the archive's latest snapshot) or
+    'not-modified' (HTTP 304).
+    """
+    meta = meta_store.get(url)
+    headers = {}
+    if conditional:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("lastModified"):
+            headers["If-Modified-Since"] = meta["lastModified"]
+
+    limiter.acquire(url)
+    t0 = time.monotonic()
+    try:
+        resp = session.get(url, timeout=30, headers=headers)
+        stats.record(time.monotonic() - t0, len(resp.content))
+        if resp.status_code == 304:
+            meta_store.update(url, checkedAt=utc_now(), lastStatus=304)
+            return "not-modified", 0, None
+        resp.raise_for_status()
+    except Exception as e:
+        return "error", 0, e
+
+    # Hash what the archive stores (the decoded text as UTF-8), so the
+    # digest can be checked against the archive itself, not just the meta
+    data = resp.text.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    now = utc_now()
+    fields = {
+        "etag": resp.headers.get("ETag"),
+        "lastModified": resp.headers.get("Last-Modified"),
+        "checkedAt": now,
+        "lastStatus": resp.status_code,
+        "sha256": digest,
+    }
+    stored = archive.latest(year, code)
+    if stored is not None and digest == stored["sha256"]:
+        meta_store.update(url, **fields)
+        return "unchanged", len(resp.text), None
+
+    archive.put(year, code, resp.text, fetched_at=now)
+    meta_store.update(url, size=len(data), fetchedAt=now, **fields)
+    return "changed", len(resp.text), None
+
+
+def iter_targets(base_url: str):
+    for year in range(START_YEAR, END_YEAR + 1):
+        for code in MONTH_CODES:
+            yield year, code, base_url.format(year=year, code=code)
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Download moonsighting.com month pages.")
+    ap.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                    help=f"concurrent workers (default {DEFAULT_JOBS})")
+    ap.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                    help=f"max requests/second per host (default {DEFAULT_RATE})")
+    ap.add_argument("--burst", type=int, default=DEFAULT_BURST,
+                    help=f"token bucket size per host (default {DEFAULT_BURST})")
+    ap.add_argument("--base-url", default=BASE_URL,
+                    help="URL template with {year} and {code}, e.g. a local test server")
+    ap.add_argument("--archive", type=Path, default=ARCHIVE_DIR,
+                    help="page archive directory")
+    ap.add_argument("--ttl-hours", type=float, default=DEFAULT_TTL_HOURS,
+                    help=f"revalidate recent pages older than this (default {DEFAULT_TTL_HOURS:g})")
+    ap.add_argument("--recent-years", type=int, default=DEFAULT_RECENT_YEARS,
+                    help="Hijri years before the current one that are still revalidated "
+                         f"(default {DEFAULT_RECENT_YEARS})")
+    ap.add_argument("--current-year", type=int, default=None,
+                    help="override the current Hijri year (default: from today's date)")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    archive = PageArchive(args.archive)
+    args.archive.mkdir(parents=True, exist_ok=True)
+    meta_store = FetchMetaStore(args.archive / META_FILENAME)
+    current_year = args.current_year or approx_hijri_year(date.today())
 
     total = 0
     downloaded = 0
+    not_modified = 0
+    unchanged = 0
     skipped = 0
     errors = []
+    pending = []
 
-    for year in range(START_YEAR, END_YEAR + 1):
-        for code in MONTH_CODES:
-            total += 1
-            filename = f"{year}{code}.html"
-            filepath = OUT_DIR / filename
-            url = BASE_URL.format(year=year, code=code)
-
-            # Skip if already downloaded
-            if filepath.exists() and filepath.stat().st_size > 500:
-                print(f"  SKIP (exists) {filename}")
-                skipped += 1
-                continue
-
-            print(f"  GET  {filename:20s} ... ", end="", flush=True)
-
-            try:
-                resp = requests.get(url, timeout=30)
-                resp.raise_for_status()
-                filepath.write_text(resp.text, encoding="utf-8")
-                size_kb = len(resp.text) / 1024
-                print(f"OK  ({size_kb:.0f} KB)")
-                downloaded += 1
-            except Exception as e:
-                err_short = str(e).split("for url")[0].strip()
-                print(f"ERROR: {err_short}")
-                errors.append({"file": filename, "error": str(e)})
+    for year, code, url in iter_targets(args.base_url):
+        total += 1
+        filename = f"{year}{code}.html"
+
+        action = needs_fetch(meta_store.get(url), archive.latest(year, code), year,
+                             current_year, args.recent_years, args.ttl_hours)
+        if action == "skip":
+            print(f"  SKIP (fresh)  {filename}")
+            skipped += 1
+            continue
+        pending.append((filename, url, year, code, action == "revalidate"))
 
-            time.sleep(0.5)
+    jobs = max(1, args.jobs)
+    session = make_session(jobs)
+    limiter = HostRateLimiter(args.rate, args.burst)
+    stats = FetchStats()
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            (filename, pool.submit(fetch_page, session, limiter, stats, meta_store,
+                                   archive, url, year, code, conditional))
+            for filename, url, year, code, conditional in pending
+        ]
+        # Report in submission order so the log stays readable
+        for filename, fut in futures:
+            outcome, size, err = fut.result()
+            if outcome == "changed":
+                print(f"  GET  {filename:20s} ... OK  ({size / 1024:.0f} KB)")
+                downloaded += 1
+            elif outcome == "not-modified":
+                print(f"  GET  {filename:20s} ... 304 Not Modified")
+                not_modified += 1
+            elif outcome == "unchanged":
+                print(f"  GET  {filename:20s} ... unchanged ({size / 1024:.0f} KB)")
+                unchanged += 1
+            else:
+                err_short = str(err).split("for url")[0].strip()
+                print(f"  GET  {filename:20s} ... ERROR: {err_short}")
+                errors.append({"file": filename, "error": str(err)})
+    stats.stop()
+    session.close()
+    meta_store.save()
+    archive.save()
+    archive.close()
 
     print(f"\n{'='*60}")
     print(f"Total pages:  {total}")
     print(f"Downloaded:   {downloaded}")
+    print(f"Not modified: {not_modified}")
+    print(f"Unchanged:    {unchanged}")
     print(f"Skipped:      {skipped}")
     print(f"Errors:       {len(errors)}")
     if errors:
         print("\nFailed pages:")
         for e in errors:
             print(f"  {e['file']}: {e['error'][:80]}")
-    print(f"\nFiles saved to: {OUT_DIR}")
+
+    s = stats.summary()
+    print(f"\nThroughput:   {s['pages_per_s']:.2f} pages/s, {s['kb_per_s']:.0f} KB/s "
+          f"({s['requests']} requests in {s['elapsed_s']:.1f}s, {jobs} workers)")
+    print(f"Latency:      mean {s['latency_mean_s']*1000:.0f} ms, "
+          f"p50 {s['latency_p50_s']*1000:.0f} ms, "
+          f"p95 {s['latency_p95_s']*1000:.0f} ms, "
+          f"max {s['latency_max_s']*1000:.0f} ms")
+    print(f"\nArchive: {args.archive}")
+    return s
 
 
 if __name__ == "__main__":
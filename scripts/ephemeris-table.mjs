@@ -0,0 +1,119 @@
+/**
+ * ephemeris-table.mjs
+ *
+ * Node reader for the precomputed crescent ephemeris table written by
+ * scripts/ephemeris_table.py (conjunction per Hijri month; sunset, moonset,
+ * Yallop q and Odeh V per reference city on the 29th/30th evenings).
+ * See that script for the file layout.
+ *
+ * Usage:
+ *   node scripts/ephemeris-table.mjs Egypt 1445 9
+ *
+ *   import { loadEphemerisTable } from './ephemeris-table.mjs';
+ *   const table = loadEphemerisTable();          // or loadEphemerisTable(path)
+ *   table.lookup('Egypt', 1445, 9);
+ */
+
+import { existsSync, readFileSync } from 'node:fs';
+import { resolve, dirname } from 'node:path';
+import { fileURLToPath } from 'node:url';
+
+const __dirname = dirname(fileURLToPath(import.meta.url));
+
+export const TABLE_PATH = resolve(__dirname, 'ephemeris_table.bin');
+
+const MAGIC = 'HIJEPH01';
+const J2000_MS = Date.UTC(2000, 0, 1, 12, 0, 0);
+const DAY_MS = 86400000;
+
+const TYPED_ARRAYS = {
+  '<i4': Int32Array,
+  '<f4': Float32Array,
+  '<f8': Float64Array,
+};
+
+/** ut (days since J2000) → Date; null for NaN. */
+export function utToDate(ut) {
+  return Number.isFinite(ut) ? new Date(J2000_MS + ut * DAY_MS) : null;
+}
+
+export function tableExists(path = TABLE_PATH) {
+  return existsSync(path);
+}
+
+export function loadEphemerisTable(path = TABLE_PATH) {
+  const buf = readFileSync(path);
+  if (buf.toString('latin1', 0, 8) !== MAGIC) {
+    throw new Error(`${path}: not an ephemeris table`);
+  }
+  const headerLength = buf.readUInt32LE(8);
+  const header = JSON.parse(buf.toString('utf8', 12, 12 + headerLength));
+  const dataStart = Math.ceil((12 + headerLength) / 8) * 8;
+
+  const arrays = {};
+  for (const [name, spec] of Object.entries(header.arrays)) {
+    const ArrayType = TYPED_ARRAYS[spec.dtype];
+    if (!ArrayType) throw new Error(`${path}: unsupported dtype ${spec.dtype}`);
+    const length = spec.shape.reduce((a, b) => a * b, 1);
+    const start = buf.byteOffset + dataStart + spec.offset;
+    // copy: the Buffer's memory is not guaranteed to be 8-byte aligned
+    arrays[name] = new ArrayType(buf.buffer.slice(start, start + length * ArrayType.BYTES_PER_ELEMENT));
+  }
+
+  const [firstYear, lastYear] = header.hijri_years;
+  const countries = header.countries;
+  const evenings = header.arrays.evening.shape[1];
+
+  function row(hijriYear, hijriMonth) {
+    if (hijriYear < firstYear || hijriYear > lastYear || hijriMonth < 1 || hijriMonth > 12) {
+      throw new RangeError(`Hijri month outside ${firstYear}-${lastYear}`);
+    }
+    return (hijriYear - firstYear) * 12 + hijriMonth - 1;
+  }
+
+  /** Conjunction and both evenings of one month for one country. */
+  function lookup(country, hijriYear, hijriMonth) {
+    const i = row(hijriYear, hijriMonth);
+    const c = countries.indexOf(country);
+    if (c < 0) throw new RangeError(`Unknown country "${country}"`);
+    const conjunction = arrays.conjunction[i];
+    const result = { conjunction: utToDate(conjunction), evenings: [] };
+    for (let e = 0; e < evenings; e++) {
+      const k = (i * countries.length + c) * evenings + e;
+      const sunset = arrays.sunset[k];
+      const moonset = arrays.moonset[k];
+      result.evenings.push({
+        date: new Date(arrays.evening[i * evenings + e] * DAY_MS).toISOString().slice(0, 10),
+        sunset: utToDate(sunset),
+        moonset: utToDate(moonset),
+        lagMinutes: (moonset - sunset) * 1440,
+        ageHours: (sunset - conjunction) * 24,
+        yallopQ: arrays.yallop_q[k],
+        odehV: arrays.odeh_v[k],
+      });
+    }
+    return result;
+  }
+
+  return { header, arrays, firstYear, lastYear, countries, row, lookup };
+}
+
+// ---------------------------------------------------------------------------
+// CLI
+// ---------------------------------------------------------------------------
+if (process.argv[1] && resolve(process.argv[1]) === fileURLToPath(import.meta.url)) {
+  const [country, year, month] = process.argv.slice(2);
+  if (!country || !year || !month) {
+    console.error('Usage: node scripts/ephemeris-table.mjs <Country> <HijriYear> <HijriMonth>');
+    process.exit(1);
+  }
+  const result = loadEphemerisTable().lookup(country, Number(year), Number(month));
+  console.log(`Conjunction  ${result.conjunction.toISOString()}`);
+  for (const ev of result.evenings) {
+    console.log(
+      `  ${ev.date}  sunset ${ev.sunset?.toISOString()}  moonset ${ev.moonset?.toISOString()}` +
+        `  lag ${ev.lagMinutes.toFixed(1)} min  age ${ev.ageHours.toFixed(1)} h` +
+        `  q ${ev.yallopQ.toFixed(3)}  V ${ev.odehV.toFixed(2)}`
+    );
+  }
+}
@@ -0,0 +1,466 @@
+"""
+ephemeris.py
+
+Vectorized Sun/Moon ephemeris in NumPy for the crescent-visibility scripts
+(yallop.py and friends).  Every function takes arrays and broadcasts, so a
+whole table of (time, latitude, longitude) rows is evaluated in one call.
+
+Time is "ut": days since 2000-01-01 12:00 UT, as in astronomy-engine (the
+library behind packages/calendar-engine).  Positions are computed in TT =
+UT + delta_t(ut).
+
+Algorithms (Meeus, "Astronomical Algorithms", 2nd ed.):
+  sun_position     ch. 25, apparent, ~0.01 deg
+  moon_position    ch. 47 (ELP-2000/82 main terms), ~10" in longitude
+  nutation         ch. 22, main terms
+  sidereal time    ch. 12, apparent (GAST)
+  delta_t          Espenak & Meeus polynomials, the model astronomy-engine uses
+  topocentric      observer on the astronomy-engine ellipsoid, height 0
+
+Rise/set and new-moon searches follow astronomy-engine's definitions:
+  - a body sets when its top limb, corrected by 34' of refraction, reaches
+    the horizon (airless topocentric altitude of the centre + semidiameter
+    = -34');
+  - "previous new moon" is the last time before t at which the geocentric
+    ecliptic longitudes of Moon and Sun were equal.
+Searches step through the window in 4-hour steps to bracket the event for
+all rows at once, then refine every bracket together by regula falsi.
+"""
+
+import numpy as np
+
+DEG = np.pi / 180.0
+AU_KM = 149597870.7
+EARTH_EQUATORIAL_RADIUS_KM = 6378.1366
+EARTH_FLATTENING = 0.996647180302104     # polar / equatorial radius
+SUN_RADIUS_KM = 695700.0
+MOON_EQUATORIAL_RADIUS_KM = 1738.1
+REFRACTION_NEAR_HORIZON = 34.0 / 60.0
+DAYS_PER_TROPICAL_YEAR = 365.24217
+SYNODIC_MONTH_DAYS = 29.530588853
+
+J2000 = np.datetime64('2000-01-01T12:00:00', 'us')
+US_PER_DAY = 86400e6
+
+
+# ---------------------------------------------------------------------------
+# Time
+# ---------------------------------------------------------------------------
+def ut_from_datetime64(t) -> np.ndarray:
+    """datetime64 (UTC) -> ut days since J2000."""
+    return (np.asarray(t, dtype='datetime64[us]') - J2000).astype(np.float64) / US_PER_DAY
+
+
+def datetime64_from_ut(ut) -> np.ndarray:
+    us = np.round(np.asarray(ut, dtype=np.float64) * US_PER_DAY)
+    return J2000 + us.astype('timedelta64[us]')
+
+
+def delta_t(ut) -> np.ndarray:
+    """TT - UT in seconds (Espenak & Meeus, 1900-2150; long-term parabola outside)."""
+    y = 2000 + (np.asarray(ut, dtype=np.float64) - 14) / DAYS_PER_TROPICAL_YEAR
+    u20 = y - 2000
+    segments = [
+        (y < 1900, -20 + 32 * ((y - 1820) / 100) ** 2),
+        (y < 1920, np.polyval([-0.000197, 0.0061966, -0.0598939, 1.494119, -2.79], y - 1900)),
+        (y < 1941, np.polyval([0.0020936, -0.076100, 0.84493, 21.20], y - 1920)),
+        (y < 1961, np.polyval([1 / 2547, -1 / 233, 0.407, 29.07], y - 1950)),
+        (y < 1986, np.polyval([-1 / 718, -1 / 260, 1.067, 45.45], y - 1975)),
+        (y < 2005, np.polyval([0.00002373599, 0.000651814, 0.0017275, -0.060374,
+                               0.3345, 63.86], u20)),
+        (y < 2050, 62.92 + 0.32217 * u20 + 0.005589 * u20 * u20),
+        (y < 2150, -20 + 32 * ((y - 1820) / 100) ** 2 - 0.5628 * (2150 - y)),
+    ]
+    return np.select([c for c, _ in segments], [v for _, v in segments],
+                     default=-20 + 32 * ((y - 1820) / 100) ** 2)
+
+
+def centuries_tt(ut) -> np.ndarray:
+    ut = np.asarray(ut, dtype=np.float64)
+    return (ut + delta_t(ut) / 86400.0) / 36525.0
+
+
+# ---------------------------------------------------------------------------
+# Nutation, obliquity, sidereal time
+# ---------------------------------------------------------------------------
+def nutation(T):
+    """(delta psi, true obliquity) in degrees."""
+    omega = (125.04452 - 1934.136261 * T) * DEG
+    L = (280.4665 + 36000.7698 * T) * DEG
+    Lm = (218.3165 + 481267.8813 * T) * DEG
+    dpsi = (-17.20 * np.sin(omega) - 1.32 * np.sin(2 * L)
+            - 0.23 * np.sin(2 * Lm) + 0.21 * np.sin(2 * omega)) / 3600.0
+    deps = (9.20 * np.cos(omega) + 0.57 * np.cos(2 * L)
+            + 0.10 * np.cos(2 * Lm) - 0.09 * np.cos(2 * omega)) / 3600.0
+    eps0 = (23.0 + 26.0 / 60 + 21.448 / 3600
+            + (-46.8150 * T - 0.00059 * T ** 2 + 0.001813 * T ** 3) / 3600.0)
+    return dpsi, eps0 + deps
+
+
+def sidereal_time(ut, dpsi, eps) -> np.ndarray:
+    """Greenwich apparent sidereal time in degrees."""
+    ut = np.asarray(ut, dtype=np.float64)
+    T = ut / 36525.0
+    gmst = (280.46061837 + 360.98564736629 * ut
+            + 0.000387933 * T ** 2 - T ** 3 / 38710000.0)
+    return np.mod(gmst + dpsi * np.cos(eps * DEG), 360.0)
+
+
+# ---------------------------------------------------------------------------
+# Sun and Moon (geocentric, apparent, ecliptic of date)
+# ---------------------------------------------------------------------------
+def sun_position(T, dpsi):
+    """(longitude deg, latitude deg, distance km) of the Sun."""
+    L0 = 280.46646 + 36000.76983 * T + 0.0003032 * T ** 2
+    M = (357.52911 + 35999.05029 * T - 0.0001537 * T ** 2) * DEG
+    e = 0.016708634 - 0.000042037 * T - 0.0000001267 * T ** 2
+    C = ((1.914602 - 0.004817 * T - 0.000014 * T ** 2) * np.sin(M)
+         + (0.019993 - 0.000101 * T) * np.sin(2 * M) + 0.000289 * np.sin(3 * M))
+    nu = M + C * DEG
+    R = 1.000001018 * (1 - e * e) / (1 + e * np.cos(nu))
+    lon = L0 + C + dpsi - 20.4898 / 3600.0 / R
+    return np.mod(lon, 360.0), np.zeros_like(lon), R * AU_KM
+
+
+# Meeus table 47.A: D, M, M', F, sum-l (1e-6 deg), sum-r (1e-3 km)
+_MOON_LR = np.array([
+    (0, 0, 1, 0, 6288774, -20905355), (2, 0, -1, 0, 1274027, -3699111),
+    (2, 0, 0, 0, 658314, -2955968), (0, 0, 2, 0, 213618, -569925),
+    (0, 1, 0, 0, -185116, 48888), (0, 0, 0, 2, -114332, -3149),
+    (2, 0, -2, 0, 58793, 246158), (2, -1, -1, 0, 57066, -152138),
+    (2, 0, 1, 0, 53322, -170733), (2, -1, 0, 0, 45758, -204586),
+    (0, 1, -1, 0, -40923, -129620), (1, 0, 0, 0, -34720, 108743),
+    (0, 1, 1, 0, -30383, 104755), (2, 0, 0, -2, 15327, 10321),
+    (0, 0, 1, 2, -12528, 0), (0, 0, 1, -2, 10980, 79661),
+    (4, 0, -1, 0, 10675, -34782), (0, 0, 3, 0, 10034, -23210),
+    (4, 0, -2, 0, 8548, -21636), (2, 1, -1, 0, -7888, 24208),
+    (2, 1, 0, 0, -6766, 30824), (1, 0, -1, 0, -5163, -8379),
+    (1, 1, 0, 0, 4987, -16675), (2, -1, 1, 0, 4036, -12831),
+    (2, 0, 2, 0, 3994, -10445), (4, 0, 0, 0, 3861, -11650),
+    (2, 0, -3, 0, 3665, 14403), (0, 1, -2, 0, -2689, -7003),
+    (2, 0, -1, 2, -2602, 0), (2, -1, -2, 0, 2390, 10056),
+    (1, 0, 1, 0, -2348, 6322), (2, -2, 0, 0, 2236, -9884),
+    (0, 1, 2, 0, -2120, 5751), (0, 2, 0, 0, -2069, 0),
+    (2, -2, -1, 0, 2048, -4950), (2, 0, 1, -2, -1773, 4130),
+    (2, 0, 0, 2, -1595, 0), (4, -1, -1, 0, 1215, -3958),
+    (0, 0, 2, 2, -1110, 0), (3, 0, -1, 0, -892, 3258),
+    (2, 1, 1, 0, -810, 2616), (4, -1, -2, 0, 759, -1897),
+    (0, 2, -1, 0, -713, -2117), (2, 2, -1, 0, -700, 2354),
+    (2, 1, -2, 0, 691, 0), (2, -1, 0, -2, 596, 0),
+    (4, 0, 1, 0, 549, -1423), (0, 0, 4, 0, 537, -1117),
+    (4, -1, 0, 0, 520, -1571), (1, 0, -2, 0, -487, -1739),
+    (2, 1, 0, -2, -399, 0), (0, 0, 2, -2, -381, -4421),
+    (1, 1, 1, 0, 351, 0), (3, 0, -2, 0, -340, 0),
+    (4, 0, -3, 0, 330, 0), (2, -1, 2, 0, 327, 0),
+    (0, 2, 1, 0, -323, 1165), (1, 1, -1, 0, 299, 0),
+    (2, 0, 3, 0, 294, 0), (2, 0, -1, -2, 0, 8752),
+], dtype=np.float64)
+
+# Meeus table 47.B: D, M, M', F, sum-b (1e-6 deg)
+_MOON_B = np.array([
+    (0, 0, 0, 1, 5128122), (0, 0, 1, 1, 280602), (0, 0, 1, -1, 277693),
+    (2, 0, 0, -1, 173237), (2, 0, -1, 1, 55413), (2, 0, -1, -1, 46271),
+    (2, 0, 0, 1, 32573), (0, 0, 2, 1, 17198), (2, 0, 1, -1, 9266),
+    (0, 0, 2, -1, 8822), (2, -1, 0, -1, 8216), (2, 0, -2, -1, 4324),
+    (2, 0, 1, 1, 4200), (2, 1, 0, -1, -3359), (2, -1, -1, 1, 2463),
+    (2, -1, 0, 1, 2211), (2, -1, -1, -1, 2065), (0, 1, -1, -1, -1870),
+    (4, 0, -1, -1, 1828), (0, 1, 0, 1, -1794), (0, 0, 0, 3, -1749),
+    (0, 1, -1, 1, -1565), (1, 0, 0, 1, -1491), (0, 1, 1, 1, -1475),
+    (0, 1, 1, -1, -1410), (0, 1, 0, -1, -1344), (1, 0, 0, -1, -1335),
+    (0, 0, 3, 1, 1107), (4, 0, 0, -1, 1021), (4, 0, -1, 1, 833),
+    (0, 0, 1, -3, 777), (4, 0, -2, 1, 671), (2, 0, 0, -3, 607),
+    (2, 0, 2, -1, 596), (2, -1, 1, -1, 491), (2, 0, -2, 1, -451),
+    (0, 0, 3, -1, 439), (2, 0, 2, 1, 422), (2, 0, -3, -1, 421),
+    (2, 1, -1, 1, -366), (2, 1, 0, 1, -351), (4, 0, 0, 1, 331),
+    (2, -1, 1, 1, 315), (2, -2, 0, -1, 302), (0, 0, 1, 3, -283),
+    (2, 1, 1, -1, -229), (1, 1, 0, -1, 223), (1, 1, 0, 1, 223),
+    (0, 1, -2, -1, -220), (2, 1, -1, -1, -220), (1, 0, 1, 1, -185),
+    (2, -1, -2, -1, 181), (0, 1, 2, 1, -177), (4, 0, -2, -1, 176),
+    (4, -1, -1, -1, 166), (1, 0, 1, -1, -164), (4, 0, 1, -1, 132),
+    (1, 0, -1, -1, -119), (4, -1, 0, -1, 115), (2, -2, 0, 1, 107),
+], dtype=np.float64)
+
+
+def _periodic_sum(table, column, terms, E):
+    """sum over the rows of a Meeus table of table[:, column] * E**|M| *
+    terms, where terms holds sin or cos of each row's argument (one row
+    per table row); one matrix product per power of E."""
+    power = np.abs(table[:, 1])
+    total = 0.0
+    for k, factor in enumerate((1.0, E, E * E)):
+        coef = np.where(power == k, table[:, column], 0.0)
+        if coef.any():
+            total = total + factor * (coef @ terms)
+    return total
+
+
+def moon_position(T, dpsi):
+    """(longitude deg, latitude deg, distance km) of the Moon."""
+    Lp = (218.3164477 + 481267.88123421 * T - 0.0015786 * T ** 2
+          + T ** 3 / 538841.0 - T ** 4 / 65194000.0)
+    D = (297.8501921 + 445267.1114034 * T - 0.0018819 * T ** 2
+         + T ** 3 / 545868.0 - T ** 4 / 113065000.0) * DEG
+    M = (357.5291092 + 35999.0502909 * T - 0.0001536 * T ** 2
+         + T ** 3 / 24490000.0) * DEG
+    Mp = (134.9633964 + 477198.8675055 * T + 0.0087414 * T ** 2
+          + T ** 3 / 69699.0 - T ** 4 / 14712000.0) * DEG
+    F = (93.2720950 + 483202.0175233 * T - 0.0036539 * T ** 2
+         - T ** 3 / 3526000.0 + T ** 4 / 863310000.0) * DEG
+    A1 = (119.75 + 131.849 * T) * DEG
+    A2 = (53.09 + 479264.290 * T) * DEG
+    A3 = (313.45 + 481266.484 * T) * DEG
+    E = 1 - 0.002516 * T - 0.0000074 * T ** 2
+
+    shape = np.shape(T)
+    args = np.stack([np.ravel(a) for a in (D, M, Mp, F)])
+    E = np.ravel(E)
+    phases = _MOON_LR[:, :4] @ args
+    sl = _periodic_sum(_MOON_LR, 4, np.sin(phases), E).reshape(shape)
+    sr = _periodic_sum(_MOON_LR, 5, np.cos(phases), E).reshape(shape)
+    sb = _periodic_sum(_MOON_B, 4, np.sin(_MOON_B[:, :4] @ args), E).reshape(shape)
+
+    Lp_rad = Lp * DEG
+    sl = sl + 3958 * np.sin(A1) + 1962 * np.sin(Lp_rad - F) + 318 * np.sin(A2)
+    sb = (sb - 2235 * np.sin(Lp_rad) + 382 * np.sin(A3) + 175 * np.sin(A1 - F)
+          + 175 * np.sin(A1 + F) + 127 * np.sin(Lp_rad - Mp) - 115 * np.sin(Lp_rad + Mp))
+    lon = Lp + sl / 1e6 + dpsi
+    return np.mod(lon, 360.0), sb / 1e6, 385000.56 + sr / 1000.0
+
+
+def ecliptic_vector(lon, lat, dist):
+    lon, lat = lon * DEG, lat * DEG
+    return np.stack([dist * np.cos(lat) * np.cos(lon),
+                     dist * np.cos(lat) * np.sin(lon),
+                     dist * np.sin(lat)])
+
+
+def angle_between(a, b) -> np.ndarray:
+    """Angle in degrees between vectors stacked on axis 0."""
+    cos = (a * b).sum(axis=0) / np.sqrt((a * a).sum(axis=0) * (b * b).sum(axis=0))
+    return np.arccos(np.clip(cos, -1.0, 1.0)) / DEG
+
+
+# ---------------------------------------------------------------------------
+# Topocentric horizon coordinates
+# ---------------------------------------------------------------------------
+def observer_vector(lat, gast_plus_lon):
+    """Observer position (km) in the true equator-of-date frame."""
+    phi = np.asarray(lat, dtype=np.float64) * DEG
+    c = 1.0 / np.hypot(np.cos(phi), EARTH_FLATTENING * np.sin(phi))
+    s = EARTH_FLATTENING ** 2 * c
+    rc = EARTH_EQUATORIAL_RADIUS_KM * c * np.cos(phi)
+    theta = gast_plus_lon * DEG
+    return np.stack([rc * np.cos(theta), rc * np.sin(theta),
+                     EARTH_EQUATORIAL_RADIUS_KM * s * np.sin(phi) + 0 * theta])
+
+
+def refraction(alt) -> np.ndarray:
+    """astronomy-engine 'normal' refraction (degrees) for an airless altitude."""
+    alt = np.asarray(alt, dtype=np.float64)
+    hd = np.maximum(alt, -1.0)
+    refr = (1.02 / np.tan((hd + 10.3 / (hd + 5.11)) * DEG)) / 60.0
+    refr = np.where(alt < -1.0, refr * (alt + 90.0) / 89.0, refr)
+    return np.where((alt < -90.0) | (alt > 90.0), 0.0, refr)
+
+
+class Geocentric:
+    """Geocentric Sun and Moon at an array of times.
+
+    Attributes:
+      moon_eq, sun_eq   apparent position vectors (3, ...) in km, true
+                        equator and equinox of date
+      gast              Greenwich apparent sidereal time, degrees
+    """
+
+    def __init__(self, ut):
+        ut = np.asarray(ut, dtype=np.float64)
+        T = centuries_tt(ut)
+        dpsi, eps = nutation(T)
+        self.gast = sidereal_time(ut, dpsi, eps)
+        ce, se = np.cos(eps * DEG), np.sin(eps * DEG)
+        for name, position in (('moon', moon_position), ('sun', sun_position)):
+            v = ecliptic_vector(*position(T, dpsi))
+            setattr(self, f'{name}_eq', np.stack([v[0], v[1] * ce - v[2] * se,
+                                                  v[1] * se + v[2] * ce]))
+
+
+class GeocentricTable:
+    """Geocentric positions tabulated once per time step over a window and
+    interpolated in between, for evaluating many observers over the same
+    few days: the series are summed once per step, not once per observer.
+
+    With the default 10-minute step the Moon moves ~5' between nodes and
+    linear interpolation of its position vector is good to ~0.1".
+    """
+
+    def __init__(self, ut_start, ut_end, step_days=10 / 1440):
+        n = int(np.ceil((ut_end - ut_start) / step_days)) + 1
+        self.ut = ut_start + np.arange(n) * step_days
+        geo = Geocentric(self.ut)
+        self.moon_eq, self.sun_eq = geo.moon_eq, geo.sun_eq
+        self.gast = np.unwrap(geo.gast, period=360.0)
+
+    def __call__(self, ut) -> Geocentric:
+        ut = np.asarray(ut, dtype=np.float64)
+        if np.any(ut[~np.isnan(ut)] < self.ut[0]) or np.any(ut[~np.isnan(ut)] > self.ut[-1]):
+            raise ValueError("time outside the tabulated window")
+        flat = ut.ravel()
+        geo = Geocentric.__new__(Geocentric)
+        geo.gast = np.mod(np.interp(flat, self.ut, self.gast), 360.0).reshape(ut.shape)
+        for name in ('moon_eq', 'sun_eq'):
+            table = getattr(self, name)
+            setattr(geo, name, np.stack([np.interp(flat, self.ut, c).reshape(ut.shape)
+                                         for c in table]))
+        return geo
+
+
+def horizontal(vec, gast, lat, lon):
+    """Topocentric (airless altitude, azimuth, distance) of a geocentric
+    equator-of-date vector, for observers at height 0."""
+    lst = gast + lon
+    obs = observer_vector(lat, lst)
+    x, y, z = vec[0] - obs[0], vec[1] - obs[1], vec[2] - obs[2]
+    dist = np.sqrt(x * x + y * y + z * z)
+    ra = np.arctan2(y, x)
+    dec = np.arcsin(z / dist)
+    ha = lst * DEG - ra
+    phi = lat * DEG
+    sin_alt = np.sin(phi) * np.sin(dec) + np.cos(phi) * np.cos(dec) * np.cos(ha)
+    alt = np.arcsin(np.clip(sin_alt, -1.0, 1.0))
+    az = np.arctan2(-np.cos(dec) * np.sin(ha),
+                    np.sin(dec) * np.cos(phi) - np.cos(dec) * np.sin(phi) * np.cos(ha))
+    return alt / DEG, np.mod(az / DEG, 360.0), dist
+
+
+class Snapshot:
+    """Sun and Moon for arrays of times and observers (broadcast together).
+    Geocentric positions come from `table` (a GeocentricTable) if given,
+    otherwise they are computed for every element.
+
+    Attributes (degrees / km unless noted):
+      moon_alt, sun_alt        topocentric airless altitude of the centre
+      moon_az, sun_az          azimuth, measured from north through east
+      moon_dist, sun_dist      topocentric distance
+      moon_geo, sun_geo        geocentric vectors (3, ...)
+    """
+
+    def __init__(self, ut, lat, lon, table=None):
+        ut, lat, lon = np.broadcast_arrays(np.asarray(ut, dtype=np.float64),
+                                           np.asarray(lat, dtype=np.float64),
+                                           np.asarray(lon, dtype=np.float64))
+        geo = Geocentric(ut) if table is None else table(ut)
+        self.moon_geo, self.sun_geo = geo.moon_eq, geo.sun_eq
+        for name in ('moon', 'sun'):
+            alt, az, dist = horizontal(getattr(geo, f'{name}_eq'), geo.gast, lat, lon)
+            setattr(self, f'{name}_alt', alt)
+            setattr(self, f'{name}_az', az)
+            setattr(self, f'{name}_dist', dist)
+
+    @property
+    def elongation(self) -> np.ndarray:
+        """Geocentric Sun-Moon angle (ARCL) in degrees."""
+        return angle_between(self.moon_geo, self.sun_geo)
+
+    @property
+    def illumination(self) -> np.ndarray:
+        """Illuminated fraction of the Moon's disc."""
+        phase_angle = angle_between(self.moon_geo, self.moon_geo - self.sun_geo)
+        return (1 + np.cos(phase_angle * DEG)) / 2
+
+
+def _limb_altitude(body, snap) -> np.ndarray:
+    """Top-limb airless altitude + standard refraction; zero at rise/set."""
+    radius = SUN_RADIUS_KM if body == 'sun' else MOON_EQUATORIAL_RADIUS_KM
+    alt = getattr(snap, f'{body}_alt')
+    dist = getattr(snap, f'{body}_dist')
+    return alt + np.arcsin(radius / dist) / DEG + REFRACTION_NEAR_HORIZON
+
+
+# ---------------------------------------------------------------------------
+# Event searches (vectorized)
+# ---------------------------------------------------------------------------
+def _find_root(f, lo, hi, f_lo, f_hi, iterations=6):
+    """Root of f in [lo, hi] where f changes sign, elementwise, by the
+    Illinois variant of regula falsi (converges to well under a second
+    of time from a 4-hour bracket in a handful of steps)."""
+    t = lo
+    side = np.zeros(np.shape(lo))
+    for _ in range(iterations):
+        t = np.where(f_hi != f_lo, (lo * f_hi - hi * f_lo) / (f_hi - f_lo), lo)
+        f_t = f(t)
+        left = np.sign(f_t) == np.sign(f_lo)
+        # the endpoint that stays put twice in a row has its value halved
+        f_hi = np.where(left & (side == 1), f_hi / 2, f_hi)
+        f_lo = np.where(~left & (side == -1), f_lo / 2, f_lo)
+        lo, f_lo = np.where(left, t, lo), np.where(left, f_t, f_lo)
+        hi, f_hi = np.where(left, hi, t), np.where(left, f_hi, f_t)
+        side = np.where(left, 1, -1)
+    return t
+
+
+def search_set(body, start_ut, lat, lon, limit_days, step_days=1 / 6,
+               table=None) -> np.ndarray:
+    """Time (ut) the body sets, searching forward from start_ut when
+    limit_days > 0 (the first set) or backward when < 0 (the last one);
+    NaN when there is none within the window.  `table` is passed on to
+    Snapshot."""
+    start_ut, lat, lon = np.broadcast_arrays(np.asarray(start_ut, dtype=np.float64),
+                                             np.asarray(lat, dtype=np.float64),
+                                             np.asarray(lon, dtype=np.float64))
+    n_steps = int(np.ceil(abs(limit_days) / step_days))
+    offsets = np.arange(n_steps + 1) * step_days * np.sign(limit_days)
+    grid = start_ut[..., None] + offsets
+    f = -_limb_altitude(body, Snapshot(grid, lat[..., None], lon[..., None], table))
+    # a set is f crossing from negative to non-negative as time increases
+    if limit_days > 0:
+        crossing = (f[..., :-1] < 0) & (f[..., 1:] >= 0)
+        k = np.argmax(crossing, axis=-1)[..., None]
+    else:
+        crossing = (f[..., 1:] < 0) & (f[..., :-1] >= 0)
+        k = np.argmax(crossing, axis=-1)[..., None]
+    found = crossing.any(axis=-1)
+    t0 = np.take_along_axis(grid, k, -1)[..., 0]
+    t1 = np.take_along_axis(grid, k + 1, -1)[..., 0]
+    f0 = np.take_along_axis(f, k, -1)[..., 0]
+    f1 = np.take_along_axis(f, k + 1, -1)[..., 0]
+    # no bracket: collapse it so the refinement stays put
+    t1, f1 = np.where(found, t1, t0), np.where(found, f1, f0)
+
+    def g(t):
+        return -_limb_altitude(body, Snapshot(t, lat, lon, table))
+
+    t = _find_root(g, t0, t1, f0, f1)
+    inside = np.abs(t - start_ut) <= abs(limit_days)
+    return np.where(found & inside, t, np.nan)
+
+
+def moon_phase(ut) -> np.ndarray:
+    """Moon minus Sun geocentric ecliptic longitude, 0..360 degrees."""
+    T = centuries_tt(ut)
+    dpsi, _ = nutation(T)
+    return np.mod(moon_position(T, dpsi)[0] - sun_position(T, dpsi)[0], 360.0)
+
+
+def _refine_new_moon(t, iterations):
+    for _ in range(iterations):
+        phase = moon_phase(t)
+        wrapped = np.where(phase > 180.0, phase - 360.0, phase)
+        slope = np.mod(moon_phase(t + 0.01) - phase, 360.0) / 0.01
+        t = t - wrapped / slope
+    return t
+
+
+def previous_new_moon(ut, iterations=5) -> np.ndarray:
+    """Time (ut) of the last new moon at or before ut."""
+    ut = np.asarray(ut, dtype=np.float64)
+    rate = 360.0 / SYNODIC_MONTH_DAYS
+    return _refine_new_moon(ut - moon_phase(ut) / rate, iterations)
+
+
+def nearest_new_moon(ut, iterations=5) -> np.ndarray:
+    """Time (ut) of the new moon closest to ut."""
+    ut = np.asarray(ut, dtype=np.float64)
+    phase = moon_phase(ut)
+    rate = 360.0 / SYNODIC_MONTH_DAYS
+    return _refine_new_moon(ut - np.where(phase > 180.0, phase - 360.0, phase) / rate,
+                            iterations)
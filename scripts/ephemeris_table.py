@@ -0,0 +1,204 @@
+"""
+ephemeris_table.py
+
+Precomputed crescent ephemeris for a range of Hijri years (default
+1400-1500 AH), so that scoring a month is a table lookup instead of a
+conjunction / sunset / moonset search.
+
+For every Hijri month the table holds the conjunction (the new moon
+nearest the civil-calendar start, less 1.5 days) and, for each master
+reference city (yallop.MASTER_LOCATIONS), two evenings: the UTC
+date of the conjunction (the 29th-day sighting attempt) and the day after
+(the 30th).  Per evening it stores sunset, moonset (chosen as in yallop.ts:
+the next one if the Moon is up at sunset, else the previous one), and the
+Yallop q and Odeh V at the best time.
+
+File format (little-endian), readable without NumPy:
+  8 bytes   magic b"HIJEPH01"
+  4 bytes   uint32 length of the JSON header
+  header    JSON: {"hijri_years": [first, last], "countries": [...],
+                   "locations": [[lat, lon], ...], "time_unit": ...,
+                   "arrays": {name: {"dtype", "shape", "offset"}}}
+  padding   zero bytes up to a multiple of 8
+  arrays    C-order, each at its "offset" from the end of the padding
+            (offsets are multiples of 8)
+
+Arrays (L lunations, C countries, E = 2 evenings):
+  hijri_year, hijri_month   int32 (L,)
+  conjunction               float64 (L,)       ut: days since 2000-01-01 12:00 UT
+  evening                   int32 (L, E)       days since 1970-01-01
+  sunset, moonset           float64 (L, C, E)  ut; sunset NaN if none, moonset =
+                                               sunset if none (lag 0, as yallop.ts)
+  yallop_q, odeh_v          float32 (L, C, E)
+
+Row of (year, month) = (year - first) * 12 + month - 1.  The arrays are
+memory-mapped on load.  scripts/ephemeris-table.mjs reads the same file
+from Node.
+
+Usage:
+  python scripts/ephemeris_table.py build [--from-year 1400] [--to-year 1500]
+  python scripts/ephemeris_table.py lookup Egypt 1445 9
+  (both take --table PATH before the command; default scripts/ephemeris_table.bin)
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+import ephemeris as eph
+from odeh import v_value
+from yallop import MASTER_LOCATIONS, best_time_geometry, civil_month_start, q_value
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+TABLE_PATH = SCRIPTS_DIR / "ephemeris_table.bin"
+MAGIC = b"HIJEPH01"
+EVENINGS = 2
+CONJUNCTION_LEAD_DAYS = 1.5
+
+
+# ---------------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------------
+def build_arrays(first_year: int, last_year: int) -> dict:
+    years = np.repeat(np.arange(first_year, last_year + 1, dtype=np.int32), 12)
+    months = np.tile(np.arange(1, 13, dtype=np.int32), last_year - first_year + 1)
+    civil = eph.ut_from_datetime64(civil_month_start(years, months))
+    conjunction = eph.nearest_new_moon(civil - CONJUNCTION_LEAD_DAYS)
+    day0 = eph.datetime64_from_ut(conjunction).astype('datetime64[D]')
+    evening = day0[:, None] + np.arange(EVENINGS).astype('timedelta64[D]')
+
+    lats, lons = np.array(list(MASTER_LOCATIONS.values())).T
+    g = best_time_geometry(evening[:, None, :], lats[None, :, None], lons[None, :, None])
+    with np.errstate(invalid='ignore'):
+        q = q_value(g['arcv'], g['width'])
+        v = v_value(g['arcv'], g['width'])
+    return {
+        'hijri_year': years,
+        'hijri_month': months,
+        'conjunction': conjunction,
+        'evening': evening.astype(np.int64).astype(np.int32),
+        'sunset': g['sunset'],
+        'moonset': np.where(np.isnan(g['sunset']), np.nan, g['sunset'] + g['lag'] / 1440.0),
+        'yallop_q': q.astype(np.float32),
+        'odeh_v': v.astype(np.float32),
+    }
+
+
+def write_table(path: Path, first_year: int, last_year: int, arrays: dict):
+    specs, offset = {}, 0
+    for name, arr in arrays.items():
+        specs[name] = {'dtype': arr.dtype.newbyteorder('<').str, 'shape': list(arr.shape),
+                       'offset': offset}
+        offset += -(-arr.nbytes // 8) * 8
+    header = {
+        'hijri_years': [first_year, last_year],
+        'countries': list(MASTER_LOCATIONS),
+        'locations': [list(loc) for loc in MASTER_LOCATIONS.values()],
+        'time_unit': 'ut days since 2000-01-01T12:00Z; evening: days since 1970-01-01',
+        'arrays': specs,
+    }
+    text = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    preamble = MAGIC + struct.pack('<I', len(text)) + text
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(preamble + b'\0' * (-len(preamble) % 8))
+        for name, arr in arrays.items():
+            data = np.ascontiguousarray(arr, dtype=specs[name]['dtype']).tobytes()
+            f.write(data + b'\0' * (-len(data) % 8))
+    os.replace(tmp, path)
+
+
+# ---------------------------------------------------------------------------
+# Load / lookup
+# ---------------------------------------------------------------------------
+class EphemerisTable:
+    """A table file, memory-mapped.  Arrays are attributes (see module doc)."""
+
+    def __init__(self, path: Path = TABLE_PATH):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path}: not an ephemeris table")
+            (length,) = struct.unpack('<I', f.read(4))
+            self.header = json.loads(f.read(length))
+        data_start = -(-(len(MAGIC) + 4 + length) // 8) * 8
+        self.first_year, self.last_year = self.header['hijri_years']
+        self.countries = self.header['countries']
+        self._country_index = {c: i for i, c in enumerate(self.countries)}
+        for name, spec in self.header['arrays'].items():
+            setattr(self, name, np.memmap(self.path, dtype=spec['dtype'], mode='r',
+                                          offset=data_start + spec['offset'],
+                                          shape=tuple(spec['shape'])))
+
+    def row(self, hijri_year, hijri_month):
+        """Row index (or array of indexes) of Hijri months in the table."""
+        y = np.asarray(hijri_year)
+        m = np.asarray(hijri_month)
+        if np.any((y < self.first_year) | (y > self.last_year) | (m < 1) | (m > 12)):
+            raise KeyError(f"Hijri month outside {self.first_year}-{self.last_year}")
+        return (y - self.first_year) * 12 + m - 1
+
+    def column(self, country) -> int:
+        return self._country_index[country]
+
+    def lookup(self, country: str, hijri_year: int, hijri_month: int) -> dict:
+        """Both evenings of one month for one country."""
+        i, c = self.row(hijri_year, hijri_month), self.column(country)
+        evenings = np.datetime64('1970-01-01', 'D') + self.evening[i].astype('timedelta64[D]')
+        return {
+            'conjunction': eph.datetime64_from_ut(self.conjunction[i]).astype('datetime64[s]'),
+            'evenings': [{
+                'date': evenings[e],
+                'sunset': eph.datetime64_from_ut(self.sunset[i, c, e]).astype('datetime64[s]'),
+                'moonset': eph.datetime64_from_ut(self.moonset[i, c, e]).astype('datetime64[s]'),
+                'lag_minutes': float((self.moonset[i, c, e] - self.sunset[i, c, e]) * 1440),
+                'age_hours': float((self.sunset[i, c, e] - self.conjunction[i]) * 24),
+                'yallop_q': float(self.yallop_q[i, c, e]),
+                'odeh_v': float(self.odeh_v[i, c, e]),
+            } for e in range(self.evening.shape[1])],
+        }
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Precomputed crescent ephemeris table.")
+    ap.add_argument("--table", type=Path, default=TABLE_PATH)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    build = sub.add_parser("build", help="compute and write the table")
+    build.add_argument("--from-year", type=int, default=1400)
+    build.add_argument("--to-year", type=int, default=1500)
+    look = sub.add_parser("lookup", help="print one month for one country")
+    look.add_argument("country")
+    look.add_argument("year", type=int)
+    look.add_argument("month", type=int)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        t0 = time.perf_counter()
+        arrays = build_arrays(args.from_year, args.to_year)
+        write_table(args.table, args.from_year, args.to_year, arrays)
+        n = len(arrays['hijri_year'])
+        print(f"{n} lunations x {len(MASTER_LOCATIONS)} cities x {EVENINGS} evenings "
+              f"in {time.perf_counter() - t0:.1f}s")
+        print(f"Saved to {args.table} ({args.table.stat().st_size:,} bytes)")
+    elif args.cmd == "lookup":
+        result = EphemerisTable(args.table).lookup(args.country, args.year, args.month)
+        print(f"Conjunction  {result['conjunction']}Z")
+        for ev in result['evenings']:
+            print(f"  {ev['date']}  sunset {ev['sunset']}Z  moonset {ev['moonset']}Z  "
+                  f"lag {ev['lag_minutes']:6.1f} min  age {ev['age_hours']:5.1f} h  "
+                  f"q {ev['yallop_q']:+.3f}  V {ev['odeh_v']:+.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,30 +7,35 @@ For each sighting report, extracts:
 
 Also extracts country-level announcements/declarations.
 
-Outputs as a pipe-delimited table prepended to the file.
+Writes a standalone fixed-schema CSV, moonsighting_extracted_table.csv, with
+the columns in sighting_records.TABLE_COLUMNS; the text file itself is only read.  The text is
+processed as a stream (see iter_rows), so memory use does not grow with the
+number of years of text.
+
+Usage:
+  python scripts/extract_table_from_text.py [--trace [PATH]] [--trace-top N]
+
+--trace times each month section of the text, per regex family
+(tracing.py).
 """
 
+import argparse
+import functools
 import re
 import sys
 from pathlib import Path
 from datetime import datetime
 
-INPUT = Path(r"C:\Users\saaamar\repos\hijri\scripts\moonsighting_all_text.txt")
-
-HIJRI_MONTH_MAP = {
-    'MUH': ('Muharram', 1),
-    'SFR': ('Safar', 2),
-    'RBA': ("Rabi' al-Awwal", 3),
-    'RBT': ("Rabi' al-Thani", 4),
-    'JMO': ('Jumada al-Ula', 5),
-    'JMT': ('Jumada al-Thani', 6),
-    'RJB': ('Rajab', 7),
-    'SHB': ("Sha'ban", 8),
-    'RMD': ('Ramadan', 9),
-    'SHW': ('Shawwal', 10),
-    'ZQD': ("Dhul Qi'dah", 11),
-    'ZHJ': ('Dhul Hijjah', 12),
-}
+import date_tokens
+import tracing
+from country_matcher import CountryMatcher
+from sighting_records import (COUNTRY_ALIASES, EXTRACTED_TABLE, KNOWN_COUNTRIES,
+                              SightingRecord, write_records)
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+INPUT = SCRIPTS_DIR / "moonsighting_all_text.txt"
+OUTPUT = EXTRACTED_TABLE
+TRACE_JSON = SCRIPTS_DIR / "trace_extract_table_from_text.json"
 
 # Regex patterns
 RE_YEAR = re.compile(r'^#+ YEAR (\d{4}) AH', re.MULTILINE)
@@ -38,21 +43,6 @@ RE_MONTH_SECTION = re.compile(
     r'^== (\d{4}) ([A-Z]{3}) - .+?\(month (\d+)\)',
     re.MULTILINE
 )
-RE_DATE = re.compile(
-    r'^(January|February|March|April|May|June|July|August|September|October|November|December)\s+(\d{1,2}),\s+(\d{4})\s+\(',
-    re.MULTILINE
-)
-# European date format: "Friday, 20 July 2012:" or "Friday 20 July 2012:"
-RE_DATE_EU = re.compile(
-    r'^(?:Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday),?\s+(\d{1,2})\s+'
-    r'(January|February|March|April|May|June|July|August|September|October|November|December)\s+(\d{4})',
-    re.MULTILINE
-)
-# Date format in OFFICIAL sections: "August 21, 2009 (Friday): text..."
-RE_DATE_OFFICIAL = re.compile(
-    r'^(January|February|March|April|May|June|July|August|September|October|November|December)\s+(\d{1,2}),?\s+(\d{4})\s+\(',
-    re.MULTILINE
-)
 RE_REPORTER = re.compile(
     r'^(.+?)\s+reported:\s*$',
     re.MULTILINE
@@ -70,48 +60,19 @@ RE_ANNOUNCEMENT_DECLARED = re.compile(
 RE_COUNTRY_BLOCK = re.compile(
     r'^([A-Z][A-Za-z\s\.\'\-&]+?)(?:\s*\(([^)]+)\))?\s*$',
 )
-
-MONTH_TO_NUM = {
-    'January': 1, 'February': 2, 'March': 3, 'April': 4,
-    'May': 5, 'June': 6, 'July': 7, 'August': 8,
-    'September': 9, 'October': 10, 'November': 11, 'December': 12,
-}
-
-# Known country names and aliases to help parse reporter lines
-KNOWN_COUNTRIES = [
-    'Afghanistan', 'Albania', 'Algeria', 'Angola', 'Argentina', 'Armenia',
-    'Australia', 'Austria', 'Azerbaijan', 'Bahrain', 'Bangladesh', 'Barbados',
-    'Belgium', 'Bolivia', 'Bosnia', 'Brunei', 'Bulgaria', 'Burkina Faso',
-    'Cambodia', 'Cameroon', 'Canada', 'Chad', 'Chile', 'China', 'Colombia',
-    'Croatia', 'Dagestan', 'Denmark', 'Ecuador', 'Egypt', 'Ethiopia',
-    'Fiji', 'Finland', 'France', 'Georgia', 'Germany', 'Ghana', 'Greece',
-    'Guatemala', 'Guyana', 'Hungary', 'Iceland', 'India', 'Indonesia',
-    'Iran', 'Iraq', 'Ireland', 'Italy', 'Jamaica', 'Japan', 'Jordan',
-    'Kazakhstan', 'Kenya', 'Kosovo', 'Kuwait', 'Kyrgyzstan', 'Lebanon',
-    'Libya', 'Luxembourg', 'Macedonia', 'Madagascar', 'Malawi', 'Malaysia',
-    'Mali', 'Mauritania', 'Mauritius', 'Mexico', 'Montenegro', 'Morocco',
-    'Mozambique', 'Myanmar', 'Namibia', 'Nepal', 'Netherlands', 'New Zealand',
-    'Niger', 'Nigeria', 'Norway', 'Oman', 'Pakistan', 'Palestine', 'Panama',
-    'Paraguay', 'Peru', 'Philippines', 'Poland', 'Portugal', 'Qatar',
-    'Romania', 'Russia', 'Saudi Arabia', 'Senegal', 'Serbia', 'Singapore',
-    'Slovakia', 'Slovenia', 'Somalia', 'South Africa', 'South Korea', 'Spain',
-    'Sri Lanka', 'Sudan', 'Suriname', 'Sweden', 'Switzerland', 'Syria',
-    'Taiwan', 'Tajikistan', 'Tanzania', 'Thailand', 'Togo', 'Trinidad',
-    'Trinidad & Tobago', 'Tunisia', 'Turkey', 'Turkmenistan', 'UAE', 'U.A.E.',
-    'Uganda', 'UK', 'USA', 'United Kingdom', 'United States', 'Uzbekistan',
-    'Venezuela', 'Vietnam', 'Yemen', 'Zambia', 'Zimbabwe',
-    # Short/alternate forms found in reports
-    'S. Africa', 'S Africa',
-]
-
-# Map alternate country names to canonical form
-COUNTRY_ALIASES = {
-    'S. Africa': 'South Africa',
-    'S Africa': 'South Africa',
-    'U.A.E.': 'UAE',
-    'United Kingdom': 'UK',
-    'United States': 'USA',
-    'Trinidad': 'Trinidad & Tobago',
+RE_DATE_LIKE = re.compile(r'\w+\s+\d')
+RE_COUNTRY_SPLIT = re.compile(r',\s*|\s+and\s+')
+
+KNOWN_COUNTRY_MATCHER = CountryMatcher(KNOWN_COUNTRIES)
+
+# Regex families timed per month section with --trace (see tracing.py); the
+# date tokenizer's "dates" family is in date_tokens.TRACE_FAMILIES
+TRACE_FAMILIES = {
+    'headers': ('RE_YEAR', 'RE_MONTH_SECTION'),
+    'dates': ('RE_DATE_LIKE',),
+    'reports': ('RE_REPORTER', 'RE_STATUS'),
+    'declarations': ('RE_ANNOUNCEMENT_DECLARED', 'RE_COUNTRY_SPLIT'),
+    'country_blocks': ('RE_COUNTRY_BLOCK',),
 }
 
 # US state abbreviations or names that indicate USA
@@ -134,83 +95,127 @@ US_STATES = {
 }
 
 
-def parse_location(location_str):
-    """Parse location string after '(MCW member)' or from reporter line.
-    Returns (city, country)."""
-    loc = location_str.strip().rstrip('.')
-    if not loc:
-        return ('', '')
-
-    # Remove leading "from " or "from near "
-    loc = re.sub(r'^from\s+(near\s+)?', '', loc, flags=re.IGNORECASE).strip()
-
-    # Check for country in parentheses, e.g. "AVIGNON (south FRANCE)"
-    paren_country = re.search(r'\(.*?(' + '|'.join(re.escape(c) for c in KNOWN_COUNTRIES) + r')\s*\)', loc, re.IGNORECASE)
-    if paren_country:
-        country = paren_country.group(1)
-        city = re.sub(r'\s*\([^)]*\)', '', loc).strip()
-        canonical = COUNTRY_ALIASES.get(country, country)
-        return (city, canonical)
+# US-style "City, Province" suffixes that indicate Canada
+CANADIAN_PROVINCES = {'Ontario', 'Quebec', 'British Columbia', 'Alberta',
+                      'Manitoba', 'Saskatchewan', 'Nova Scotia',
+                      'New Brunswick', 'Newfoundland', 'PEI', 'BC', 'ON', 'QC', 'AB'}
+
+# Known city->country mappings for common reporter locations without country
+CITY_COUNTRY = {
+    'Berlin': 'Germany',
+    'Hamburg': 'Germany',
+    'Munich': 'Germany',
+    'Oxford': 'UK',
+    'London': 'UK',
+    'Paris': 'France',
+    'Brampton': 'Canada',
+    'Mississauga': 'Canada',
+    'Toronto': 'Canada',
+    'Montreal': 'Canada',
+    'Vancouver': 'Canada',
+    'Ottawa': 'Canada',
+    'Peterborough Ontario': 'Canada',
+    'AVIGNON': 'France',
+    'St. Thomas, Virgin Islands': 'USA',
+}
 
-    # Try known countries (longest first to match "South Africa" before "South")
-    sorted_countries = sorted(KNOWN_COUNTRIES, key=len, reverse=True)
-    for country in sorted_countries:
-        if loc.endswith(country):
-            city_part = loc[:len(loc) - len(country)].strip().rstrip(',').strip()
+# Longest first, so "South Africa" wins over "South" style prefixes
+COUNTRIES_LONGEST_FIRST = sorted(KNOWN_COUNTRIES, key=len, reverse=True)
+COUNTRY_IN_LINE_MATCHER = CountryMatcher(COUNTRIES_LONGEST_FIRST)
+
+RE_FROM_PREFIX = re.compile(r'^from\s+(near\s+)?', re.IGNORECASE)
+RE_PAREN = re.compile(r'\s*\([^)]*\)')
+RE_MCW_MEMBER = re.compile(r'\(MCW member\)\s*(.*)')
+RE_IMAM_PREFIX = re.compile(r'^(?:Imam\s+of\s+\S+\s+\S+\s+(?:Mosque|Masjid)\s*)')
+RE_FROM_LOCATION = re.compile(r'\bfrom\s+(.*)', re.IGNORECASE)
+RE_AFTER_PAREN = re.compile(r'\)\s*(.*)')
+
+
+class LocationResolver:
+    """Resolves reporter location strings to (city, country).
+
+    Everything derived from the country/state/city tables is built once:
+    the parenthesised-country regex, a lower-case suffix index for the
+    "ends with a country" check, and the city table.  Results are memoised
+    per location string, since the same reporters post month after month.
+    """
+
+    def __init__(self, cache_size=8192):
+        # Check for country in parentheses, e.g. "AVIGNON (south FRANCE)"
+        self._paren_country = re.compile(
+            r'\(.*?(' + '|'.join(re.escape(c) for c in KNOWN_COUNTRIES) + r')\s*\)',
+            re.IGNORECASE)
+        # lower-case country -> first spelling in longest-first order
+        self._suffix_index = {}
+        for country in COUNTRIES_LONGEST_FIRST:
+            self._suffix_index.setdefault(country.lower(), country)
+        self._suffix_lengths = sorted({len(c) for c in self._suffix_index}, reverse=True)
+        self.resolve = functools.lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _country_suffix(self, loc):
+        """Longest known country that loc ends with (case-insensitive)."""
+        lower = loc.lower()
+        for n in self._suffix_lengths:
+            country = self._suffix_index.get(lower[-n:])
+            if country is not None:
+                return country
+        return None
+
+    def _resolve(self, loc):
+        if not loc:
+            return ('', '')
+
+        # Remove leading "from " or "from near "
+        loc = RE_FROM_PREFIX.sub('', loc).strip()
+
+        paren_country = self._paren_country.search(loc)
+        if paren_country:
+            country = paren_country.group(1)
+            city = RE_PAREN.sub('', loc).strip()
             canonical = COUNTRY_ALIASES.get(country, country)
-            return (city_part, canonical)
-        # Also try case-insensitive
-        if loc.lower().endswith(country.lower()):
+            return (city, canonical)
+
+        # Known country at the end of the string
+        country = self._country_suffix(loc)
+        if country is not None:
             city_part = loc[:len(loc) - len(country)].strip().rstrip(',').strip()
             canonical = COUNTRY_ALIASES.get(country, country)
             return (city_part, canonical)
 
-    # Check if last token is a US state abbreviation/name or Canadian province
-    CANADIAN_PROVINCES = {'Ontario', 'Quebec', 'British Columbia', 'Alberta',
-                          'Manitoba', 'Saskatchewan', 'Nova Scotia',
-                          'New Brunswick', 'Newfoundland', 'PEI', 'BC', 'ON', 'QC', 'AB'}
-    parts = loc.split(',')
-    last_part = parts[-1].strip() if parts else loc
-    if last_part in US_STATES:
-        city_part = ','.join(parts[:-1]).strip() if len(parts) > 1 else ''
-        return (city_part, 'USA')
-    if last_part in CANADIAN_PROVINCES:
-        city_part = ','.join(parts[:-1]).strip() if len(parts) > 1 else ''
-        return (city_part, 'Canada')
-    # Also check if the last word(s) of the whole string match a US state
-    words = loc.split()
-    for n in (2, 1):  # try 2-word states first ("New York"), then single
-        if len(words) >= n + 1:
-            candidate = ' '.join(words[-n:])
-            if candidate in US_STATES:
-                city_part = ' '.join(words[:-n]).rstrip(',').strip()
-                return (city_part, 'USA')
-
-    # Known city->country mappings for common reporter locations without country
-    CITY_COUNTRY = {
-        'Berlin': 'Germany',
-        'Hamburg': 'Germany',
-        'Munich': 'Germany',
-        'Oxford': 'UK',
-        'London': 'UK',
-        'Paris': 'France',
-        'Brampton': 'Canada',
-        'Mississauga': 'Canada',
-        'Toronto': 'Canada',
-        'Montreal': 'Canada',
-        'Vancouver': 'Canada',
-        'Ottawa': 'Canada',
-        'Peterborough Ontario': 'Canada',
-        'AVIGNON': 'France',
-        'St. Thomas, Virgin Islands': 'USA',
-    }
-    # Check if the location is or starts with a known city
-    for city_name, country_name in CITY_COUNTRY.items():
-        if loc == city_name or loc.startswith(city_name + ',') or loc.startswith(city_name + ' '):
-            return (loc, country_name)
-
-    # Fallback: treat whole string as location
-    return (loc, '')
+        # Check if last token is a US state abbreviation/name or Canadian province
+        parts = loc.split(',')
+        last_part = parts[-1].strip() if parts else loc
+        if last_part in US_STATES:
+            city_part = ','.join(parts[:-1]).strip() if len(parts) > 1 else ''
+            return (city_part, 'USA')
+        if last_part in CANADIAN_PROVINCES:
+            city_part = ','.join(parts[:-1]).strip() if len(parts) > 1 else ''
+            return (city_part, 'Canada')
+        # Also check if the last word(s) of the whole string match a US state
+        words = loc.split()
+        for n in (2, 1):  # try 2-word states first ("New York"), then single
+            if len(words) >= n + 1:
+                candidate = ' '.join(words[-n:])
+                if candidate in US_STATES:
+                    city_part = ' '.join(words[:-n]).rstrip(',').strip()
+                    return (city_part, 'USA')
+
+        # Check if the location is or starts with a known city
+        for city_name, country_name in CITY_COUNTRY.items():
+            if loc == city_name or loc.startswith(city_name + ',') or loc.startswith(city_name + ' '):
+                return (loc, country_name)
+
+        # Fallback: treat whole string as location
+        return (loc, '')
+
+
+LOCATION_RESOLVER = LocationResolver()
+
+
+def parse_location(location_str):
+    """Parse location string after '(MCW member)' or from reporter line.
+    Returns (city, country)."""
+    return LOCATION_RESOLVER.resolve(location_str.strip().rstrip('.'))
 
 
 def extract_reporter_location(line):
@@ -222,76 +227,94 @@ def extract_reporter_location(line):
     line = line.replace('reported:', '').strip()
 
     # Try to extract after "(MCW member)"
-    mcw_match = re.search(r'\(MCW member\)\s*(.*)', line)
+    mcw_match = RE_MCW_MEMBER.search(line)
     if mcw_match:
         loc = mcw_match.group(1).strip()
         # Strip leading role/title prefixes like "Imam of ... Mosque"
-        loc = re.sub(r'^(?:Imam\s+of\s+\S+\s+\S+\s+(?:Mosque|Masjid)\s*)', '', loc).strip()
+        loc = RE_IMAM_PREFIX.sub('', loc).strip()
         return parse_location(loc)
 
     # Try "from Location"
-    from_match = re.search(r'\bfrom\s+(.*)', line, re.IGNORECASE)
+    from_match = RE_FROM_LOCATION.search(line)
     if from_match:
         loc = from_match.group(1).strip()
         return parse_location(loc)
 
     # Try after last comma or parenthetical
     # e.g. "Dr. Khaja Muzaffaruddin, Retired Prof OU, Hyderabad, India"
-    paren_match = re.search(r'\)\s*(.*)', line)
+    paren_match = RE_AFTER_PAREN.search(line)
     if paren_match:
         loc = paren_match.group(1).strip()
         if loc:
             return parse_location(loc)
 
-    # Fallback: try to find country in the whole line
-    sorted_countries = sorted(KNOWN_COUNTRIES, key=len, reverse=True)
-    for country in sorted_countries:
-        if country in line:
-            idx = line.rfind(country)
-            before = line[:idx].strip()
-            # Try to get city from the part before country
-            # Take last comma-separated part
-            parts = before.split(',')
-            city = parts[-1].strip() if parts else ''
-            canonical = COUNTRY_ALIASES.get(country, country)
-            return (city, canonical)
+    # Fallback: try to find country in the whole line (longest name first)
+    country = COUNTRY_IN_LINE_MATCHER.first_contained(line)
+    if country is not None:
+        idx = line.rfind(country)
+        before = line[:idx].strip()
+        # Try to get city from the part before country
+        # Take last comma-separated part
+        parts = before.split(',')
+        city = parts[-1].strip() if parts else ''
+        canonical = COUNTRY_ALIASES.get(country, country)
+        return (city, canonical)
 
     return ('', '')
 
 
-def main():
-    text = INPUT.read_text(encoding='utf-8', errors='replace')
-
-    # Strip any previously prepended table (starts with "year_greg|" header)
-    if text.startswith('year_greg|'):
-        # Find the first line that starts with "# YEAR" (beginning of actual content)
-        idx = text.find('\n# YEAR ')
-        if idx == -1:
-            idx = text.find('\n== ')
-        if idx != -1:
-            # Also skip any blank lines between table and content
-            text = text[idx:].lstrip('\n')
-            print(f"Stripped existing table, content starts at char {idx}")
-
-    lines = text.split('\n')
-
-    rows = []  # (year_greg, month_greg, day_greg, year_hijri, month_hijri, country, city, status)
-
+def iter_content_lines(f):
+    """Yield the lines of an open text file, skipping a table that older
+    versions of this script prepended to it (starts with the "year_greg|"
+    header, ends before "# YEAR")."""
+    first = f.readline()
+    if not first.startswith('year_greg|'):
+        if first:
+            yield first
+        yield from f
+        return
+    skipped = len(first)
+    for line in f:
+        if line.startswith('# YEAR ') or line.startswith('== '):
+            print(f"Stripped existing table, content starts at char {skipped - 1}")
+            yield line
+            break
+        skipped += len(line)
+    yield from f
+
+
+def section_layout(sources: set) -> str:
+    """Trace layout of a month section, named as the scraper names pages:
+    country blocks are the flattened cells of an official table, reporter
+    lines are the list layout."""
+    return ('table' if 'country_blocks' in sources else 'list' if 'reports' in sources
+            else 'announcements' if 'declarations' in sources else 'none')
+
+
+def iter_rows(lines):
+    """State machine over the text lines; yields one SightingRecord per
+    report or declaration as soon as it is complete.
+
+    `lines` can be any iterable (e.g. an open file); only one line of
+    lookahead is held, so memory does not grow with the input.
+    """
     current_hijri_year = None
     current_hijri_month_num = None
     current_greg_year = None
     current_greg_month = None
     current_greg_day = None
+    section_sources = set()     # record kinds in this month section, for --trace
 
-    i = 0
-    while i < len(lines):
-        line = lines[i].rstrip()
+    it = iter(lines)
+    lookahead = next(it, None)
+    while lookahead is not None:
+        line = lookahead.rstrip()
+        lookahead = next(it, None)
 
         # Check for Hijri year header
         year_m = RE_YEAR.match(line)
         if year_m:
             current_hijri_year = int(year_m.group(1))
-            i += 1
             continue
 
         # Check for month section header
@@ -299,47 +322,39 @@ def main():
         if month_m:
             current_hijri_year = int(month_m.group(1))
             current_hijri_month_num = int(month_m.group(3))
-            i += 1
+            tracing.set_layout(section_layout(section_sources))
+            section_sources = set()
+            tracing.page(f"{month_m.group(1)}{month_m.group(2).lower()}")
             continue
 
-        # Check for Gregorian date line (American format: "August 30, 2011 (...")
-        date_m = RE_DATE.match(line)
-        if date_m:
-            current_greg_month = MONTH_TO_NUM[date_m.group(1)]
-            current_greg_day = int(date_m.group(2))
-            current_greg_year = int(date_m.group(3))
-            i += 1
-            continue
-
-        # Check for European date format: "Friday, 20 July 2012:" or "Friday 20 July 2012:"
-        date_eu_m = RE_DATE_EU.match(line)
-        if date_eu_m:
-            current_greg_day = int(date_eu_m.group(1))
-            current_greg_month = MONTH_TO_NUM[date_eu_m.group(2)]
-            current_greg_year = int(date_eu_m.group(3))
-            i += 1
+        # Check for Gregorian date line: American "August 30, 2011 (..." or
+        # European "Friday, 20 July 2012:" / "Friday 20 July 2012:"
+        header = date_tokens.header_date(line)
+        if header:
+            current_greg_year = header.year
+            current_greg_month = header.month
+            current_greg_day = header.day
             continue
 
         # Check for reporter line
         reporter_m = RE_REPORTER.match(line)
         if reporter_m:
-            reporter_text = reporter_m.group(1)
             city, country = extract_reporter_location(line)
 
-            # Next non-empty line should be the status
-            j = i + 1
+            # Next non-empty line should be the status (consumed either way)
             status = ''
-            while j < len(lines):
-                next_line = lines[j].strip()
+            while lookahead is not None:
+                next_line = lookahead.strip()
+                lookahead = next(it, None)
                 if next_line:
                     status_m = RE_STATUS.match(next_line)
                     if status_m:
                         status = status_m.group(1)
                     break
-                j += 1
 
             if status and current_greg_year and current_hijri_year:
-                rows.append((
+                section_sources.add('reports')
+                yield SightingRecord(
                     current_greg_year,
                     current_greg_month,
                     current_greg_day,
@@ -348,11 +363,8 @@ def main():
                     country,
                     city,
                     status
-                ))
-
-            i = j + 1 if j < len(lines) else i + 1
+                )
             continue
-
         # Check for announcement/declaration lines
         # Pattern: "Country declared MonthName D, YYYY hijri to be on..."
         decl_m = RE_ANNOUNCEMENT_DECLARED.match(line)
@@ -362,28 +374,23 @@ def main():
             rest = decl_m.group(2)
 
             # Try to extract the declared date
-            date_in_decl = re.search(
-                r'(?:on\s+)?(?:Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday),?\s+'
-                r'(January|February|March|April|May|June|July|August|September|October|November|December)'
-                r'\s+(\d{1,2}),?\s+(\d{4})',
-                rest
-            )
+            # ("... to be on Tuesday, December 30, 2008.")
+            date_in_decl = date_tokens.weekday_date(rest)
             greg_yr = current_greg_year
             greg_mn = current_greg_month
             greg_dy = current_greg_day
             if date_in_decl:
-                greg_mn = MONTH_TO_NUM[date_in_decl.group(1)]
-                greg_dy = int(date_in_decl.group(2))
-                greg_yr = int(date_in_decl.group(3))
+                greg_yr, greg_mn, greg_dy = date_in_decl.year, date_in_decl.month, date_in_decl.day
 
             # Split multiple countries
             # "India, Pakistan and Bangladesh"
-            countries = re.split(r',\s*|\s+and\s+', country_part)
+            countries = RE_COUNTRY_SPLIT.split(country_part)
             for c in countries:
                 c = c.strip()
                 if c and len(c) > 1:
                     canonical = COUNTRY_ALIASES.get(c, c)
-                    rows.append((
+                    section_sources.add('declarations')
+                    yield SightingRecord(
                         greg_yr,
                         greg_mn,
                         greg_dy,
@@ -392,8 +399,7 @@ def main():
                         canonical,
                         '',
                         'Official Declaration'
-                    ))
-            i += 1
+                    )
             continue
 
         # Check for country block declarations (in Eid/Official sections etc.)
@@ -407,14 +413,9 @@ def main():
             method = (country_block_m.group(2) or '').strip()
 
             # Check if country_name is a known country or starts with one
-            is_country = False
-            matched_country = country_name
-            for kc in KNOWN_COUNTRIES:
-                if country_name == kc or country_name.startswith(kc):
-                    is_country = True
-                    matched_country = kc
-                    break
-            if is_country and len(country_name) < 60:
+            # (first match in KNOWN_COUNTRIES order)
+            matched_country = KNOWN_COUNTRY_MATCHER.first_prefix(country_name)
+            if matched_country is not None and len(country_name) < 60:
                 canonical = COUNTRY_ALIASES.get(matched_country, matched_country)
 
                 # Case 1: Line has a method in parentheses → standalone declaration
@@ -432,7 +433,8 @@ def main():
                     else:
                         status_text = method
 
-                    rows.append((
+                    section_sources.add('country_blocks')
+                    yield SightingRecord(
                         current_greg_year,
                         current_greg_month,
                         current_greg_day,
@@ -441,14 +443,13 @@ def main():
                         canonical,
                         '',
                         status_text
-                    ))
-                    i += 1  # Don't consume next line
-                    continue
+                    )
+                    continue  # Don't consume next line
 
                 # Case 2: No method in parens → check next line for ???? or date
-                if i + 1 < len(lines):
-                    next_line = lines[i + 1].strip()
-                    if next_line and (next_line == '????' or re.match(r'\w+\s+\d', next_line)):
+                if lookahead is not None:
+                    next_line = lookahead.strip()
+                    if next_line and (next_line == '????' or RE_DATE_LIKE.match(next_line)):
                         status_text = next_line
                         if status_text == '????':
                             status_text = 'Pending/Unknown'
@@ -456,20 +457,16 @@ def main():
                             status_text = f'Declaration: {status_text}'
 
                         # Try to extract a date from the status line
-                        decl_date = re.search(
-                            r'(January|February|March|April|May|June|July|August|September|October|November|December)'
-                            r'\s+(\d{1,2}),?\s+(\d{4})',
-                            status_text
-                        )
+                        # ("Shawwal 1, 1438 AH: Saturday, June 26, 2017")
+                        decl_date = date_tokens.month_date(status_text)
                         greg_yr = current_greg_year
                         greg_mn = current_greg_month
                         greg_dy = current_greg_day
                         if decl_date:
-                            greg_mn = MONTH_TO_NUM[decl_date.group(1)]
-                            greg_dy = int(decl_date.group(2))
-                            greg_yr = int(decl_date.group(3))
+                            greg_yr, greg_mn, greg_dy = decl_date.year, decl_date.month, decl_date.day
 
-                        rows.append((
+                        section_sources.add('country_blocks')
+                        yield SightingRecord(
                             greg_yr,
                             greg_mn,
                             greg_dy,
@@ -478,26 +475,31 @@ def main():
                             canonical,
                             '',
                             status_text
-                        ))
-                        i += 2
+                        )
+                        lookahead = next(it, None)  # consumed the status line
                         continue
 
-        i += 1
-
-    # Build table
-    header = "year_greg|month_greg|day_greg|year_hijri|month_hijri|country|city|status"
-    table_lines = [header]
-    for row in rows:
-        table_lines.append(
-            f"{row[0]}|{row[1]}|{row[2]}|{row[3]}|{row[4]}|{row[5]}|{row[6]}|{row[7]}"
-        )
-
-    table_text = '\n'.join(table_lines)
-
-    # Prepend to the file
-    new_content = table_text + '\n\n' + text
-    INPUT.write_text(new_content, encoding='utf-8')
-    print(f"Extracted {len(rows)} rows. Table prepended to {INPUT}")
+    tracing.set_layout(section_layout(section_sources))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Extract the sighting table from the text file.")
+    tracing.add_arguments(ap, TRACE_JSON)
+    args = ap.parse_args(argv)
+    if args.trace:
+        tracing.enable()
+        tracing.time_patterns(globals(), TRACE_FAMILIES)
+        tracing.time_patterns(vars(date_tokens), date_tokens.TRACE_FAMILIES)
+
+    # Rows are written as they are found; nothing is held in memory beyond
+    # the current line.  write_records goes through a temp file so readers
+    # never see a half-written table.
+    with open(INPUT, encoding='utf-8', errors='replace') as src:
+        count = write_records(OUTPUT, iter_rows(iter_content_lines(src)))
+    tracing.end_page()
+    print(f"Extracted {count} rows. Written {OUTPUT}")
+    if args.trace:
+        tracing.print_summary(args.trace, args.trace_top)
 
 
 if __name__ == '__main__':
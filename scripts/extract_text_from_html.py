@@ -1,15 +1,25 @@
 """
 extract_text_from_html.py
 
-Reads all downloaded moonsighting HTML files and produces one big .txt file
-with the text content organized by year and month.
+Reads all downloaded moonsighting pages from the page archive and produces
+one big .txt file with the text content organized by year and month.
+
+Usage:
+  python scripts/extract_text_from_html.py [--trace [PATH]] [--trace-top N]
+
+--trace records per-page read / parse / text / trim timings (tracing.py).
 """
 
+import argparse
 from pathlib import Path
-from bs4 import BeautifulSoup
 
-HTML_DIR = Path(__file__).resolve().parent / "moonsighting_html"
-OUT_FILE = Path(__file__).resolve().parent / "moonsighting_all_text.txt"
+import tracing
+from page_archive import PageArchive
+from page_document import PageDocument
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+OUT_FILE = SCRIPTS_DIR / "moonsighting_all_text.txt"
+TRACE_JSON = SCRIPTS_DIR / "trace_extract_text_from_html.json"
 
 MONTH_CODES = ["muh", "sfr", "rba", "rbt", "jmo", "jmt",
                "rjb", "shb", "rmd", "shw", "zqd", "zhj"]
@@ -25,38 +35,67 @@ END_YEAR = 1447
 
 
 def extract_text(html: str) -> str:
-    soup = BeautifulSoup(html, "html.parser")
-    # Remove script/style
-    for tag in soup(["script", "style"]):
-        tag.decompose()
-    return soup.get_text("\n", strip=True)
-
-
-def main():
+    # PageDocument drops script/style before flattening
+    doc = PageDocument(html)
+    with tracing.span("parse"):
+        doc.parse()
+    with tracing.span("text"):
+        return doc.text
+
+
+def trim_navigation(text: str) -> str:
+    """Trim navigation boilerplate from the top and bottom of a page's text."""
+    # Top nav usually ends before "Moonsighting for" or "The Astronomical"
+    start_markers = ["Moonsighting for", "The Astronomical", "Al urjoonul"]
+    for marker in start_markers:
+        idx = text.find(marker)
+        if idx > 0:
+            text = text[idx:]
+            break
+
+    # Bottom nav usually starts with "Home Moon" or "top Back to Top"
+    end_markers = ["top\nBack to Top", "top Back to Top", "\nHome\nMoon"]
+    for marker in end_markers:
+        idx = text.find(marker)
+        if idx > 0:
+            text = text[:idx]
+            break
+    return text
+
+
+def year_header(year: int) -> list[str]:
+    return [f"{'#'*80}", f"# YEAR {year} AH", f"{'#'*80}", ""]
+
+
+def month_header(year: int, code: str) -> list[str]:
+    month_num = MONTH_CODES.index(code) + 1
+    return [f"{'='*70}",
+            f"== {year} {code.upper()} - {MONTH_NAMES[code]} (month {month_num})",
+            f"== Source: {year}{code}.html",
+            f"{'='*70}"]
+
+
+def build_lines(archive) -> list[str]:
+    """The output file's lines for every page of START_YEAR..END_YEAR;
+    `archive` is anything with get(year, code) -> html or None."""
     lines = []
     for year in range(START_YEAR, END_YEAR + 1):
-        lines.append(f"{'#'*80}")
-        lines.append(f"# YEAR {year} AH")
-        lines.append(f"{'#'*80}")
-        lines.append("")
+        lines += year_header(year)
 
         for code in MONTH_CODES:
-            month_num = MONTH_CODES.index(code) + 1
-            name = MONTH_NAMES[code]
-            filepath = HTML_DIR / f"{year}{code}.html"
+            tracing.page(f"{year}{code}")
+            with tracing.span("read"):
+                html = archive.get(year, code)
 
-            lines.append(f"{'='*70}")
-            lines.append(f"== {year} {code.upper()} - {name} (month {month_num})")
-            lines.append(f"== Source: {year}{code}.html")
-            lines.append(f"{'='*70}")
+            lines += month_header(year, code)
 
-            if not filepath.exists():
+            if html is None:
                 lines.append("[FILE NOT FOUND - page returned 404]")
                 lines.append("")
                 continue
 
-            html = filepath.read_text(encoding="utf-8", errors="replace")
             size = len(html)
+            tracing.set_layout("table" if "<table" in html else "list")
 
             if size < 500:
                 lines.append(f"[STUB PAGE - only {size} bytes]")
@@ -65,30 +104,31 @@ def main():
 
             text = extract_text(html)
 
-            # Trim navigation boilerplate from top and bottom
-            # Top nav usually ends before "Moonsighting for" or "The Astronomical"
-            start_markers = ["Moonsighting for", "The Astronomical", "Al urjoonul"]
-            for marker in start_markers:
-                idx = text.find(marker)
-                if idx > 0:
-                    text = text[idx:]
-                    break
-
-            # Bottom nav usually starts with "Home Moon" or "top Back to Top"
-            end_markers = ["top\nBack to Top", "top Back to Top", "\nHome\nMoon"]
-            for marker in end_markers:
-                idx = text.find(marker)
-                if idx > 0:
-                    text = text[:idx]
-                    break
-
+            with tracing.span("trim"):
+                text = trim_navigation(text)
+            tracing.end_page()
             lines.append(text)
             lines.append("")
 
+    tracing.end_page()
+    return lines
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Flatten the archived pages into one text file.")
+    tracing.add_arguments(ap, TRACE_JSON)
+    args = ap.parse_args(argv)
+    if args.trace:
+        tracing.enable()
+
+    with PageArchive() as archive:
+        lines = build_lines(archive)
     output = "\n".join(lines)
     OUT_FILE.write_text(output, encoding="utf-8")
     size_mb = len(output) / (1024 * 1024)
     print(f"Written {OUT_FILE} ({size_mb:.1f} MB, {len(lines)} lines)")
+    if args.trace:
+        tracing.print_summary(args.trace, args.trace_top)
 
 
 if __name__ == "__main__":
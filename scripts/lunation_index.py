@@ -0,0 +1,166 @@
+"""
+lunation_index.py
+
+Gregorian day -> Hijri month lookups against a fixed-width, memory-mapped
+array of month-start Julian Day Numbers, instead of re-deriving the month
+arithmetically or searching the ephemeris per row.
+
+scripts/lunation_index.npy is an int32 array of shape (2, 12 * LAST_YEAR),
+where column i = 12 * (hijri_year - 1) + (hijri_month - 1):
+  row 0 (CIVIL)        JDN of day 1 of the month in the tabular calendar
+                       (civil.ts hijriCivilToJdn)
+  row 1 (CONJUNCTION)  JDN of the UTC day of the conjunction that begins the
+                       lunation (the new moon nearest the civil start less
+                       1.5 days, as in ephemeris_table.py)
+Both rows are strictly increasing, so a day's month is a bisection:
+~15 probes of the memory-mapped file, no arrays allocated.  The batch
+variants take a NumPy array and do one np.searchsorted.
+
+The file is generated, not committed: build it with `build` (or the
+pipeline's lunation_index stage; a fraction of a second).  Opening a
+missing index is an error, so read-only callers never write into the
+source tree.  Conjunction days before ~1600 CE rest on an extrapolated
+delta-T and may be off by a day when the conjunction is near midnight UTC.
+
+  index = LunationIndex()
+  index.civil_month(jdn)            # (year, month, day) in the civil calendar
+  index.lunation(jdn)               # (year, month, days since conjunction day)
+  index.civil_months(jdns)          # arrays, for a whole column at once
+
+Usage:
+  python scripts/lunation_index.py build
+  python scripts/lunation_index.py lookup 2024-03-11 1990-01-01 ...
+"""
+
+import argparse
+import sys
+from bisect import bisect_right
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+import ephemeris as eph
+from ephemeris_table import CONJUNCTION_LEAD_DAYS
+from yallop import civil_month_start
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+INDEX_PATH = SCRIPTS_DIR / "lunation_index.npy"
+
+LAST_YEAR = 1600
+CIVIL, CONJUNCTION = 0, 1
+UNIX_EPOCH_JDN = 2440588
+J2000_JDN = 2451545
+
+
+def jdn(d: date) -> int:
+    return d.toordinal() + 1721425
+
+
+def jdns(dates) -> np.ndarray:
+    """datetime64[D]-compatible array -> int64 JDNs."""
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64) + UNIX_EPOCH_JDN
+
+
+def build_index(last_year: int = LAST_YEAR) -> np.ndarray:
+    n = np.arange(12 * last_year)
+    starts = civil_month_start(n // 12 + 1, n % 12 + 1)
+    civil = starts.astype(np.int64) + UNIX_EPOCH_JDN
+    conj = eph.nearest_new_moon(eph.ut_from_datetime64(starts) - CONJUNCTION_LEAD_DAYS)
+    conj_day = np.floor(conj + 0.5).astype(np.int64) + J2000_JDN
+    index = np.stack([civil, conj_day]).astype(np.int32)
+    for row in index:
+        if np.any(np.diff(row) <= 0):
+            raise AssertionError("month starts are not strictly increasing")
+    return index
+
+
+def save_index(path: Path = INDEX_PATH, last_year: int = LAST_YEAR) -> np.ndarray:
+    index = build_index(last_year)
+    path = Path(path)
+    tmp = path.with_name(path.stem + '.tmp.npy')
+    np.save(tmp, index)
+    tmp.replace(path)
+    return index
+
+
+class LunationIndex:
+    def __init__(self, path: Path = INDEX_PATH):
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(
+                f"{path} not found; build it with `python scripts/lunation_index.py build`")
+        self.starts = np.load(path, mmap_mode='r')
+        self.civil = self.starts[CIVIL]
+        self.conjunction = self.starts[CONJUNCTION]
+        self.size = self.starts.shape[1]
+
+    # -- one day ------------------------------------------------------------
+    def _find(self, row, day: int) -> tuple[int, int, int]:
+        i = bisect_right(row, day) - 1
+        if i < 0 or i >= self.size - 1:
+            raise KeyError(f"JDN {day} outside AH 1-{self.size // 12 - 1}")
+        return i // 12 + 1, i % 12 + 1, day - int(row[i])
+
+    def civil_month(self, day: int) -> tuple[int, int, int]:
+        """(hijri_year, hijri_month, day_of_month) in the tabular calendar;
+        the port of civil.ts gregorianToHijriCivil, given a JDN."""
+        y, m, offset = self._find(self.civil, day)
+        return y, m, offset + 1
+
+    def lunation(self, day: int) -> tuple[int, int, int]:
+        """(hijri_year, hijri_month, days since the conjunction day) of the
+        lunation containing JDN `day`."""
+        return self._find(self.conjunction, day)
+
+    def civil_start(self, hijri_year: int, hijri_month: int) -> int:
+        return int(self.civil[12 * (hijri_year - 1) + hijri_month - 1])
+
+    def conjunction_day(self, hijri_year: int, hijri_month: int) -> int:
+        return int(self.conjunction[12 * (hijri_year - 1) + hijri_month - 1])
+
+    # -- arrays -------------------------------------------------------------
+    def _find_many(self, row, days) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        days = np.asarray(days, dtype=np.int64)
+        i = np.searchsorted(row, days, side='right') - 1
+        if np.any((i < 0) | (i >= self.size - 1)):
+            raise KeyError(f"JDN outside AH 1-{self.size // 12 - 1}")
+        return i // 12 + 1, i % 12 + 1, days - row[i]
+
+    def civil_months(self, days):
+        """civil_month over an array of JDNs: (years, months, days) arrays."""
+        y, m, offset = self._find_many(self.civil, days)
+        return y, m, offset + 1
+
+    def lunations(self, days):
+        """lunation over an array of JDNs: (years, months, ages) arrays."""
+        return self._find_many(self.conjunction, days)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Gregorian -> Hijri month lookups.")
+    ap.add_argument("--index", type=Path, default=INDEX_PATH)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("build", help="(re)build the index file")
+    look = sub.add_parser("lookup", help="civil month and lunation of Gregorian dates")
+    look.add_argument("dates", nargs="+", type=date.fromisoformat)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        index = save_index(args.index)
+        print(f"{index.shape[1]} months (AH 1-{LAST_YEAR}) -> {args.index}")
+    elif args.cmd == "lookup":
+        index = LunationIndex(args.index)
+        for d in args.dates:
+            y, m, day = index.civil_month(jdn(d))
+            ly, lm, age = index.lunation(jdn(d))
+            print(f"{d}  civil {y}-{m:02d}-{day:02d}  "
+                  f"lunation {ly}-{lm:02d} (+{age} d from the conjunction day)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
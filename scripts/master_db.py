@@ -0,0 +1,233 @@
+"""
+master_db.py
+
+Optional SQLite copy of the month-start dataset, built from the CSVs in
+docs/data-collection/.  The CSVs stay the source of truth; the database is
+for indexed lookups and report queries over the year x country grid.
+
+Tables:
+  month_starts   hijri_month_starts_template_1400_1447.csv, one row per line
+  conflicts      conflicting_declarations_template.csv, plus the alternative
+                 dates merge_into_master.py --db records for each merged row
+  csv_meta       header and line ending of each imported file
+
+Indexes: month_starts (Country, HijriYear, HijriMonth) unique, RecordId
+unique, GregorianStartDate, Method; conflicts (Country, HijriYear,
+HijriMonth) and PreferredRecordId.
+
+Every value is kept as the text it had in the CSV (HijriYear/HijriMonth are
+INTEGER, which reads back identically for canonical numbers), and rows keep
+their file order, so `export` after `import` reproduces both files byte for
+byte.  `import` checks that before committing.
+
+Usage:
+  python scripts/master_db.py import [--db scripts/hijri_month_starts.db]
+  python scripts/master_db.py export [--db ...] [--out-dir docs/data-collection]
+  python scripts/master_db.py query "SELECT Country, COUNT(*) FROM month_starts
+                                     WHERE GregorianStartDate != '' GROUP BY 1"
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+from master_store import MASTER_CSV, ROOT
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+DB_PATH = SCRIPTS_DIR / "hijri_month_starts.db"
+DATA_DIR = ROOT / 'docs' / 'data-collection'
+CONFLICTS_CSV = DATA_DIR / 'conflicting_declarations_template.csv'
+
+MONTH_START_COLUMNS = [
+    'Country', 'City', 'HijriYear', 'HijriMonth', 'HijriMonthName',
+    'GregorianStartDate', 'GregorianYear', 'Authority', 'Method', 'SourceURL',
+    'ConfidenceScore', 'Notes', 'RecordId',
+]
+CONFLICT_COLUMNS = [
+    'ConflictId', 'Country', 'City', 'HijriYear', 'HijriMonth', 'Authority',
+    'Method', 'GregorianStartDate', 'SourceURL', 'ConfidenceScore',
+    'ConflictType', 'ResolutionStatus', 'PreferredRecordId', 'Notes',
+]
+INTEGER_COLUMNS = {'HijriYear', 'HijriMonth'}
+
+# table -> (CSV file name, columns)
+TABLES = {
+    'month_starts': (MASTER_CSV.name, MONTH_START_COLUMNS),
+    'conflicts': (CONFLICTS_CSV.name, CONFLICT_COLUMNS),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS csv_meta (
+    table_name     TEXT PRIMARY KEY,
+    header         TEXT NOT NULL,
+    lineterminator TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS month_starts (
+    seq INTEGER PRIMARY KEY,
+    {month_starts}
+);
+CREATE UNIQUE INDEX IF NOT EXISTS month_starts_key
+    ON month_starts (Country, HijriYear, HijriMonth);
+CREATE UNIQUE INDEX IF NOT EXISTS month_starts_record_id ON month_starts (RecordId);
+CREATE INDEX IF NOT EXISTS month_starts_start_date ON month_starts (GregorianStartDate);
+CREATE INDEX IF NOT EXISTS month_starts_method ON month_starts (Method);
+CREATE TABLE IF NOT EXISTS conflicts (
+    seq INTEGER PRIMARY KEY,
+    {conflicts}
+);
+CREATE UNIQUE INDEX IF NOT EXISTS conflicts_id ON conflicts (ConflictId);
+CREATE INDEX IF NOT EXISTS conflicts_key ON conflicts (Country, HijriYear, HijriMonth);
+CREATE INDEX IF NOT EXISTS conflicts_preferred ON conflicts (PreferredRecordId);
+"""
+
+
+def _column_defs(columns) -> str:
+    return ",\n    ".join(
+        f"{c} {'INTEGER' if c in INTEGER_COLUMNS else 'TEXT'} NOT NULL DEFAULT ''"
+        for c in columns)
+
+
+class MasterDB:
+    def __init__(self, path: Path = DB_PATH):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript(SCHEMA.format(
+            month_starts=_column_defs(MONTH_START_COLUMNS),
+            conflicts=_column_defs(CONFLICT_COLUMNS)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def is_empty(self) -> bool:
+        return self.conn.execute("SELECT COUNT(*) FROM csv_meta").fetchone()[0] == 0
+
+    # -- CSV import/export --------------------------------------------------
+    def import_csv(self, table: str, path: Path) -> int:
+        """Replace `table` with the rows of a CSV; returns the row count."""
+        _, columns = TABLES[table]
+        raw = Path(path).read_bytes().decode('utf-8')
+        first_line = raw.split('\n', 1)[0]
+        lineterminator = '\r\n' if first_line.endswith('\r') else '\n'
+        rows = csv.reader(io.StringIO(raw, newline=''))
+        header = next(rows)
+        if header != columns:
+            raise ValueError(f"{path}: unexpected header {header}")
+        self.conn.execute(f"DELETE FROM {table}")
+        placeholders = ", ".join("?" * len(columns))
+        cur = self.conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+        self.conn.execute("INSERT OR REPLACE INTO csv_meta VALUES (?, ?, ?)",
+                          (table, json.dumps(header), lineterminator))
+        if self.csv_text(table) != raw:
+            self.conn.rollback()
+            raise ValueError(f"{path} does not round-trip through SQLite "
+                             "(non-canonical numbers in HijriYear/HijriMonth?)")
+        self.conn.commit()
+        return cur.rowcount
+
+    def csv_text(self, table: str) -> str:
+        """The table as CSV text, in the original column order and line ending."""
+        meta = self.conn.execute(
+            "SELECT header, lineterminator FROM csv_meta WHERE table_name = ?",
+            (table,)).fetchone()
+        if meta is None:
+            header, lineterminator = TABLES[table][1], '\n'
+        else:
+            header, lineterminator = json.loads(meta[0]), meta[1]
+        out = io.StringIO(newline='')
+        writer = csv.writer(out, lineterminator=lineterminator)
+        writer.writerow(header)
+        writer.writerows(self.conn.execute(
+            f"SELECT {', '.join(header)} FROM {table} ORDER BY seq"))
+        return out.getvalue()
+
+    def export_csv(self, table: str, path: Path):
+        path = Path(path)
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_bytes(self.csv_text(table).encode('utf-8'))
+        os.replace(tmp, path)
+
+    def import_all(self, data_dir: Path = DATA_DIR) -> dict:
+        return {table: self.import_csv(table, Path(data_dir) / name)
+                for table, (name, _) in TABLES.items()}
+
+    # -- writes from the merge ----------------------------------------------
+    def upsert_month_starts(self, rows) -> int:
+        """Update rows by (Country, HijriYear, HijriMonth), appending unknown
+        keys after the last row; returns the number of rows written."""
+        sets = ", ".join(f"{c} = :{c}" for c in MONTH_START_COLUMNS)
+        count = 0
+        for row in rows:
+            values = {c: row.get(c, '') for c in MONTH_START_COLUMNS}
+            cur = self.conn.execute(
+                f"UPDATE month_starts SET {sets} WHERE Country = :Country "
+                "AND HijriYear = :HijriYear AND HijriMonth = :HijriMonth", values)
+            if cur.rowcount == 0:
+                self.conn.execute(
+                    f"INSERT INTO month_starts ({', '.join(MONTH_START_COLUMNS)}) "
+                    f"VALUES ({', '.join(':' + c for c in MONTH_START_COLUMNS)})", values)
+            count += 1
+        self.conn.commit()
+        return count
+
+    def replace_conflicts(self, conflict_type: str, rows) -> int:
+        """Drop every conflict of `conflict_type` and insert `rows` instead,
+        so re-running the producer leaves only its current findings."""
+        self.conn.execute("DELETE FROM conflicts WHERE ConflictType = ?", (conflict_type,))
+        columns = ', '.join(CONFLICT_COLUMNS)
+        cur = self.conn.executemany(
+            f"INSERT OR REPLACE INTO conflicts ({columns}) "
+            f"VALUES ({', '.join('?' * len(CONFLICT_COLUMNS))})",
+            ([row.get(c, '') for c in CONFLICT_COLUMNS]
+             for row in rows if row.get('ConflictType') == conflict_type))
+        self.conn.commit()
+        return cur.rowcount
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="SQLite copy of the month-start dataset.")
+    ap.add_argument("--db", type=Path, default=DB_PATH)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import", help="(re)build the database from the CSVs")
+    imp.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    exp = sub.add_parser("export", help="write the tables back out as CSV")
+    exp.add_argument("--out-dir", type=Path, default=DATA_DIR)
+    query = sub.add_parser("query", help="run one SQL statement and print the rows")
+    query.add_argument("sql")
+    args = ap.parse_args(argv)
+
+    with MasterDB(args.db) as db:
+        if args.cmd == "import":
+            for table, n in db.import_all(args.data_dir).items():
+                print(f"  {table:14s} {n} rows")
+            print(f"Imported {args.data_dir} into {args.db}")
+        elif args.cmd == "export":
+            args.out_dir.mkdir(parents=True, exist_ok=True)
+            for table, (name, _) in TABLES.items():
+                db.export_csv(table, args.out_dir / name)
+                print(f"  {table:14s} -> {args.out_dir / name}")
+        elif args.cmd == "query":
+            cur = db.conn.execute(args.sql)
+            writer = csv.writer(sys.stdout, lineterminator='\n')
+            if cur.description:
+                writer.writerow(d[0] for d in cur.description)
+            writer.writerows(cur)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+master_store.py
+
+Keyed in-memory view of the master month-start CSV
+(docs/data-collection/hijri_month_starts_template_1400_1447.csv).
+
+Rows are indexed by (Country, HijriYear, HijriMonth) and by RecordId, so a
+lookup or update costs the same whatever the size of the template.  Updates
+are batched in memory and tracked per field; save() rewrites the file
+(temp file + rename) only if some value actually changed, keeping the
+column order and line endings of the file it read.
+
+  store = MasterStore()                       # loads MASTER_CSV
+  row = store.get(("Egypt", 1445, 9))         # or store.get_by_id(record_id)
+  store.update(("Egypt", 1445, 9), {"GregorianStartDate": "2024-03-11"})
+  store.upsert_many(rows)                     # insert or update by key
+  for key, record_id, fields in store.diff(): ...
+  store.save()
+
+Usage:
+  python scripts/master_store.py stats
+  python scripts/master_store.py get Egypt 1445 9
+"""
+
+import argparse
+import csv
+import hashlib
+import os
+import sys
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MASTER_CSV = ROOT / 'docs' / 'data-collection' / 'hijri_month_starts_template_1400_1447.csv'
+
+KEY_COLUMNS = ('Country', 'HijriYear', 'HijriMonth')
+
+
+def record_id(country: str, city: str, hijri_year, hijri_month) -> str:
+    """Stable 16-char SHA1 prefix of Country|City|HijriYear|HijriMonth."""
+    text = f"{country}|{city}|{hijri_year}|{hijri_month}"
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def row_key(row: dict) -> tuple[str, int, int]:
+    return (row['Country'], int(row['HijriYear']), int(row['HijriMonth']))
+
+
+class MasterStore:
+    """The master CSV as a list of row dicts plus two hash indexes.
+
+    Rows returned by get()/get_by_id() are the stored dicts: read them, but
+    change them only through update()/upsert() so the change is tracked.
+    """
+
+    def __init__(self, path: Path = MASTER_CSV):
+        self.path = Path(path)
+        with open(self.path, encoding='utf-8', newline='') as f:
+            first = f.readline()
+            self.lineterminator = '\r\n' if first.endswith('\r\n') else '\n'
+            f.seek(0)
+            reader = csv.DictReader(f)
+            self.rows = list(reader)
+            self.fieldnames = reader.fieldnames
+        self.by_key = {}
+        self.by_id = {}
+        for i, row in enumerate(self.rows):
+            self._index(i, row)
+        self._original = {}   # row index -> {column: value before the first update}
+        self._inserted = []   # row indexes appended since load
+
+    def _index(self, i: int, row: dict):
+        if row.get('RecordId'):
+            self.by_id[row['RecordId']] = i
+        try:
+            self.by_key[row_key(row)] = i
+        except (KeyError, ValueError):
+            pass  # malformed year/month: kept and written back, not addressable
+
+    # -- lookup -------------------------------------------------------------
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __contains__(self, key):
+        return key in self.by_key
+
+    def get(self, key: tuple[str, int, int]):
+        i = self.by_key.get(key)
+        return None if i is None else self.rows[i]
+
+    def get_by_id(self, rid: str):
+        i = self.by_id.get(rid)
+        return None if i is None else self.rows[i]
+
+    # -- updates ------------------------------------------------------------
+    def update(self, key: tuple[str, int, int], values: dict) -> bool:
+        """Set non-key columns of an existing row; True if anything changed."""
+        i = self.by_key[key]
+        row = self.rows[i]
+        changed = False
+        for col, value in values.items():
+            if col in KEY_COLUMNS or col == 'RecordId':
+                raise ValueError(f"{col} identifies the row and cannot be updated")
+            if col not in row:
+                raise KeyError(f"unknown column {col!r}")
+            if row[col] == value:
+                continue
+            self._original.setdefault(i, {}).setdefault(col, row[col])
+            row[col] = value
+            changed = True
+        return changed
+
+    def upsert(self, values: dict) -> str:
+        """Update the row with the same key, or append a new one.
+
+        Returns 'inserted', 'updated' or 'unchanged'.
+        """
+        key = row_key(values)
+        if key in self.by_key:
+            rest = {c: v for c, v in values.items()
+                    if c not in KEY_COLUMNS and c != 'RecordId'}
+            return 'updated' if self.update(key, rest) else 'unchanged'
+        row = {col: str(values.get(col, '')) for col in self.fieldnames}
+        row['HijriYear'], row['HijriMonth'] = str(key[1]), str(key[2])
+        if not row.get('RecordId'):
+            row['RecordId'] = record_id(row['Country'], row.get('City', ''), key[1], key[2])
+        self.rows.append(row)
+        self._index(len(self.rows) - 1, row)
+        self._inserted.append(len(self.rows) - 1)
+        return 'inserted'
+
+    def upsert_many(self, rows) -> Counter:
+        return Counter(self.upsert(values) for values in rows)
+
+    # -- changes ------------------------------------------------------------
+    def diff(self) -> list[tuple[tuple, str, dict]]:
+        """(key, RecordId, {column: (old, new)}) per changed row, in file
+        order; inserted rows come last with old values of None."""
+        out = []
+        for i in sorted(self._original):
+            row = self.rows[i]
+            fields = {col: (old, row[col])
+                      for col, old in self._original[i].items() if old != row[col]}
+            if fields:
+                out.append((row_key(row), row.get('RecordId', ''), fields))
+        for i in self._inserted:
+            row = self.rows[i]
+            out.append((row_key(row), row.get('RecordId', ''),
+                        {col: (None, v) for col, v in row.items() if v}))
+        return out
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._inserted) or any(
+            old != self.rows[i][col]
+            for i, cols in self._original.items() for col, old in cols.items())
+
+    def save(self) -> bool:
+        """Write the CSV if anything changed; returns whether it was written."""
+        if not self.dirty:
+            return False
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames,
+                                    lineterminator=self.lineterminator)
+            writer.writeheader()
+            writer.writerows(self.rows)
+        os.replace(tmp, self.path)
+        self._original.clear()
+        self._inserted.clear()
+        return True
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Inspect the master month-start CSV.")
+    ap.add_argument("--csv", type=Path, default=MASTER_CSV)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="row counts per country and filled dates")
+    get = sub.add_parser("get", help="print one row by key or RecordId")
+    get.add_argument("country_or_id")
+    get.add_argument("year", type=int, nargs="?")
+    get.add_argument("month", type=int, nargs="?")
+    args = ap.parse_args(argv)
+
+    store = MasterStore(args.csv)
+    if args.cmd == "stats":
+        filled = sum(1 for row in store if row['GregorianStartDate'].strip())
+        countries = Counter(row['Country'] for row in store)
+        print(f"Rows:      {len(store)} ({len(countries)} countries)")
+        print(f"Filled:    {filled} with a GregorianStartDate")
+        for country, n in sorted(countries.items()):
+            print(f"  {country:20s} {n}")
+    elif args.cmd == "get":
+        if args.year is None:
+            row = store.get_by_id(args.country_or_id)
+        else:
+            row = store.get((args.country_or_id, args.year, args.month))
+        if row is None:
+            print("no such row", file=sys.stderr)
+            return 1
+        for col in store.fieldnames:
+            print(f"{col:20s} {row[col]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,74 +3,40 @@
 Merge extracted moonsighting data and reference CSV into the master CSV.
 
 Reads:
-  1. scripts/moonsighting_all_text.txt  (pipe-delimited table at top)
+  1. scripts/moonsighting_extracted_table.csv  (from extract_table_from_text.py)
   2. scripts/primary_countries_all_years_inferred.csv
   3. docs/data-collection/hijri_month_starts_template_1400_1447.csv
 
-Writes updated master CSV in-place.
+Updates the master CSV in place (see master_store.py); the file is only
+rewritten when some row actually changed.  With --db the SQLite copy
+(master_db.py) is updated too, and every candidate date that lost to the
+merged one is recorded in its conflicts table.  Merged start dates that do
+not fall 0-3 days after their month's conjunction are listed (lunation
+index, when numpy is installed and the index has been built).
 """
 
+import argparse
 import csv
+import hashlib
+import importlib.util
 import sys
-from datetime import date, timedelta
+from datetime import timedelta
 from pathlib import Path
 from collections import defaultdict
 
-ROOT = Path(__file__).resolve().parent.parent
-MASTER_CSV = ROOT / 'docs' / 'data-collection' / 'hijri_month_starts_template_1400_1447.csv'
-EXTRACTED_TABLE = ROOT / 'scripts' / 'moonsighting_all_text.txt'
-REFERENCE_CSV = ROOT / 'scripts' / 'primary_countries_all_years_inferred.csv'
+from master_db import DB_PATH, MasterDB
+from master_store import MASTER_CSV, MasterStore
+from sighting_records import (COUNTRY_TO_MASTER, EXTRACTED_TABLE, HIJRI_MONTH_NUMS,
+                              REFERENCE_CSV, read_records)
 
-# ---------------------------------------------------------------------------
-# Country name mapping:  extracted-name → master-CSV-name
-# ---------------------------------------------------------------------------
-COUNTRY_TO_MASTER = {
-    'Saudi Arabia': 'Saudi Arabia',
-    'Egypt': 'Egypt',
-    'Turkey': 'Türkiye',
-    'Palestine': 'Palestine',
-    'Jordan': 'Jordan',
-    'Morocco': 'Morocco',
-    'Libya': 'Libya',
-    'South Africa': 'South Africa',
-    'S. Africa': 'South Africa',
-    'S Africa': 'South Africa',
-    'Nigeria': 'Nigeria',
-    'Malaysia': 'Malaysia',
-    'Pakistan': 'Pakistan',
-    'Indonesia': 'Indonesia',
-    'USA': 'United States',
-    'United States': 'United States',
-    'Canada': 'Canada',
-    'Australia': 'Australia',
-    'North America': 'United States',   # reference CSV
-    'Türkiye': 'Türkiye',
-}
+# Changed rows listed in the report; the rest are only counted
+DIFF_PREVIEW = 20
 
-# Master CSV countries (the only ones we care about)
-MASTER_COUNTRIES = {
-    'Saudi Arabia', 'Egypt', 'Türkiye', 'Palestine', 'Jordan', 'Morocco',
-    'Libya', 'South Africa', 'Nigeria', 'Malaysia', 'Pakistan', 'Indonesia',
-    'United States', 'Canada', 'Australia',
-}
+# ConflictType of the rows this script owns in the SQLite conflicts table
+MERGE_CONFLICT_TYPE = 'MergeCandidate'
 
-# ---------------------------------------------------------------------------
-# Hijri month name → number  (for reference CSV)
-# ---------------------------------------------------------------------------
-HIJRI_MONTH_NAME_TO_NUM = {
-    'Muharram': 1,
-    'Safar': 2,
-    'Rabi al-Awwal': 3, "Rabi' al-Awwal": 3,
-    'Rabi al-Thani': 4, "Rabi' al-Thani": 4,
-    'Jumada al-Ula': 5, 'Jumada al-Akhirah': 6,
-    'Jumada al-Thani': 6,
-    'Rajab': 7,
-    'Shaban': 8, "Sha'ban": 8,
-    'Ramadan': 9,
-    'Shawwal': 10,
-    "Dhu al-Qadah": 11, "Dhul Qi'dah": 11,
-    "Dhu al-Hijjah": 12, "Dhul Hijjah": 12,
-}
+# A month starts 0-3 days after the UTC day of its conjunction
+LUNATION_START_DAYS = range(0, 4)
 
 # ---------------------------------------------------------------------------
 # Status → Method mapping for master CSV
@@ -120,16 +86,6 @@ STATUS_PRIORITY = {
 }
 
 
-def make_date(year, month, day):
-    """Safely create a date, returning None on bad inputs."""
-    try:
-        if year and month and day:
-            return date(int(year), int(month), int(day))
-    except (ValueError, TypeError):
-        pass
-    return None
-
-
 def compute_start_date(greg_date, status):
     """
     Determine the GregorianStartDate (1st day of the hijri month)
@@ -159,59 +115,32 @@ def compute_start_date(greg_date, status):
         return greg_date  # fallback: use date as-is
 
 
+def has_original_data(row):
+    """True for rows filled from an original source rather than by this
+    script: they have a start date and an Authority (e.g. "Supreme Court")."""
+    return bool(row['GregorianStartDate'].strip() and row.get('Authority', '').strip())
+
+
 def get_method(status):
     """Map extracted status to the master CSV Method value."""
     return STATUS_TO_METHOD.get(status, 'Unknown')
 
 
 def read_extracted_table():
-    """Read the pipe-delimited table from moonsighting_all_text.txt.
-    Returns dict: (master_country, hijri_year, hijri_month) → list of entries.
+    """Read moonsighting_extracted_table.csv.
+    Returns dict: (master_country, hijri_year, hijri_month) → list of SightingRecords.
     """
     data = defaultdict(list)
-    text = EXTRACTED_TABLE.read_text(encoding='utf-8', errors='replace')
-    lines = text.split('\n')
-
-    if not lines[0].startswith('year_greg|'):
-        print("ERROR: No table found at top of moonsighting_all_text.txt")
+    if not EXTRACTED_TABLE.exists():
+        print(f"ERROR: Extracted table not found: {EXTRACTED_TABLE}")
         return data
 
-    for line in lines[1:]:
-        line = line.strip()
-        if not line or '|' not in line:
-            break  # end of table
-        parts = line.split('|')
-        if len(parts) < 8:
-            continue
-
-        year_greg = parts[0]
-        month_greg = parts[1]
-        day_greg = parts[2]
-        year_hijri = parts[3]
-        month_hijri = parts[4]
-        country = parts[5]
-        city = parts[6]
-        status = parts[7]
-
+    for rec in read_records(EXTRACTED_TABLE):
         # Map to master country
-        master_country = COUNTRY_TO_MASTER.get(country)
+        master_country = COUNTRY_TO_MASTER.get(rec.country)
         if not master_country:
             continue  # country not in master CSV
-
-        try:
-            hijri_yr = int(year_hijri)
-            hijri_mn = int(month_hijri)
-        except (ValueError, TypeError):
-            continue
-
-        greg_date = make_date(year_greg, month_greg, day_greg)
-
-        data[(master_country, hijri_yr, hijri_mn)].append({
-            'greg_date': greg_date,
-            'status': status,
-            'city': city,
-            'country_raw': country,
-        })
+        data[(master_country, rec.year_hijri, rec.month_hijri)].append(rec)
 
     return data
 
@@ -234,7 +163,7 @@ def read_reference_csv():
                 continue
 
             hijri_month_name = row.get('Hijri_Month', '').strip()
-            hijri_mn = HIJRI_MONTH_NAME_TO_NUM.get(hijri_month_name)
+            hijri_mn = HIJRI_MONTH_NUMS.get(hijri_month_name)
             if not hijri_mn:
                 continue
 
@@ -255,54 +184,112 @@ def read_reference_csv():
     return data
 
 
-def pick_best_entry(entries):
-    """From a list of extracted entries, pick the best one.
-    Returns (start_date, method, confidence, notes) or None.
-    """
-    if not entries:
-        return None
-
-    # Filter to entries that can produce a date
+def rank_entries(entries):
+    """Extracted entries that yield a start date, best first, as
+    (priority, start_date, method, status, entry) tuples."""
     scored = []
     for e in entries:
-        status = e['status']
+        status = e.status
         if status in ('Not Seen', 'Pending/Unknown'):
             continue
         priority = STATUS_PRIORITY.get(status, 1)
-        start_date = compute_start_date(e['greg_date'], status)
+        start_date = compute_start_date(e.greg_date, status)
         if start_date is None:
             continue
         method = get_method(status)
         scored.append((priority, start_date, method, status, e))
 
-    if not scored:
-        return None
-
-    # Pick highest priority; if tie, prefer the earliest date
+    # Highest priority first; if tie, prefer the earliest date
     scored.sort(key=lambda x: (-x[0], x[1]))
-    best = scored[0]
-    _, start_date, method, status, entry = best
+    return scored
 
-    # Set confidence based on status type
+
+def status_confidence(status):
+    """ConfidenceScore for a date taken from an entry with this status."""
     if status in ('Official Declaration', 'Official Announcement', 'Announced',
                   'Officially declared', 'Officially Announced'):
-        confidence = 0.9
+        return 0.9
     elif status in ('Sighting', 'Calculations'):
-        confidence = 0.8
+        return 0.8
     elif status == '30 days completed':
-        confidence = 0.8
+        return 0.8
     elif status.startswith('Follow'):
-        confidence = 0.7
+        return 0.7
     elif status == 'Seen':
-        confidence = 0.6
-    else:
-        confidence = 0.5
+        return 0.6
+    return 0.5
+
+
+def pick_best_entry(entries):
+    """From a list of extracted entries, pick the best one.
+    Returns (start_date, method, confidence, notes) or None.
+    """
+    scored = rank_entries(entries)
+    if not scored:
+        return None
 
+    _, start_date, method, status, entry = scored[0]
     notes = f"moonsighting.com: {status}"
-    return (start_date, method, confidence, notes)
+    return (start_date, method, status_confidence(status), notes)
 
 
-def main():
+def merge_conflicts(row, entries):
+    """Conflict rows (conflicting_declarations_template.csv columns) for
+    every other start date the extracted entries proposed for `row`, which
+    has just been filled from the best of them."""
+    scored = rank_entries(entries)
+    if not scored:
+        return []
+    chosen = scored[0][1]
+    conflicts = {}
+    for _, start_date, method, status, _ in scored[1:]:
+        if start_date == chosen or (start_date, method) in conflicts:
+            continue
+        conflict_id = hashlib.sha1(
+            f"{row['RecordId']}|{start_date.isoformat()}|{method}".encode('utf-8')
+        ).hexdigest()[:16]
+        conflicts[(start_date, method)] = {
+            'ConflictId': conflict_id,
+            'Country': row['Country'],
+            'City': row['City'],
+            'HijriYear': row['HijriYear'],
+            'HijriMonth': row['HijriMonth'],
+            'Authority': '',
+            'Method': method,
+            'GregorianStartDate': start_date.isoformat(),
+            'SourceURL': 'https://www.moonsighting.com',
+            'ConfidenceScore': str(status_confidence(status)),
+            'ConflictType': MERGE_CONFLICT_TYPE,
+            'ResolutionStatus': 'Resolved',
+            'PreferredRecordId': row['RecordId'],
+            'Notes': f"moonsighting.com: {status}; kept {chosen.isoformat()}",
+        }
+    return list(conflicts.values())
+
+
+def lunation_mismatches(store, keys):
+    """(key, GregorianStartDate, (year, month, days after the conjunction
+    day)) for rows whose start date does not fall in LUNATION_START_DAYS of
+    their own lunation, looked up in the lunation index (needs numpy)."""
+    from lunation_index import LunationIndex, jdns
+
+    keys = [k for k in keys if store.get(k)['GregorianStartDate'].strip()]
+    if not keys:
+        return []
+    starts = [store.get(k)['GregorianStartDate'].strip() for k in keys]
+    years, months, ages = LunationIndex().lunations(jdns(starts))
+    return [(key, start, (int(y), int(m), int(age)))
+            for key, start, y, m, age in zip(keys, starts, years, months, ages)
+            if (y, m) != key[1:] or age not in LUNATION_START_DAYS]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Merge extracted data into the master CSV.")
+    ap.add_argument("--db", type=Path, nargs="?", const=DB_PATH,
+                    help=f"also update the SQLite copy (default {DB_PATH.name}) "
+                         "and record the losing candidate dates as conflicts")
+    args = ap.parse_args(argv)
+
     print("Reading extracted table...")
     extracted = read_extracted_table()
     print(f"  {sum(len(v) for v in extracted.values())} entries for {len(extracted)} country/year/month combos")
@@ -312,51 +299,39 @@ def main():
     print(f"  {sum(len(v) for v in reference.values())} entries for {len(reference)} country/year/month combos")
 
     print("Reading master CSV...")
-    rows = []
-    with open(MASTER_CSV, encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        fieldnames = reader.fieldnames
-        for row in reader:
-            rows.append(row)
-    print(f"  {len(rows)} rows, {len(fieldnames)} columns")
+    store = MasterStore(MASTER_CSV)
+    print(f"  {len(store)} rows, {len(store.fieldnames)} columns")
 
     # Count stats
-    already_filled = 0
+    already_filled = sum(1 for row in store if has_original_data(row))
     newly_filled = 0
-    no_data = 0
-    skipped_existing = 0
-
-    for row in rows:
-        country = row['Country']
-        try:
-            hijri_yr = int(row['HijriYear'])
-            hijri_mn = int(row['HijriMonth'])
-        except (ValueError, TypeError):
+    conflicts = []
+
+    # Only rows with extracted or reference data can change, so visit just
+    # those keys; every other row is left as it is.  Keys are visited in
+    # master CSV order, not set order, so the conflicts come out the same
+    # on every run.
+    for key in (k for k in store.by_key if k in extracted or k in reference):
+        row = store.get(key)
+        if has_original_data(row):
             continue
-
-        # Skip if already has ORIGINAL data (not from our merge)
-        # Original data has Authority field set (e.g., "Supreme Court")
-        if row['GregorianStartDate'] and row['GregorianStartDate'].strip():
-            if row.get('Authority', '').strip():
-                already_filled += 1
-                skipped_existing += 1
-                continue
-            # Previously merged data — allow re-merge with updated dates
-
-        key = (country, hijri_yr, hijri_mn)
+        # Previously merged data — allow re-merge with updated dates
 
         # Try extracted data first
-        extracted_entries = extracted.get(key, [])
-        result = pick_best_entry(extracted_entries)
+        entries = extracted.get(key, [])
+        result = pick_best_entry(entries)
 
         if result:
             start_date, method, confidence, notes = result
-            row['GregorianStartDate'] = start_date.isoformat()
-            row['GregorianYear'] = str(start_date.year)
-            row['Method'] = method
-            row['ConfidenceScore'] = str(confidence)
-            row['Notes'] = notes
-            row['SourceURL'] = 'https://www.moonsighting.com'
+            store.update(key, {
+                'GregorianStartDate': start_date.isoformat(),
+                'GregorianYear': str(start_date.year),
+                'Method': method,
+                'ConfidenceScore': str(confidence),
+                'Notes': notes,
+                'SourceURL': 'https://www.moonsighting.com',
+            })
+            conflicts.extend(merge_conflicts(row, entries))
             newly_filled += 1
         else:
             # Try reference CSV as fallback
@@ -372,25 +347,54 @@ def main():
                 # But let's note the status for documentation
                 ref_method = get_method(ref_status)
                 if ref_method and ref_method != 'Unknown':
-                    row['Method'] = ref_method
-                    row['ConfidenceScore'] = str(ref_confidence)
-                    row['Notes'] = f"reference: {ref_status} (no date)"
-                no_data += 1
+                    store.update(key, {
+                        'Method': ref_method,
+                        'ConfidenceScore': str(ref_confidence),
+                        'Notes': f"reference: {ref_status} (no date)",
+                    })
+    no_data = len(store.by_key) - already_filled - newly_filled
+
+    if importlib.util.find_spec('numpy'):
+        merged = [key for key, _, fields in store.diff() if 'GregorianStartDate' in fields]
+        try:
+            suspicious = lunation_mismatches(store, merged)
+        except FileNotFoundError as e:
+            print(f"\nLunation check skipped: {e}")
+        else:
+            print(f"\nMerged start dates outside their lunation: {len(suspicious)}")
+            for (country, hijri_yr, hijri_mn), start, (y, m, age) in suspicious[:DIFF_PREVIEW]:
+                print(f"  {country} {hijri_yr}/{hijri_mn}: {start} is day {age} of lunation {y}/{m}")
+
+    changes = store.diff()
+    print(f"\nChanged rows: {len(changes)}")
+    for key, rid, fields in changes[:DIFF_PREVIEW]:
+        country, hijri_yr, hijri_mn = key
+        summary = ', '.join(f"{col}: {old!r} -> {new!r}" for col, (old, new) in fields.items())
+        print(f"  {country} {hijri_yr}/{hijri_mn} [{rid}] {summary}")
+    if len(changes) > DIFF_PREVIEW:
+        print(f"  ... and {len(changes) - DIFF_PREVIEW} more")
+
+    # Write updated CSV (only if something changed)
+    written = store.save()
+
+    if args.db:
+        with MasterDB(args.db) as db:
+            if db.is_empty():
+                db.import_all()  # already includes this run's changes
             else:
-                no_data += 1
-
-    # Write updated CSV
-    with open(MASTER_CSV, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+                db.upsert_month_starts(store.get(key) for key, _, _ in changes)
+            db.replace_conflicts(MERGE_CONFLICT_TYPE, conflicts)
+        print(f"\nSQLite copy updated: {args.db} ({len(conflicts)} merge conflicts)")
 
     print(f"\nResults:")
     print(f"  Already filled (preserved): {already_filled}")
     print(f"  Newly filled:               {newly_filled}")
     print(f"  No data available:          {no_data}")
-    print(f"  Total rows:                 {len(rows)}")
-    print(f"\nMaster CSV updated: {MASTER_CSV}")
+    print(f"  Total rows:                 {len(store)}")
+    if written:
+        print(f"\nMaster CSV updated: {MASTER_CSV}")
+    else:
+        print(f"\nMaster CSV unchanged: {MASTER_CSV}")
 
 
 if __name__ == '__main__':
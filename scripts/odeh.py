@@ -0,0 +1,153 @@
+"""
+odeh.py
+
+Odeh (2004) V-test over a latitude/longitude grid: the visibility map for
+one evening, computed the way computeOdehVTest in
+packages/calendar-engine/src/odeh.ts does for a single observer.
+
+The crescent geometry is yallop.best_time_geometry (Odeh uses the same
+sunset, lag, best time, ARCV and W').  For a grid, geocentric Sun and Moon
+positions are tabulated once per 10-minute step over the few days any
+cell's sunset/moonset search can reach (ephemeris.GeocentricTable); each
+cell only adds the topocentric correction, so a 1 deg x 1 deg map (65,341
+cells) costs a few hundred ephemeris evaluations instead of millions.
+
+Output is an .npz of float32 layers (v, arcv, arcl, width, lag) plus the
+uint8 zone layer and the lat/lon axes, and optionally a palette PNG of the
+zones (north up, 180 W on the left).  Zone codes: 0 no sunset, 1-4 = A-D.
+
+Usage:
+  python scripts/odeh.py grid 2024-04-09 [--step 1] [--output map.npz]
+                         [--png map.png] [--verify 200]
+"""
+
+import argparse
+import struct
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+import ephemeris as eph
+from yallop import best_time_geometry
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+DANJON_LIMIT = 6.4
+V_LIMITS = [('A', 5.65), ('B', 2.0), ('C', -0.96)]
+ZONES = ['', 'A', 'B', 'C', 'D']          # index = zone code
+
+# zone code -> RGB for the PNG
+ZONE_COLORS = [
+    (40, 40, 40),       # no sunset
+    (0, 160, 0),        # A  naked eye
+    (80, 140, 255),     # B  optical aid, maybe naked eye
+    (230, 100, 200),    # C  optical aid only
+    (255, 255, 255),    # D  not visible
+]
+GRID_LAYERS = ['v', 'arcv', 'arcl', 'width', 'lag']
+
+
+def classify_zones(v, arcl) -> np.ndarray:
+    """Odeh zone codes (see ZONES): D below the Danjon limit, 0 where V is NaN."""
+    v = np.asarray(v, dtype=np.float64)
+    codes = np.select([arcl < DANJON_LIMIT] + [v >= limit for _, limit in V_LIMITS],
+                      [4, 1, 2, 3], default=4)
+    return np.where(np.isnan(v), 0, codes).astype(np.uint8)
+
+
+def v_value(arcv, width):
+    """Odeh V from ARCV (degrees) and W' (arcminutes)."""
+    return arcv - (-0.1018 * width ** 3 + 0.7319 * width ** 2 - 6.3226 * width + 7.1651)
+
+
+def odeh_v_test(dates, lats, lons, table=None) -> dict:
+    """V, zone code and geometry per (date, lat, lon), broadcast together."""
+    g = best_time_geometry(dates, lats, lons, table)
+    w = g['width']
+    with np.errstate(invalid='ignore'):
+        v = v_value(g['arcv'], w)
+        zone = classify_zones(v, g['arcl'])
+    return {'v': v, 'zone': zone, 'arcv': g['arcv'], 'arcl': g['arcl'],
+            'width': w, 'lag': g['lag']}
+
+
+def visibility_grid(day: str, step: float = 1.0) -> dict:
+    """Odeh V-test for the evening of `day` (UTC date) on a step-degree
+    grid; layers are (lat, lon) arrays, lat descending from +90."""
+    lat = np.arange(90.0, -90.0 - step / 2, -step)
+    lon = np.arange(-180.0, 180.0 + step / 2, step)
+    start = float(eph.ut_from_datetime64(np.datetime64(day, 'D')))
+    table = eph.GeocentricTable(start - 2.0, start + 4.0)
+    lats, lons = np.meshgrid(lat, lon, indexing='ij')
+    result = odeh_v_test(np.datetime64(day, 'D'), lats, lons, table)
+    grid = {'lat': lat, 'lon': lon, 'zone': result['zone']}
+    grid.update({k: result[k].astype(np.float32) for k in GRID_LAYERS})
+    return grid
+
+
+def write_png(path: Path, codes: np.ndarray, palette=ZONE_COLORS, scale: int = 2):
+    """Indexed-colour PNG of a 2-D array of palette indexes."""
+    img = np.repeat(np.repeat(codes.astype(np.uint8), scale, axis=0), scale, axis=1)
+    height, width = img.shape
+    raw = b''.join(b'\x00' + row.tobytes() for row in img)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    Path(path).write_bytes(
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0))
+        + chunk(b'PLTE', bytes(c for rgb in palette for c in rgb))
+        + chunk(b'IDAT', zlib.compress(raw, 9))
+        + chunk(b'IEND', b''))
+
+
+def verify(day: str, grid: dict, n: int, seed: int = 0) -> float:
+    """Max |V| difference between n random grid cells and the untabulated
+    engine (positions computed per point)."""
+    rng = np.random.default_rng(seed)
+    i = rng.integers(0, len(grid['lat']), n)
+    j = rng.integers(0, len(grid['lon']), n)
+    point = odeh_v_test(np.datetime64(day, 'D'), grid['lat'][i], grid['lon'][j])
+    return float(np.nanmax(np.abs(point['v'] - grid['v'][i, j])))
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Odeh V-test visibility map.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    grid = sub.add_parser("grid", help="evaluate one evening over a lat/lon grid")
+    grid.add_argument("date", help="evening, YYYY-MM-DD (UTC)")
+    grid.add_argument("--step", type=float, default=1.0, help="grid spacing in degrees")
+    grid.add_argument("--output", type=Path, help="default: scripts/odeh_<date>.npz")
+    grid.add_argument("--png", type=Path, help="also write a zone map PNG")
+    grid.add_argument("--verify", type=int, metavar="N", default=0,
+                      help="compare N random cells with the per-point engine")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    result = visibility_grid(args.date, args.step)
+    elapsed = time.perf_counter() - t0
+    output = args.output or SCRIPTS_DIR / f"odeh_{args.date}.npz"
+    np.savez_compressed(output, **result)
+    codes, counts = np.unique(result['zone'], return_counts=True)
+    print(f"{result['zone'].size} cells in {elapsed:.2f}s -> {output}")
+    for code, n in zip(codes, counts):
+        print(f"  zone {ZONES[code] or '-'}: {n}")
+    if args.png:
+        write_png(args.png, result['zone'])
+        print(f"Map saved to {args.png}")
+    if args.verify:
+        print(f"Max |V - per-point V| over {args.verify} cells: "
+              f"{verify(args.date, result, args.verify):.5f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+page_archive.py
+
+Content-addressed, compressed store for the downloaded moonsighting.com pages.
+
+Layout (scripts/moonsighting_archive/):
+  pages.pack   append-only concatenation of compressed blobs
+  index.json   {"blobs": {sha256: {offset, length, size, codec}},
+                "pages": {"1447rmd": [{sha256, size, fetchedAt}, ...]}}
+
+Blobs are keyed by the SHA-256 of the raw page bytes, so an unchanged page is
+stored once no matter how often it is re-fetched.  Each page key keeps the
+list of every distinct snapshot seen (oldest first); readers get the latest.
+Blobs are zstd-compressed when the `zstandard` package is installed and gzip
+otherwise; the codec is recorded per blob so mixed archives read fine.
+
+Usage:
+  python scripts/page_archive.py import [--html-dir scripts/moonsighting_html]
+  python scripts/page_archive.py stats
+  python scripts/page_archive.py cat 1447 rmd
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # optional: gzip is always available
+    zstandard = None
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+ARCHIVE_DIR = SCRIPTS_DIR / "moonsighting_archive"
+HTML_DIR = SCRIPTS_DIR / "moonsighting_html"
+
+MONTH_CODES = ["muh", "sfr", "rba", "rbt", "jmo", "jmt",
+               "rjb", "shb", "rmd", "shw", "zqd", "zhj"]
+
+DEFAULT_CODEC = "zstd" if zstandard is not None else "gzip"
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _decompress(blob: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("archive contains zstd blobs; pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return gzip.decompress(blob)
+
+
+def page_key(year: int, code: str) -> str:
+    return f"{year}{code}"
+
+
+class PageArchive:
+    """Reader/writer for one archive directory.
+
+    Writes are thread-safe.  The index is only persisted by save(); blobs
+    appended after the last save are simply unreferenced if a run dies.
+    """
+
+    def __init__(self, root: Path = ARCHIVE_DIR, codec: str = DEFAULT_CODEC):
+        self.root = Path(root)
+        self.pack_path = self.root / "pages.pack"
+        self.index_path = self.root / "index.json"
+        self.codec = codec
+        self.lock = threading.Lock()
+        if self.index_path.exists():
+            index = json.loads(self.index_path.read_text(encoding="utf-8"))
+        else:
+            index = {}
+        self.blobs = index.get("blobs", {})
+        self.pages = index.get("pages", {})
+        self._dirty = False
+        self._reader = None
+
+    # -- lookup -------------------------------------------------------------
+    def latest(self, year: int, code: str):
+        """Index entry {sha256, size, fetchedAt} of the newest snapshot, or None."""
+        history = self.pages.get(page_key(year, code))
+        return history[-1] if history else None
+
+    def history(self, year: int, code: str) -> list[dict]:
+        return list(self.pages.get(page_key(year, code), []))
+
+    def read_blob(self, sha256: str) -> bytes:
+        meta = self.blobs[sha256]
+        if self._reader is None:
+            self._reader = open(self.pack_path, "rb")
+        self._reader.seek(meta["offset"])
+        return _decompress(self._reader.read(meta["length"]), meta["codec"])
+
+    def get(self, year: int, code: str):
+        """Latest HTML of a page as text, or None if it was never archived."""
+        entry = self.latest(year, code)
+        if entry is None:
+            return None
+        return self.read_blob(entry["sha256"]).decode("utf-8", errors="replace")
+
+    def iter_pages(self, years, codes=MONTH_CODES):
+        """Yield (year, code, html_or_None) in year/month order from one open pack."""
+        for year in years:
+            for code in codes:
+                yield year, code, self.get(year, code)
+
+    # -- writing ------------------------------------------------------------
+    def put(self, year: int, code: str, html: str, fetched_at: str = None) -> str:
+        """Store a page snapshot; returns its SHA-256.  No-op if unchanged."""
+        data = html.encode("utf-8")
+        sha = hashlib.sha256(data).hexdigest()
+        fetched_at = fetched_at or datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self.lock:
+            if sha not in self.blobs:
+                blob = _compress(data, self.codec)
+                self.root.mkdir(parents=True, exist_ok=True)
+                with open(self.pack_path, "ab") as f:
+                    offset = f.tell()
+                    f.write(blob)
+                self.blobs[sha] = {"offset": offset, "length": len(blob),
+                                   "size": len(data), "codec": self.codec}
+            history = self.pages.setdefault(page_key(year, code), [])
+            if not history or history[-1]["sha256"] != sha:
+                history.append({"sha256": sha, "size": len(data), "fetchedAt": fetched_at})
+                self._dirty = True
+        return sha
+
+    def save(self):
+        if not self._dirty:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(".tmp")
+        with self.lock:
+            tmp.write_text(json.dumps({"blobs": self.blobs, "pages": self.pages},
+                                      indent=1, sort_keys=True), encoding="utf-8")
+            self._dirty = False
+        os.replace(tmp, self.index_path)
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def import_html_dir(archive: PageArchive, html_dir: Path) -> int:
+    """Import loose {year}{code}.html files (mtime becomes fetchedAt)."""
+    count = 0
+    for path in sorted(html_dir.glob("*.html")):
+        stem = path.stem
+        year, code = stem[:4], stem[4:]
+        if not year.isdigit() or code not in MONTH_CODES:
+            continue
+        mtime = datetime.fromtimestamp(path.stat().st_mtime, timezone.utc)
+        archive.put(int(year), code, path.read_text(encoding="utf-8", errors="replace"),
+                    mtime.isoformat(timespec="seconds"))
+        count += 1
+    archive.save()
+    return count
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Manage the moonsighting page archive.")
+    ap.add_argument("--archive", type=Path, default=ARCHIVE_DIR)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import", help="import loose HTML files")
+    imp.add_argument("--html-dir", type=Path, default=HTML_DIR)
+    sub.add_parser("stats", help="print archive size and page count")
+    cat = sub.add_parser("cat", help="print the latest snapshot of one page")
+    cat.add_argument("year", type=int)
+    cat.add_argument("code", choices=MONTH_CODES)
+    args = ap.parse_args(argv)
+
+    archive = PageArchive(args.archive)
+    if args.cmd == "import":
+        n = import_html_dir(archive, args.html_dir)
+        print(f"Imported {n} files from {args.html_dir} into {args.archive}")
+    elif args.cmd == "stats":
+        raw = sum(b["size"] for b in archive.blobs.values())
+        packed = archive.pack_path.stat().st_size if archive.pack_path.exists() else 0
+        snapshots = sum(len(h) for h in archive.pages.values())
+        print(f"Pages:     {len(archive.pages)} ({snapshots} snapshots, {len(archive.blobs)} blobs)")
+        print(f"Raw size:  {raw / 1024:.0f} KB")
+        print(f"Packed:    {packed / 1024:.0f} KB")
+    elif args.cmd == "cat":
+        html = archive.get(args.year, args.code)
+        if html is None:
+            print(f"{page_key(args.year, args.code)} not in archive", file=sys.stderr)
+            return 1
+        sys.stdout.write(html)
+    archive.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
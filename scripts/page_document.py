@@ -0,0 +1,178 @@
+"""
+page_document.py
+
+One parsed moonsighting page, shared by every extraction strategy.
+
+The HTML is parsed at most once per page; the derived views (newline text,
+line list, table cells) are computed on first access and cached.
+
+  doc = PageDocument(html)
+  doc.parse()  build the tree now (otherwise on first use of a view)
+  doc.soup     BeautifulSoup tree (script/style removed)
+  doc.text     soup.get_text("\\n", strip=True)
+  doc.lines    doc.text split into lines
+  doc.tables   [[ [cell text, ...] per <tr> ] per <table>], <td> cells only
+
+<script> and <style> elements are dropped at parse time, for every
+consumer and every backend.  extract_text_from_html.py always did this;
+the scrapers used to see the contents of those elements in their text and
+tables, so their strategies can no longer match code or CSS.
+
+Parser backends, fastest first:
+  selectolax   lexbor tree; text and tables are built without BeautifulSoup
+  lxml         BeautifulSoup with the lxml tree builder
+  html.parser  BeautifulSoup with the stdlib parser (always available)
+
+"auto" (the default) picks the fastest one installed.  Set the environment
+variable MOONSIGHTING_HTML_PARSER to pin one.  The backends build different
+trees for malformed markup, so every installed backend is checked against
+html.parser on the synthetic corpus (synthetic_corpus.py) by the tests, and
+on the local archive on request; run the archive check after adding pages
+or installing a backend:
+
+  python -m pytest scripts/tests/test_page_document.py [--page-archive DIR]
+  python scripts/page_document.py [--archive DIR] verify
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+from functools import cached_property
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from page_archive import ARCHIVE_DIR, PageArchive
+
+BACKENDS = ("selectolax", "lxml", "html.parser")
+REFERENCE_BACKEND = "html.parser"
+BACKEND_ENV = "MOONSIGHTING_HTML_PARSER"
+
+
+def available_backends() -> list[str]:
+    return [b for b in BACKENDS
+            if b == "html.parser" or importlib.util.find_spec(b) is not None]
+
+
+def resolve_backend(name: str = None) -> str:
+    name = name or os.environ.get(BACKEND_ENV) or "auto"
+    if name == "auto":
+        return available_backends()[0]
+    if name not in available_backends():
+        raise ValueError(f"HTML parser backend {name!r} is not installed "
+                         f"(available: {', '.join(available_backends())})")
+    return name
+
+
+class PageDocument:
+    def __init__(self, html: str, backend: str = None):
+        self.html = html
+        self.backend = resolve_backend(backend)
+
+    def parse(self) -> "PageDocument":
+        if self.backend == "selectolax":
+            self._lexbor
+        else:
+            self.soup
+        return self
+
+    @cached_property
+    def soup(self) -> BeautifulSoup:
+        builder = "lxml" if self.backend == "lxml" else "html.parser"
+        soup = BeautifulSoup(self.html, builder)
+        for tag in soup(["script", "style"]):
+            tag.decompose()
+        return soup
+
+    @cached_property
+    def _lexbor(self):
+        from selectolax.lexbor import LexborHTMLParser
+        tree = LexborHTMLParser(self.html)
+        tree.strip_tags(["script", "style"])
+        return tree
+
+    @cached_property
+    def text(self) -> str:
+        if self.backend == "selectolax":
+            # Same contract as get_text("\n", strip=True): every text node,
+            # stripped, empty ones dropped, joined with newlines.
+            stripped = (node.text(deep=False, strip=True)
+                        for node in self._lexbor.root.traverse(include_text=True)
+                        if node.tag == "-text")
+            return "\n".join(s for s in stripped if s)
+        return self.soup.get_text("\n", strip=True)
+
+    @cached_property
+    def lines(self) -> list[str]:
+        return self.text.split("\n")
+
+    @cached_property
+    def tables(self) -> list[list[list[str]]]:
+        if self.backend == "selectolax":
+            return [
+                [[td.text(strip=True) for td in tr.css("td")] for tr in table.css("tr")]
+                for table in self._lexbor.css("table")
+            ]
+        return [
+            [[td.get_text(strip=True) for td in tr.find_all("td")]
+             for tr in table.find_all("tr")]
+            for table in self.soup.find_all("table")
+        ]
+
+
+# ---------------------------------------------------------------------------
+# Golden check: every backend must match html.parser on the stored corpus
+# ---------------------------------------------------------------------------
+def backend_mismatches(pages, backends) -> dict[str, list[str]]:
+    """Per backend, "key: text" / "key: tables" for every (key, html) page
+    on which its views differ from html.parser's."""
+    mismatches = {b: [] for b in backends}
+    for key, html in pages:
+        ref = PageDocument(html, REFERENCE_BACKEND)
+        for b in backends:
+            doc = PageDocument(html, b)
+            if doc.text != ref.text:
+                mismatches[b].append(f"{key}: text")
+            if doc.tables != ref.tables:
+                mismatches[b].append(f"{key}: tables")
+    return mismatches
+
+
+def verify(archive_dir: Path) -> int:
+    backends = [b for b in available_backends() if b != REFERENCE_BACKEND]
+    if not backends:
+        print("Only html.parser is installed; nothing to verify.")
+        return 0
+
+    with PageArchive(archive_dir) as archive:
+        keys = sorted(archive.pages)
+        mismatches = backend_mismatches(
+            ((key, archive.get(int(key[:4]), key[4:])) for key in keys), backends)
+
+    failed = False
+    for b, bad in mismatches.items():
+        status = "OK" if not bad else f"{len(bad)} DIFFERENCES"
+        print(f"  {b:12s} vs {REFERENCE_BACKEND}: {status} ({len(keys)} pages)")
+        for line in bad[:20]:
+            print(f"    {line}")
+        failed |= bool(bad)
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="HTML parser backend tools.")
+    ap.add_argument("--archive", type=Path, default=ARCHIVE_DIR)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("verify", help="check all installed backends against html.parser")
+    sub.add_parser("backends", help="list installed backends")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "backends":
+        print(f"installed: {', '.join(available_backends())}; using {resolve_backend()}")
+        return 0
+    return verify(args.archive)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+"""
+pipeline.py
+
+Runs the data build as one dependency graph of stages instead of separate
+scripts run by hand:
+
+  download -> extract_text -> extract_table -> merge -> declarations
+                                            \-> compare   merge -> validate
+  download -> scrape_all            lunation_index -> merge, validate
+  ephemeris_table
+
+Each stage declares the files it reads and writes; a stage depends on the
+stages that write its inputs.  A stage's fingerprint is the SHA-256 of its
+command, its script plus every sibling module that script imports
+(transitively), and the content of its input files.  A stage is not run
+again when its fingerprint matches the last successful run and its outputs
+are still the files that run wrote (an output edited by hand, e.g. the
+master CSV, makes its stage run again).  When an upstream stage runs but
+writes identical files, its dependents are still up to date.
+
+Optional inputs are hashed when present but not required: the reference
+CSV is not committed, and the merge warns and carries on without it.  A
+stage that cannot work without one (compare, without the reference CSV)
+lists it in only_if and is reported "skipped" when it is absent, which
+does not fail the run.  The lunation index and the ephemeris table are
+generated files with build stages of their own; their fingerprints cover
+the ephemeris modules they are computed from.
+
+Ready stages run in parallel (--jobs), each as a subprocess whose output is
+printed when it finishes.  File hashes are cached by (size, mtime), so a
+no-op rebuild only stats the files.  State is kept in
+scripts/.pipeline_state.json.
+
+The download stage goes to the network and only runs with --download or
+when named; otherwise the page archive is treated as a source.  A stage
+whose inputs are missing (and not produced by the run) is reported and its
+dependents are not run.
+
+Usage:
+  python scripts/pipeline.py [STAGE ...] [--download] [--force] [--jobs 4]
+                             [--quiet] [--list]
+  (STAGEs: run only these and what they depend on; default all)
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+
+from master_db import CONFLICTS_CSV
+from master_store import MASTER_CSV
+from page_archive import ARCHIVE_DIR
+from sighting_records import EXTRACTED_TABLE, REFERENCE_CSV
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+ROOT = SCRIPTS_DIR.parent
+STATE_JSON = SCRIPTS_DIR / ".pipeline_state.json"
+
+ARCHIVE_FILES = (ARCHIVE_DIR / "index.json", ARCHIVE_DIR / "pages.pack")
+TEXT_FILE = SCRIPTS_DIR / "moonsighting_all_text.txt"
+SCRAPED_FILES = (SCRIPTS_DIR / "moonsighting_all_data.json",
+                 SCRIPTS_DIR / "moonsighting_all_data.csv")
+COMPARISON_CSV = SCRIPTS_DIR / "comparison_results.csv"
+VIOLATIONS_CSV = SCRIPTS_DIR / "master_violations.csv"
+DECLARATIONS_TS = ROOT / "apps" / "web" / "src" / "data" / "officialDeclarations.ts"
+# as ephemeris_table.TABLE_PATH / lunation_index.INDEX_PATH (not imported:
+# those modules need numpy, the runner does not)
+EPHEMERIS_TABLE = SCRIPTS_DIR / "ephemeris_table.bin"
+LUNATION_INDEX = SCRIPTS_DIR / "lunation_index.npy"
+
+DEFAULT_JOBS = 4
+OK_STATUSES = ('ran', 'up to date', 'skipped')
+RE_JS_IMPORT = re.compile(r"""\bfrom\s+['"]\./([\w.-]+)['"]""")
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    script: str
+    inputs: tuple = ()
+    optional: tuple = ()        # inputs hashed if present, not required
+    only_if: tuple = ()         # optional inputs the stage is skipped without
+    outputs: tuple = ()
+    args: tuple = ()
+    network: bool = False
+
+    def command(self) -> list[str]:
+        runner = 'node' if self.script.endswith('.mjs') else sys.executable
+        return [runner, str(SCRIPTS_DIR / self.script), *self.args]
+
+
+STAGES = [
+    Stage('download', 'download_moonsighting_pages.py',
+          outputs=ARCHIVE_FILES, network=True),
+    # generated astronomy files; fingerprinted by their (ephemeris) sources
+    Stage('ephemeris_table', 'ephemeris_table.py',
+          outputs=(EPHEMERIS_TABLE,), args=('build',)),
+    Stage('lunation_index', 'lunation_index.py',
+          outputs=(LUNATION_INDEX,), args=('build',)),
+    Stage('extract_text', 'extract_text_from_html.py',
+          inputs=ARCHIVE_FILES, outputs=(TEXT_FILE,)),
+    Stage('extract_table', 'extract_table_from_text.py',
+          inputs=(TEXT_FILE,), outputs=(EXTRACTED_TABLE,)),
+    # the master CSV is updated in place: an output, re-run if edited
+    Stage('merge', 'merge_into_master.py',
+          inputs=(EXTRACTED_TABLE,), optional=(REFERENCE_CSV, LUNATION_INDEX),
+          outputs=(MASTER_CSV,)),
+    Stage('declarations', 'csv-to-declarations.mjs',
+          inputs=(MASTER_CSV,), outputs=(DECLARATIONS_TS,)),
+    Stage('validate', 'validate_master.py',
+          inputs=(MASTER_CSV, LUNATION_INDEX), outputs=(VIOLATIONS_CSV, CONFLICTS_CSV)),
+    Stage('scrape_all', 'scrape_moonsighting_all.py',
+          inputs=ARCHIVE_FILES, outputs=SCRAPED_FILES),
+    Stage('compare', 'compare_datasets.py',
+          inputs=(EXTRACTED_TABLE,), optional=(REFERENCE_CSV,), only_if=(REFERENCE_CSV,),
+          outputs=(COMPARISON_CSV,),
+          args=('--summary-only', '--output', str(COMPARISON_CSV))),
+]
+
+
+def _rel(path: Path) -> str:
+    try:
+        return Path(path).resolve().relative_to(ROOT).as_posix()
+    except ValueError:
+        return str(path)
+
+
+# ---------------------------------------------------------------------------
+# Fingerprints
+# ---------------------------------------------------------------------------
+def local_sources(script: Path) -> list[Path]:
+    """`script` and every module next to it that it imports, transitively
+    (Python imports via ast, .mjs via `from './x.mjs'`)."""
+    seen, todo = set(), [script]
+    while todo:
+        path = todo.pop()
+        if path in seen or not path.is_file():
+            continue
+        seen.add(path)
+        text = path.read_text(encoding='utf-8')
+        if path.suffix == '.py':
+            names = set()
+            for node in ast.walk(ast.parse(text, str(path))):
+                if isinstance(node, ast.Import):
+                    names.update(alias.name.split('.')[0] for alias in node.names)
+                elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                    names.add(node.module.split('.')[0])
+            todo.extend(path.parent / f"{name}.py" for name in names)
+        else:
+            todo.extend(path.parent / name for name in RE_JS_IMPORT.findall(text))
+    return sorted(seen)
+
+
+class FileHashes:
+    """SHA-256 of files, cached by (size, mtime_ns) across runs."""
+
+    def __init__(self, cache: dict):
+        self.cache = cache
+
+    def __call__(self, path: Path) -> str | None:
+        key = _rel(path)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.cache.pop(key, None)
+            return None
+        cached = self.cache.get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        self.cache[key] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        return h.hexdigest()
+
+
+def fingerprint(stage: Stage, file_hash: FileHashes) -> str:
+    sources = local_sources(SCRIPTS_DIR / stage.script)
+    payload = {
+        'command': [Path(stage.command()[1]).name, *stage.args],
+        'files': {_rel(p): file_hash(p) for p in [*sources, *stage.inputs, *stage.optional]},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def load_state(path: Path) -> dict:
+    try:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        state = {}
+    state.setdefault('files', {})
+    state.setdefault('stages', {})
+    return state
+
+
+def save_state(path: Path, state: dict):
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# ---------------------------------------------------------------------------
+# Graph
+# ---------------------------------------------------------------------------
+def select_stages(names, download: bool) -> list[Stage]:
+    """The named stages (default all) plus everything upstream of them, in
+    STAGES order.  Network stages only when named or with download."""
+    by_name = {s.name: s for s in STAGES}
+    unknown = [n for n in names if n not in by_name]
+    if unknown:
+        raise SystemExit(f"Unknown stage(s): {', '.join(unknown)} "
+                         f"(known: {', '.join(by_name)})")
+    wanted = set(names) or {s.name for s in STAGES}
+    included = {s.name for s in STAGES if s.name in names or (download or not s.network)}
+    todo = list(wanted & included)
+    while todo:
+        for dep in upstream(by_name[todo.pop()], STAGES):
+            if dep.name in included and dep.name not in wanted:
+                wanted.add(dep.name)
+                todo.append(dep.name)
+    return [s for s in STAGES if s.name in wanted & included]
+
+
+def upstream(stage: Stage, stages) -> list[Stage]:
+    """Stages among `stages` that write one of `stage`'s inputs (optional
+    ones included)."""
+    inputs = set(stage.inputs) | set(stage.optional)
+    return [s for s in stages if s is not stage and inputs & set(s.outputs)]
+
+
+# ---------------------------------------------------------------------------
+# Run
+# ---------------------------------------------------------------------------
+def run_stage(stage: Stage) -> tuple[int, str, float]:
+    t0 = time.perf_counter()
+    proc = subprocess.run(stage.command(), cwd=ROOT, stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT, text=True, encoding='utf-8',
+                          errors='replace')
+    return proc.returncode, proc.stdout, time.perf_counter() - t0
+
+
+def run_pipeline(stages: list[Stage], state: dict, jobs: int = DEFAULT_JOBS,
+                 force: bool = False, quiet: bool = False,
+                 state_path: Path = STATE_JSON) -> dict:
+    """Run `stages` in dependency order; returns {name: (status, seconds)}
+    with status ran / up to date / skipped / failed / missing inputs /
+    blocked."""
+    file_hash = FileHashes(state['files'])
+    deps = {s.name: upstream(s, stages) for s in stages}
+    pending = list(stages)
+    results, running = {}, {}
+
+    def finish(stage, status, seconds=0.0):
+        results[stage.name] = (status, seconds)
+        print(f"[{stage.name}] {status}" + (f" in {seconds:.2f}s" if seconds else ""))
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while pending or running:
+            for stage in list(pending):
+                dep_status = [results.get(d.name, (None,))[0] for d in deps[stage.name]]
+                if None in dep_status:
+                    continue
+                pending.remove(stage)
+                if any(st not in OK_STATUSES for st in dep_status):
+                    finish(stage, 'blocked')
+                    continue
+                if 'skipped' in dep_status:
+                    finish(stage, 'skipped')
+                    continue
+                absent = [_rel(p) for p in stage.only_if if not Path(p).exists()]
+                if absent:
+                    finish(stage, 'skipped')
+                    print(f"  not found (optional): {', '.join(absent)}")
+                    continue
+                missing = [_rel(p) for p in stage.inputs if not Path(p).exists()]
+                if missing:
+                    finish(stage, 'missing inputs')
+                    print(f"  not found: {', '.join(missing)}")
+                    continue
+                t0 = time.perf_counter()
+                fp = fingerprint(stage, file_hash)
+                last = state['stages'].get(stage.name, {})
+                outputs = {_rel(p): file_hash(p) for p in stage.outputs}
+                if (not force and last.get('fingerprint') == fp
+                        and last.get('outputs') == outputs and None not in outputs.values()):
+                    finish(stage, 'up to date', time.perf_counter() - t0)
+                    continue
+                print(f"[{stage.name}] running: {' '.join(_rel(a) for a in stage.command()[1:])}")
+                running[pool.submit(run_stage, stage)] = (stage, fp)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, fp = running.pop(future)
+                code, output, seconds = future.result()
+                if output and (code or not quiet):
+                    print(output.rstrip('\n'))
+                if code:
+                    finish(stage, 'failed', seconds)
+                    continue
+                state['stages'][stage.name] = {
+                    'fingerprint': fp,
+                    'outputs': {_rel(p): file_hash(p) for p in stage.outputs},
+                    'seconds': round(seconds, 3),
+                }
+                save_state(state_path, state)
+                finish(stage, 'ran', seconds)
+    save_state(state_path, state)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run the data build as a cached stage graph.")
+    ap.add_argument("stages", nargs="*", metavar="STAGE",
+                    help="run only these stages and their upstream stages")
+    ap.add_argument("--download", action="store_true",
+                    help="include the network download stage")
+    ap.add_argument("--force", action="store_true", help="run stages even if up to date")
+    ap.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                    help=f"stages run in parallel (default {DEFAULT_JOBS})")
+    ap.add_argument("--quiet", action="store_true",
+                    help="only print the output of failed stages")
+    ap.add_argument("--list", action="store_true", help="list the stages and exit")
+    ap.add_argument("--state", type=Path, default=STATE_JSON)
+    args = ap.parse_args(argv)
+
+    if args.list:
+        for stage in STAGES:
+            deps = ', '.join(d.name for d in upstream(stage, STAGES)) or '-'
+            print(f"{stage.name:16s} {stage.script:30s} after: {deps}"
+                  + ("  (network, --download)" if stage.network else ""))
+        return 0
+
+    t0 = time.perf_counter()
+    stages = select_stages(args.stages, args.download)
+    results = run_pipeline(stages, load_state(args.state), args.jobs, args.force,
+                           args.quiet, args.state)
+    total = time.perf_counter() - t0
+
+    print("\nStage              Status            Wall time")
+    for stage in stages:
+        status, seconds = results[stage.name]
+        print(f"  {stage.name:16s} {status:16s} {seconds:8.2f}s")
+    print(f"  {'total':16s} {'':16s} {total:8.2f}s")
+    failed = [n for n, (status, _) in results.items() if status not in OK_STATUSES]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,22 @@ for years 1430–1447, all 12 Hijri months.
 
 Month codes:  MUH SFR RBA RBT JMO JMT RJB SHB RMD SHW ZQD ZHJ
 
+Usage:
+  python scripts/scrape_moonsighting_all.py [--jobs N] [--no-cache]
+                                            [--trace [PATH]] [--trace-top N]
+
+With --jobs N > 1 pages are parsed in N worker processes; results are merged
+back in (year, month) order, so the output files are identical to a serial run.
+
+Per-page results are cached in moonsighting_extract_cache.json keyed by the
+page's content hash and PARSER_VERSION, so a re-run only parses pages that are
+new or changed.  Bump PARSER_VERSION whenever an extraction strategy changes;
+--no-cache ignores (and rebuilds) the cache.
+
+--trace records per-page timings (read, parse, text, tables, each strategy,
+each regex family) as a Chrome trace and prints the slowest pages; see
+tracing.py.  Cached pages are not parsed, so trace with --no-cache.
+
 Outputs:
   scripts/moonsighting_all_data.json   (structured)
   scripts/moonsighting_all_data.csv    (flat)
@@ -16,16 +32,25 @@ Target countries:
   Malaysia, Australia
 """
 
+import argparse
+import functools
 import json
 import csv
+import os
 import re
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime, date
 
 import requests
-from bs4 import BeautifulSoup
+
+import date_tokens
+from country_matcher import CountryMatcher
+from page_archive import PageArchive
+from page_document import PageDocument, resolve_backend
+import tracing
 
 # ---------------------------------------------------------------------------
 # Config
@@ -50,11 +75,17 @@ HIJRI_MONTHS = [
 ]
 
 BASE_URL = "https://www.moonsighting.com/{year}{month_code}.html"
-HTML_DIR  = Path(__file__).resolve().parent / "moonsighting_html"
 
 SCRIPTS_DIR = Path(__file__).resolve().parent
 OUT_JSON = SCRIPTS_DIR / "moonsighting_all_data.json"
+CACHE_JSON = SCRIPTS_DIR / "moonsighting_extract_cache.json"
+
+# Bump when extract_official_list / _table / extract_announcements / match_country
+# change in a way that affects their output; invalidates the extraction cache.
+# 2: pages are read through PageDocument, which drops <script>/<style>.
+PARSER_VERSION = 2
 OUT_CSV  = SCRIPTS_DIR / "moonsighting_all_data.csv"
+TRACE_JSON = SCRIPTS_DIR / "trace_scrape_moonsighting_all.json"
 
 # Country name → our ISO code  (case-insensitive matching)
 COUNTRY_MAP = {
@@ -80,6 +111,7 @@ COUNTRY_MAP = {
     "malaysia":        "my",
     "australia":       "au",
 }
+COUNTRY_MATCHER = CountryMatcher(COUNTRY_MAP)
 
 
 def normalise_method(raw: str) -> str:
@@ -115,15 +147,12 @@ def normalise_method(raw: str) -> str:
 def match_country(name: str):
     """Return (country_id, cleaned_name) or (None, None)."""
     clean = name.strip().rstrip(" -–—").strip()
-    lower = clean.lower()
-    cid = COUNTRY_MAP.get(lower)
-    if cid:
-        return cid, clean
-    # Partial / fuzzy
-    for key, kid in COUNTRY_MAP.items():
-        if key in lower or lower in key:
-            return kid, clean
-    return None, clean
+    # Exact, else the first alias (in COUNTRY_MAP order) that contains or is
+    # contained in the name
+    key = COUNTRY_MATCHER.lookup(clean.lower())
+    if key is None:
+        return None, clean
+    return COUNTRY_MAP[key], clean
 
 
 # ---------------------------------------------------------------------------
@@ -135,44 +164,30 @@ MONTH_NAMES = {
     "september": 9, "october": 10, "november": 11, "december": 12,
 }
 
-# Pattern A:  "August 22, 2009 (Saturday):"
-DATE_PAT_US = re.compile(
-    r"(?P<month>[A-Za-z]+)\s+(?P<day>\d{1,2}),?\s+(?P<year>\d{4})\s*\(",
-    re.IGNORECASE,
-)
-# Pattern B:  "Friday, 20 July 2012:"
-DATE_PAT_UK = re.compile(
-    r"(?:Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday),?\s+"
-    r"(?P<day>\d{1,2})\s+(?P<month>[A-Za-z]+)\s+(?P<year>\d{4})",
-    re.IGNORECASE,
-)
-# Pattern C (table cell):  "May 27, 2017 (Saturday)"
-DATE_PAT_TABLE = re.compile(
-    r"(?P<month>[A-Za-z]+)\s+(?P<day>\d{1,2}),?\s+(?P<year>\d{4})",
-    re.IGNORECASE,
-)
+def parse_date(text: str):
+    """Try to extract a Gregorian date from text ("August 22, 2009 (Saturday):",
+    "Friday, 20 July 2012:", "May 27, 2017"; see date_tokens.first_date)."""
+    return date_tokens.first_date(text)
 
 
-def parse_date(text: str):
-    """Try to extract a Gregorian date from text."""
-    for pattern in (DATE_PAT_US, DATE_PAT_UK, DATE_PAT_TABLE):
-        m = pattern.search(text)
-        if m:
-            mn = m.group("month").lower()
-            if mn in MONTH_NAMES:
-                try:
-                    return date(int(m.group("year")), MONTH_NAMES[mn], int(m.group("day")))
-                except ValueError:
-                    pass
-    return None
+# Country lines of the list and table layouts
+# "1. Saudi Arabia (30 days completion)"
+LIST_NUMBERED_RE = re.compile(r"^\d+\.\s*(.+?)(?:\s*\(([^)]*)\))?\s*$")
+# "Saudi Arabia (30 days completion)"
+LIST_COUNTRY_RE = re.compile(r"^([A-Z][A-Za-z\s.'\-]+?)(?:\s*\(([^)]*)\))?\s*$")
+# "Saudi Arabia (Local Sighting)" / "Egypt - Moon Born before sunset"
+TABLE_COUNTRY_RE = re.compile(r"^(.+?)(?:\s*[-–]\s*|\s*\()(.*?)(?:\))?$")
+# "India, Pakistan and Bangladesh"
+COUNTRY_SPLIT_RE = re.compile(r",\s*|\s+and\s+")
 
 
 # ---------------------------------------------------------------------------
 # Strategy 1: Parse the OFFICIAL section (numbered list under date headers)
 # Works for 1430-1435 style pages (Ramadan, Shawwal, sometimes others)
 # ---------------------------------------------------------------------------
-def extract_official_list(text: str, hijri_year: int, hijri_month: int) -> list[dict]:
+def extract_official_list(doc: PageDocument, hijri_year: int, hijri_month: int) -> list[dict]:
     """Parse 'OFFICIAL 1st Day of …' section with numbered country lists."""
+    text = doc.text
     # Find the official section (various headings)
     patterns = [
         r"OFFICIAL\s+1st\s+Day\s+of\s+\w+",
@@ -216,9 +231,9 @@ def extract_official_list(text: str, hijri_year: int, hijri_month: int) -> list[
             break
 
         # Match: "1. Saudi Arabia (30 days completion)"
-        m = re.match(r"^\d+\.\s*(.+?)(?:\s*\(([^)]*)\))?\s*$", line)
+        m = LIST_NUMBERED_RE.match(line)
         if not m:
-            m = re.match(r"^([A-Z][A-Za-z\s.'\-]+?)(?:\s*\(([^)]*)\))?\s*$", line)
+            m = LIST_COUNTRY_RE.match(line)
         if not m:
             continue
 
@@ -238,19 +253,16 @@ def extract_official_list(text: str, hijri_year: int, hijri_month: int) -> list[
 # Strategy 2: Parse an HTML table format (1438+ style)
 # Rows like: "| May 27, 2017 (Saturday) | Saudi Arabia (Local Sighting) |"
 # ---------------------------------------------------------------------------
-def extract_official_table(html: str, hijri_year: int, hijri_month: int) -> list[dict]:
+def extract_official_table(doc: PageDocument, hijri_year: int, hijri_month: int) -> list[dict]:
     """Parse table-based official start dates (1438+ format)."""
-    soup = BeautifulSoup(html, "html.parser")
     results = []
 
-    for table in soup.find_all("table"):
-        rows = table.find_all("tr")
-        for row in rows:
-            cells = row.find_all("td")
+    for rows in doc.tables:
+        for cells in rows:
             if len(cells) < 2:
                 continue
-            date_text = cells[0].get_text(strip=True)
-            country_text = cells[1].get_text(strip=True) if len(cells) > 1 else ""
+            date_text = cells[0]
+            country_text = cells[1] if len(cells) > 1 else ""
 
             # Skip header-like rows
             if "will be added" in date_text.lower() or "1st day" in date_text.lower():
@@ -263,7 +275,7 @@ def extract_official_table(html: str, hijri_year: int, hijri_month: int) -> list
                 continue
 
             # Parse country + method from "Saudi Arabia (Local Sighting)"
-            cm = re.match(r"^(.+?)(?:\s*[-–]\s*|\s*\()(.*?)(?:\))?$", country_text)
+            cm = TABLE_COUNTRY_RE.match(country_text)
             if cm:
                 country_raw = cm.group(1).strip()
                 method_raw = cm.group(2).strip().rstrip(")")
@@ -303,13 +315,20 @@ DECL_RE = re.compile(
     re.IGNORECASE | re.DOTALL,
 )
 
+# Regex families timed per page with --trace (see tracing.py); the date
+# tokenizer's family is in date_tokens.TRACE_FAMILIES
+TRACE_FAMILIES = {
+    "countries": ("LIST_NUMBERED_RE", "LIST_COUNTRY_RE", "TABLE_COUNTRY_RE", "COUNTRY_SPLIT_RE"),
+    "announcements": ("DECL_RE",),
+}
+
 
-def extract_announcements(text: str, hijri_year: int, hijri_month: int) -> list[dict]:
+def extract_announcements(doc: PageDocument, hijri_year: int, hijri_month: int) -> list[dict]:
     """Heuristic: find announcement sentences mentioning countries + dates."""
     results = []
     seen = set()
 
-    for m in DECL_RE.finditer(text):
+    for m in DECL_RE.finditer(doc.text):
         countries_str = m.group("countries")
         mn = m.group("month").lower()
         if mn not in MONTH_NAMES:
@@ -320,7 +339,7 @@ def extract_announcements(text: str, hijri_year: int, hijri_month: int) -> list[
             continue
 
         # Split "India, Pakistan and Bangladesh" into individual countries
-        parts = re.split(r",\s*|\s+and\s+", countries_str)
+        parts = COUNTRY_SPLIT_RE.split(countries_str)
         for part in parts:
             part = part.strip()
             cid, cname = match_country(part)
@@ -364,52 +383,161 @@ def dedup(results: list[dict]) -> list[dict]:
     return out
 
 
+def scan_page(page: tuple) -> tuple[list[dict], tuple[int, int, int]]:
+    """Run all strategies on one (year, month_num, html) page.
+
+    Top-level so it can be shipped to worker processes.  Returns the
+    page-level deduplicated entries and the per-strategy counts.
+    """
+    year, month_num, html = page
+    tracing.page(f"{year}{HIJRI_MONTHS[month_num - 1][0]}")
+    doc = PageDocument(html)
+    # Every strategy needs the tree, the text or the tables; building them
+    # here only makes the cost of each visible in a trace
+    with tracing.span("parse"):
+        doc.parse()
+    with tracing.span("text"):
+        doc.text
+    with tracing.span("tables"):
+        doc.tables
+
+    # Try all strategies on the same parsed page, combine results
+    with tracing.span("official_list"):
+        r1 = extract_official_list(doc, year, month_num)
+    with tracing.span("official_table"):
+        r2 = extract_official_table(doc, year, month_num)
+    with tracing.span("announcements"):
+        r3 = extract_announcements(doc, year, month_num)
+    tracing.set_layout("table" if r2 else "list" if r1 else "announcements" if r3 else "none")
+    tracing.end_page()
+    return dedup(r1 + r2 + r3), (len(r1), len(r2), len(r3))
+
+
+def enable_tracing():
+    """Turn tracing on in this process (also the worker initializer)."""
+    tracing.enable()
+    tracing.time_patterns(globals(), TRACE_FAMILIES)
+    tracing.time_patterns(vars(date_tokens), date_tokens.TRACE_FAMILIES)
+
+
+def load_cache(parser_version: str) -> dict:
+    """page key -> {sha256, entries, counts}; empty if missing or stale."""
+    if not CACHE_JSON.exists():
+        return {}
+    cache = json.loads(CACHE_JSON.read_text(encoding="utf-8"))
+    if cache.get("parserVersion") != parser_version:
+        return {}
+    return cache["pages"]
+
+
+def save_cache(parser_version: str, pages: dict):
+    tmp = CACHE_JSON.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"parserVersion": parser_version, "pages": pages},
+                              ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, CACHE_JSON)
+
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
-def main():
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Extract official month starts from archived moonsighting pages.")
+    ap.add_argument("--jobs", type=int, default=1,
+                    help="worker processes (default 1; 0 = one per CPU)")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="re-extract every page and rebuild the cache")
+    tracing.add_arguments(ap, TRACE_JSON)
+    args = ap.parse_args(argv)
+    jobs = args.jobs or os.cpu_count() or 1
+    if args.trace:
+        # cached pages are not parsed: combine with --no-cache to trace all
+        enable_tracing()
+
+    # The backend is part of the version: backends may differ on odd markup
+    parser_version = f"{PARSER_VERSION}/{resolve_backend()}"
+    cache = {} if args.no_cache else load_cache(parser_version)
+    new_cache = {}
+
     all_results = []
     errors = []
     page_count = 0
     zero_pages = []
 
-    for year in range(START_YEAR, END_YEAR + 1):
-        for month_code, month_num, month_name in HIJRI_MONTHS:
-            filename = f"{year}{month_code}.html"
-            filepath = HTML_DIR / filename
-            label = f"{year} {month_code.upper()} ({month_name})"
-
-            if not filepath.exists():
-                print(f"  {label:30s} MISSING")
-                errors.append({"file": filename, "error": "file not found"})
-                continue
+    # Read every uncached page up front (cheap) so workers only do the
+    # CPU-bound part.  Cache hits never touch the page blob at all.
+    slots = []   # (year, month_code, month_name, stored, page, cached)
+    with PageArchive() as archive:
+        for year in range(START_YEAR, END_YEAR + 1):
+            for month_code, month_num, month_name in HIJRI_MONTHS:
+                stored = archive.latest(year, month_code)
+                page = cached = None
+                if stored is not None and stored["size"] >= 500:
+                    hit = cache.get(f"{year}{month_code}")
+                    if hit is not None and hit["sha256"] == stored["sha256"]:
+                        cached = hit
+                    else:
+                        tracing.page(f"{year}{month_code}")
+                        with tracing.span("read"):
+                            page = (year, month_num, archive.get(year, month_code))
+                        tracing.end_page()
+                slots.append((year, month_code, month_name, stored, page, cached))
+
+    pages = [slot[4] for slot in slots if slot[4] is not None]
+    if jobs > 1:
+        # traced workers send their events back with each result
+        worker = functools.partial(tracing.collect_call, scan_page) if args.trace else scan_page
+        pool = ProcessPoolExecutor(max_workers=jobs,
+                                   initializer=enable_tracing if args.trace else None)
+        scanned = pool.map(worker, pages, chunksize=4)
+    else:
+        worker = scan_page
+        pool = None
+        scanned = map(scan_page, pages)
+
+    for year, month_code, month_name, stored, page, cached in slots:
+        filename = f"{year}{month_code}.html"
+        label = f"{year} {month_code.upper()} ({month_name})"
+
+        if stored is None:
+            print(f"  {label:30s} MISSING")
+            errors.append({"file": filename, "error": "not in archive"})
+            continue
 
-            # Skip tiny stub pages (< 1 KB of real content)
-            size = filepath.stat().st_size
-            if size < 500:
-                print(f"  {label:30s} STUB ({size} bytes)")
-                continue
+        # Skip tiny stub pages (< 1 KB of real content)
+        size = stored["size"]
+        if page is None and cached is None:
+            print(f"  {label:30s} STUB ({size} bytes)")
+            continue
 
-            html = filepath.read_text(encoding="utf-8", errors="replace")
-            text = BeautifulSoup(html, "html.parser").get_text("\n", strip=True)
-            page_count += 1
+        if cached is not None:
+            combined, (n1, n2, n3) = cached["entries"], cached["counts"]
+        else:
+            result = next(scanned)
+            if worker is not scan_page:
+                result, events = result
+                tracing.merge_events(events)
+            combined, (n1, n2, n3) = result
+        new_cache[f"{year}{month_code}"] = {"sha256": stored["sha256"],
+                                           "entries": combined,
+                                           "counts": [n1, n2, n3]}
+        page_count += 1
 
-            # Try all strategies, combine results
-            r1 = extract_official_list(text, year, month_num)
-            r2 = extract_official_table(html, year, month_num)
-            r3 = extract_announcements(text, year, month_num)
+        target_count = sum(1 for r in combined if r["countryId"] in
+                           {"sa","eg","jo","ps","pk","id","ma","ly","za","us","ca"})
 
-            combined = dedup(r1 + r2 + r3)
-            target_count = sum(1 for r in combined if r["countryId"] in
-                               {"sa","eg","jo","ps","pk","id","ma","ly","za","us","ca"})
+        status = f"{len(combined):3d} entries ({target_count} target) [L={n1} T={n2} A={n3}]"
+        print(f"  {label:30s} {status}")
 
-            status = f"{len(combined):3d} entries ({target_count} target) [L={len(r1)} T={len(r2)} A={len(r3)}]"
-            print(f"  {label:30s} {status}")
+        if len(combined) == 0 and size > 3000:
+            zero_pages.append(filename)
 
-            if len(combined) == 0 and size > 3000:
-                zero_pages.append(filename)
+        all_results.extend(combined)
 
-            all_results.extend(combined)
+    if pool is not None:
+        pool.shutdown()
+    if pages or new_cache.keys() != cache.keys():
+        save_cache(parser_version, new_cache)
+    print(f"\nExtracted {len(pages)} page(s), {page_count - len(pages)} from cache")
 
     # Deduplicate across all pages
     all_results = dedup(all_results)
@@ -462,6 +590,9 @@ def main():
             writer.writerows(all_results)
         print(f"Written {OUT_CSV}")
 
+    if args.trace:
+        tracing.print_summary(args.trace, args.trace_top)
+
 
 if __name__ == "__main__":
     main()
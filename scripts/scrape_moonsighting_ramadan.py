@@ -30,7 +30,9 @@ from pathlib import Path
 from datetime import datetime, date
 
 import requests
-from bs4 import BeautifulSoup
+
+from country_matcher import CountryMatcher
+from page_document import PageDocument
 
 # ---------------------------------------------------------------------------
 # Config
@@ -67,6 +69,7 @@ COUNTRY_MAP = {
     "malaysia":      "my",
     "australia":     "au",
 }
+COUNTRY_MATCHER = CountryMatcher(COUNTRY_MAP)
 
 # Normalise method strings
 def normalise_method(raw: str) -> str:
@@ -129,13 +132,12 @@ def parse_date_header(text: str):
 # ---------------------------------------------------------------------------
 # Parse the OFFICIAL section
 # ---------------------------------------------------------------------------
-def extract_official_section(html: str, hijri_year: int) -> list[dict]:
+def extract_official_section(doc: PageDocument, hijri_year: int) -> list[dict]:
     """
     Find the 'OFFICIAL 1st Day of Ramadan' heading and parse the
     date groups and numbered country lists that follow.
     """
-    soup = BeautifulSoup(html, "html.parser")
-    text = soup.get_text("\n", strip=True)
+    text = doc.text
 
     # Find the official section (various spellings)
     patterns = [
@@ -199,16 +201,11 @@ def extract_official_section(html: str, hijri_year: int) -> list[dict]:
         method_raw = (m.group(2) or "").strip()
         country_lower = country_raw.lower().strip()
 
-        country_id = COUNTRY_MAP.get(country_lower)
-        if not country_id:
-            # Try partial match
-            for key, cid in COUNTRY_MAP.items():
-                if key in country_lower or country_lower in key:
-                    country_id = cid
-                    break
-
-        if not country_id:
+        # Exact or partial match
+        key = COUNTRY_MATCHER.lookup(country_lower)
+        if key is None:
             continue  # Not a target country
+        country_id = COUNTRY_MAP[key]
 
         results.append({
             "hijriYear": hijri_year,
@@ -228,13 +225,11 @@ def extract_official_section(html: str, hijri_year: int) -> list[dict]:
 # ---------------------------------------------------------------------------
 # Fallback: parse from sighting reports body
 # ---------------------------------------------------------------------------
-def extract_from_sighting_reports(html: str, hijri_year: int) -> list[dict]:
+def extract_from_sighting_reports(doc: PageDocument, hijri_year: int) -> list[dict]:
     """
     As a fallback, look for patterns in the sighting report text that
     mention specific countries and their Ramadan start dates.
     """
-    soup = BeautifulSoup(html, "html.parser")
-    text = soup.get_text("\n", strip=True)
     results = []
 
     # Pattern: "the first day of Ramadan <country> ... <date>"
@@ -263,10 +258,11 @@ def main():
             errors.append({"year": year, "error": str(e)})
             continue
 
-        results = extract_official_section(resp.text, year)
+        doc = PageDocument(resp.text)
+        results = extract_official_section(doc, year)
         if not results:
             # Try fallback
-            results = extract_from_sighting_reports(resp.text, year)
+            results = extract_from_sighting_reports(doc, year)
 
         print(f"found {len(results)} entries")
         all_results.extend(results)
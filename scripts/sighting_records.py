@@ -0,0 +1,212 @@
+"""
+sighting_records.py
+
+The extracted sighting table and the vocabularies that go with it, shared by
+extract_table_from_text.py (writer), compare_datasets.py and
+merge_into_master.py (readers).
+
+moonsighting_extracted_table.csv has a fixed header, TABLE_COLUMNS.  Every
+row is parsed once into a SightingRecord with typed fields; readers never
+index or split raw rows themselves.  A file whose header does not match
+TABLE_COLUMNS is rejected instead of having its rows silently dropped.
+
+  records = read_records(EXTRACTED_TABLE)     # list[SightingRecord]
+  write_records(EXTRACTED_TABLE, rows)        # records or 8-tuples
+"""
+
+import csv
+import os
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+EXTRACTED_TABLE = SCRIPTS_DIR / "moonsighting_extracted_table.csv"
+REFERENCE_CSV = SCRIPTS_DIR / "primary_countries_all_years_inferred.csv"
+
+TABLE_COLUMNS = ["year_greg", "month_greg", "day_greg", "year_hijri",
+                 "month_hijri", "country", "city", "status"]
+
+# ---------------------------------------------------------------------------
+# Month vocabularies
+# ---------------------------------------------------------------------------
+HIJRI_MONTHS = [  # (moonsighting.com code, number, name)
+    ("muh", 1, "Muharram"), ("sfr", 2, "Safar"),
+    ("rba", 3, "Rabi al-Awwal"), ("rbt", 4, "Rabi al-Thani"),
+    ("jmo", 5, "Jumada al-Ula"), ("jmt", 6, "Jumada al-Thani"),
+    ("rjb", 7, "Rajab"), ("shb", 8, "Sha'ban"),
+    ("rmd", 9, "Ramadan"), ("shw", 10, "Shawwal"),
+    ("zqd", 11, "Dhul Qi'dah"), ("zhj", 12, "Dhul Hijjah"),
+]
+HIJRI_MONTH_NAMES = {num: name for _, num, name in HIJRI_MONTHS}
+
+# Every spelling seen in the reference CSV and the text dump
+HIJRI_MONTH_NUMS = {name: num for _, num, name in HIJRI_MONTHS}
+HIJRI_MONTH_NUMS.update({
+    "Rabi' al-Awwal": 3,
+    "Rabi' al-Thani": 4,
+    'Jumada al-Akhirah': 6,
+    'Shaban': 8,
+    'Dhu al-Qadah': 11,
+    'Dhu al-Hijjah': 12,
+})
+
+GREG_MONTH_NUMS = {
+    'January': 1, 'February': 2, 'March': 3, 'April': 4,
+    'May': 5, 'June': 6, 'July': 7, 'August': 8,
+    'September': 9, 'October': 10, 'November': 11, 'December': 12,
+}
+
+# ---------------------------------------------------------------------------
+# Country vocabularies
+# ---------------------------------------------------------------------------
+# Known country names and aliases to help parse reporter lines
+KNOWN_COUNTRIES = [
+    'Afghanistan', 'Albania', 'Algeria', 'Angola', 'Argentina', 'Armenia',
+    'Australia', 'Austria', 'Azerbaijan', 'Bahrain', 'Bangladesh', 'Barbados',
+    'Belgium', 'Bolivia', 'Bosnia', 'Brunei', 'Bulgaria', 'Burkina Faso',
+    'Cambodia', 'Cameroon', 'Canada', 'Chad', 'Chile', 'China', 'Colombia',
+    'Croatia', 'Dagestan', 'Denmark', 'Ecuador', 'Egypt', 'Ethiopia',
+    'Fiji', 'Finland', 'France', 'Georgia', 'Germany', 'Ghana', 'Greece',
+    'Guatemala', 'Guyana', 'Hungary', 'Iceland', 'India', 'Indonesia',
+    'Iran', 'Iraq', 'Ireland', 'Italy', 'Jamaica', 'Japan', 'Jordan',
+    'Kazakhstan', 'Kenya', 'Kosovo', 'Kuwait', 'Kyrgyzstan', 'Lebanon',
+    'Libya', 'Luxembourg', 'Macedonia', 'Madagascar', 'Malawi', 'Malaysia',
+    'Mali', 'Mauritania', 'Mauritius', 'Mexico', 'Montenegro', 'Morocco',
+    'Mozambique', 'Myanmar', 'Namibia', 'Nepal', 'Netherlands', 'New Zealand',
+    'Niger', 'Nigeria', 'Norway', 'Oman', 'Pakistan', 'Palestine', 'Panama',
+    'Paraguay', 'Peru', 'Philippines', 'Poland', 'Portugal', 'Qatar',
+    'Romania', 'Russia', 'Saudi Arabia', 'Senegal', 'Serbia', 'Singapore',
+    'Slovakia', 'Slovenia', 'Somalia', 'South Africa', 'South Korea', 'Spain',
+    'Sri Lanka', 'Sudan', 'Suriname', 'Sweden', 'Switzerland', 'Syria',
+    'Taiwan', 'Tajikistan', 'Tanzania', 'Thailand', 'Togo', 'Trinidad',
+    'Trinidad & Tobago', 'Tunisia', 'Turkey', 'Turkmenistan', 'UAE', 'U.A.E.',
+    'Uganda', 'UK', 'USA', 'United Kingdom', 'United States', 'Uzbekistan',
+    'Venezuela', 'Vietnam', 'Yemen', 'Zambia', 'Zimbabwe',
+    # Short/alternate forms found in reports
+    'S. Africa', 'S Africa',
+]
+
+# Alternate country names -> canonical form written to the extracted table
+COUNTRY_ALIASES = {
+    'S. Africa': 'South Africa',
+    'S Africa': 'South Africa',
+    'U.A.E.': 'UAE',
+    'United Kingdom': 'UK',
+    'United States': 'USA',
+    'Trinidad': 'Trinidad & Tobago',
+}
+
+# Reference-CSV country names -> extracted-table names, for comparison
+COUNTRY_NORMALIZE = {
+    'North America': 'USA',
+    'United Kingdom': 'UK',
+}
+
+# Extracted or reference country name -> master-CSV country name
+COUNTRY_TO_MASTER = {
+    'Saudi Arabia': 'Saudi Arabia',
+    'Egypt': 'Egypt',
+    'Turkey': 'Türkiye',
+    'Palestine': 'Palestine',
+    'Jordan': 'Jordan',
+    'Morocco': 'Morocco',
+    'Libya': 'Libya',
+    'South Africa': 'South Africa',
+    'S. Africa': 'South Africa',
+    'S Africa': 'South Africa',
+    'Nigeria': 'Nigeria',
+    'Malaysia': 'Malaysia',
+    'Pakistan': 'Pakistan',
+    'Indonesia': 'Indonesia',
+    'USA': 'United States',
+    'United States': 'United States',
+    'Canada': 'Canada',
+    'Australia': 'Australia',
+    'North America': 'United States',   # reference CSV
+    'Türkiye': 'Türkiye',
+}
+
+# Master CSV countries (the only ones we care about)
+MASTER_COUNTRIES = {
+    'Saudi Arabia', 'Egypt', 'Türkiye', 'Palestine', 'Jordan', 'Morocco',
+    'Libya', 'South Africa', 'Nigeria', 'Malaysia', 'Pakistan', 'Indonesia',
+    'United States', 'Canada', 'Australia',
+}
+
+
+# ---------------------------------------------------------------------------
+# Record type and CSV I/O
+# ---------------------------------------------------------------------------
+@dataclass(slots=True)
+class SightingRecord:
+    year_greg: int | None
+    month_greg: int | None
+    day_greg: int | None
+    year_hijri: int
+    month_hijri: int
+    country: str
+    city: str
+    status: str
+
+    @property
+    def greg_date(self) -> date | None:
+        """The Gregorian date of the report, or None if incomplete/invalid."""
+        if not (self.year_greg and self.month_greg and self.day_greg):
+            return None
+        try:
+            return date(self.year_greg, self.month_greg, self.day_greg)
+        except ValueError:
+            return None
+
+    def as_row(self) -> tuple:
+        return (self.year_greg, self.month_greg, self.day_greg,
+                self.year_hijri, self.month_hijri,
+                self.country, self.city, self.status)
+
+
+def _int_or_none(s: str):
+    return int(s) if s else None
+
+
+def iter_records(f):
+    """Yield a SightingRecord per row of an open extracted-table CSV.
+
+    Rows without a valid Hijri year/month are skipped; empty Gregorian
+    fields become None.
+    """
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    if header != TABLE_COLUMNS:
+        raise ValueError(f"unexpected extracted-table header {header}; "
+                         f"expected {TABLE_COLUMNS}")
+    for row in reader:
+        try:
+            yg, mg, dg, yh, mh, country, city, status = row
+            yield SightingRecord(_int_or_none(yg), _int_or_none(mg), _int_or_none(dg),
+                                 int(yh), int(mh), country, city, status)
+        except ValueError:
+            continue
+
+
+def read_records(path: Path = EXTRACTED_TABLE) -> list[SightingRecord]:
+    with open(path, encoding='utf-8', newline='') as f:
+        return list(iter_records(f))
+
+
+def write_records(path: Path, rows) -> int:
+    """Atomically write SightingRecords (or 8-tuples in TABLE_COLUMNS order)
+    to `path` as it is consumed; returns the row count."""
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    count = 0
+    with open(tmp, 'w', encoding='utf-8', newline='') as out:
+        writer = csv.writer(out, lineterminator='\n')
+        writer.writerow(TABLE_COLUMNS)
+        for row in rows:
+            writer.writerow(row.as_row() if isinstance(row, SightingRecord) else row)
+            count += 1
+    os.replace(tmp, path)
+    return count
@@ -0,0 +1,539 @@
+"""
+synthetic_corpus.py
+
+Deterministic moonsighting-style pages in every layout the parsers handle,
+with the answer each parser should give, for benchmarks and scale tests
+that must not depend on what happens to be in the local page archive.
+Same seed, same pages, on any machine.
+
+Layouts, by Hijri year as on the site:
+  list            1430-1435  "OFFICIAL 1st Day of ..." section with date
+                             headers and numbered country lists
+  announcements   1436-1437  no official section; "X declared ... to be on
+                             <date>" sentences only
+  table           1438+      <table> of (date, "Country (method)") rows,
+                             including "????" rows for pending countries
+Every page also has reporter blocks ("<name> (MCW member) <place>
+reported:" + status) under US-style and European date headers, the
+announcement sentences, and the navigation the text extractor trims.
+
+Each page is a SyntheticPage: the content (report days, official rows,
+declarations) from which both renderings are made, html() as on the site
+and text() as extract_text_from_html.py leaves it, and the ground truth:
+  entries()   {(country_id, date)} scrape_moonsighting_all.scan_page
+              should find
+  records()   the rows extract_table_from_text.iter_rows should yield for
+              the page (reports, declarations and dated table rows; the
+              numbered list lines are not read by the text pass)
+A country has one start date per page wherever it is mentioned.
+
+generate(n) streams n pages (or pages until n reports) cycling through
+the years, so the corpus can be far larger than the site (10k-1M pages)
+without being held in memory; page i depends only on (seed, i).
+
+  pages = synthetic_pages()                 # [(hijri_year, hijri_month, html)]
+
+Usage:
+  python scripts/synthetic_corpus.py archive DIR [--from-year 1430] [--to-year 1447]
+      (writes the pages into a page archive at DIR, see page_archive.py)
+  python scripts/synthetic_corpus.py text OUT [--pages N | --reports N]
+      (a moonsighting_all_text.txt-style file for extract_table_from_text.py)
+  python scripts/synthetic_corpus.py measure [--scales 1000,10000,100000] [--unit pages|reports]
+      (throughput and accuracy of the page scan and the text pass per scale)
+"""
+
+import argparse
+import html as htmllib
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from itertools import groupby
+from pathlib import Path
+
+from extract_text_from_html import month_header, year_header
+from page_archive import MONTH_CODES, PageArchive
+
+MONTH_NAMES = ["Muharram", "Safar", "Rabi al-Awwal", "Rabi al-Thani", "Jumada al-Ula",
+               "Jumada al-Thani", "Rajab", "Sha'ban", "Ramadan", "Shawwal",
+               "Dhul Qi'dah", "Dhul Hijjah"]
+
+DEFAULT_YEARS = range(1430, 1448)
+LIST_LAYOUT_LAST_YEAR = 1435
+TABLE_LAYOUT_FIRST_YEAR = 1438
+DEFAULT_SCALES = (1000, 10000, 100000)
+DEFAULT_TOWNS = 2000
+
+ISLAMIC_EPOCH_JDN = 1948439
+
+# Country as written -> id scrape_moonsighting_all.COUNTRY_MAP gives it (None:
+# not tracked).  The names are also the extracted-table spellings.
+COUNTRY_IDS = {
+    "Saudi Arabia": "sa", "Egypt": "eg", "Jordan": "jo", "Palestine": "ps",
+    "Pakistan": "pk", "Indonesia": "id", "Morocco": "ma", "Libya": "ly",
+    "South Africa": "za", "USA": "us", "Canada": "ca", "Turkey": "tr",
+    "Nigeria": "ng", "Malaysia": "my", "Australia": "au", "India": None,
+    "Bangladesh": None, "UK": None, "France": None,
+}
+COUNTRIES = list(COUNTRY_IDS)
+# Method as written -> status extract_table_from_text records for a table row
+METHOD_STATUS = {
+    "Local Sighting": "Sighting",
+    "30 days completion": "30 days completed",
+    "Calculations": "Calculations",
+    "Follow Saudi": "Follow Saudi",
+    "Official Announcement": "Official Announcement",
+    "Local Sighting - Official Announcement": "Sighting",
+}
+METHODS = list(METHOD_STATUS)
+# Reporter place as written -> (city, country)
+PLACES = {
+    "Houston, TX": ("Houston", "USA"),
+    "Toronto, Ontario": ("Toronto", "Canada"),
+    "London UK": ("London", "UK"),
+    "Cape Town, South Africa": ("Cape Town", "South Africa"),
+    "Karachi Pakistan": ("Karachi", "Pakistan"),
+    "Berlin": ("Berlin", "Germany"),
+    "Riyadh Saudi Arabia": ("Riyadh", "Saudi Arabia"),
+    "AVIGNON (south FRANCE)": ("AVIGNON", "France"),
+    "Chicago IL": ("Chicago", "USA"),
+    "Lahore, Pakistan": ("Lahore", "Pakistan"),
+    "Dallas Texas": ("Dallas", "USA"),
+    "Kuala Lumpur Malaysia": ("Kuala Lumpur", "Malaysia"),
+    "Imam of Al Noor Mosque Durban South Africa": ("Durban", "South Africa"),
+    "Ottawa, Ontario": ("Ottawa", "Canada"),
+}
+# Countries of the generated "Town <k>, <country>" places
+TOWN_COUNTRIES = ["Pakistan", "Malaysia", "Egypt", "Morocco", "Canada", "UK"]
+STATUSES = ["Seen", "Not Seen", "30 days completed"]
+
+
+def layout_of(hijri_year: int) -> str:
+    if hijri_year <= LIST_LAYOUT_LAST_YEAR:
+        return "list"
+    if hijri_year < TABLE_LAYOUT_FIRST_YEAR:
+        return "announcements"
+    return "table"
+
+
+def civil_start(hijri_year: int, hijri_month: int) -> date:
+    """Day 1 in the tabular calendar (as yallop.civil_month_start)."""
+    jdn = ((59 * (hijri_month - 1) + 1) // 2 + (hijri_year - 1) * 354
+           + (3 + 11 * hijri_year) // 30 + ISLAMIC_EPOCH_JDN)
+    return date.fromordinal(jdn - 1721425)
+
+
+def us_date(d: date) -> str:
+    return f"{d:%B} {d.day}, {d.year}"
+
+
+# ---------------------------------------------------------------------------
+# Content model
+# ---------------------------------------------------------------------------
+@dataclass
+class Report:
+    who: str                    # "Br. Name3 (MCW member) Houston, TX"
+    city: str
+    country: str
+    status: str
+    minutes: int
+
+
+@dataclass
+class ReportDay:
+    day: date
+    european: bool
+    reports: list[Report]
+
+    @property
+    def header(self) -> str:
+        d = self.day
+        return f"{d:%A}, {d.day} {d:%B} {d.year}:" if self.european else f"{us_date(d)} ({d:%A}):"
+
+
+@dataclass
+class Official:
+    country: str
+    day: date | None            # None: a "????" table row
+    method: str
+
+
+@dataclass
+class Declaration:
+    countries: tuple[str, ...]
+    day: date
+    adverb: str                 # "initially", "offically", ...
+
+
+@dataclass
+class SyntheticPage:
+    hijri_year: int
+    hijri_month: int
+    days: list[ReportDay]
+    official: list[Official] = field(default_factory=list)
+    declarations: list[Declaration] = field(default_factory=list)
+
+    @property
+    def layout(self) -> str:
+        return layout_of(self.hijri_year)
+
+    @property
+    def name(self) -> str:
+        return MONTH_NAMES[self.hijri_month - 1]
+
+    @property
+    def code(self) -> str:
+        return MONTH_CODES[self.hijri_month - 1]
+
+    @property
+    def report_count(self) -> int:
+        return sum(len(d.reports) for d in self.days)
+
+    # -- rendering ----------------------------------------------------------
+    def _blocks(self):
+        """("p", text) paragraphs and ("tr", (cell, cell)) table rows, in
+        page order, between the navigation header and footer."""
+        yield "h1", f"Moonsighting for {self.name} {self.hijri_year}"
+        for day in self.days:
+            yield "p", day.header
+            for r in day.reports:
+                yield "p", f"{r.who} reported:"
+                yield "p", r.status
+                yield "p", f"Clear sky to the west; looked from {r.minutes} minutes after sunset."
+
+        if self.layout == "list":
+            yield "h2", f"OFFICIAL 1st Day of {self.name} in Different Countries"
+            for day, group in groupby(self.official, key=lambda o: o.day):
+                yield "p", f"{us_date(day)} ({day:%A}):"
+                for n, o in enumerate(group, 1):
+                    yield "p", f"{n}. {o.country} ({o.method})"
+        elif self.layout == "table":
+            yield "tr", ("1st day of the month", "Country")
+            for o in self.official:
+                when = f"{us_date(o.day)} ({o.day:%A})" if o.day else "????"
+                yield "tr", (when, f"{o.country} ({o.method})")
+
+        for decl in self.declarations:
+            *head, last = decl.countries
+            who = f"{', '.join(head)} and {last}" if head else last
+            yield "p", (f"{who} {decl.adverb} declared {self.name} 1, {self.hijri_year} hijri "
+                        f"to be on {decl.day:%A}, {us_date(decl.day)}.")
+
+    def html(self) -> str:
+        out = ["<html><head><title>Moonsighting</title><script>var nav = 1;</script>",
+               "<style>p { margin: 0 }</style></head><body>",
+               "<div><a href='/'>Home</a> <a href='/moon'>Moon</a></div>"]
+        in_table = False
+        for tag, content in self._blocks():
+            if (tag == "tr") != in_table:
+                out.append("<table>" if not in_table else "</table>")
+                in_table = not in_table
+            if tag == "tr":
+                out.append("<tr>" + "".join(f"<td>{htmllib.escape(c, quote=False)}</td>"
+                                            for c in content) + "</tr>")
+            else:
+                out.append(f"<{tag}>{htmllib.escape(content, quote=False)}</{tag}>")
+        if in_table:
+            out.append("</table>")
+        out.append("<p>top</p><p>Back to Top</p><div>Home Moon Links</div></body></html>")
+        return "\n".join(out)
+
+    def text(self) -> str:
+        """The page as trim_navigation(extract_text(html)) gives it."""
+        lines = []
+        for tag, content in self._blocks():
+            lines += content if tag == "tr" else [content]
+        return "\n".join(lines) + "\n"
+
+    # -- ground truth -------------------------------------------------------
+    def start_dates(self) -> dict[str, date]:
+        """Country -> its start date on this page (pending rows excluded)."""
+        out = {o.country: o.day for o in self.official if o.day}
+        for decl in self.declarations:
+            out.update(dict.fromkeys(decl.countries, decl.day))
+        return out
+
+    def entries(self) -> set[tuple[str, date]]:
+        return {(COUNTRY_IDS[c], d) for c, d in self.start_dates().items() if COUNTRY_IDS[c]}
+
+    def records(self) -> list[tuple]:
+        """SightingRecord.as_row() tuples, in text order."""
+        y, m = self.hijri_year, self.hijri_month
+        rows = []
+        for day in self.days:
+            d = day.day
+            rows += [(d.year, d.month, d.day, y, m, r.country, r.city, r.status)
+                     for r in day.reports]
+        if self.layout == "table":
+            rows += [(o.day.year, o.day.month, o.day.day, y, m, o.country, "",
+                      METHOD_STATUS[o.method]) for o in self.official if o.day]
+        for decl in self.declarations:
+            d = decl.day
+            rows += [(d.year, d.month, d.day, y, m, c, "", "Official Declaration")
+                     for c in decl.countries]
+        return rows
+
+
+# ---------------------------------------------------------------------------
+# Generation
+# ---------------------------------------------------------------------------
+def _place(rng: random.Random, towns: int) -> tuple[str, str, str]:
+    """(place as written, city, country); one in four is a generated town,
+    so the number of distinct locations grows with the corpus."""
+    if towns and rng.random() < 0.25:
+        k = rng.randrange(towns)
+        country = TOWN_COUNTRIES[k % len(TOWN_COUNTRIES)]
+        return f"Town {k}, {country}", f"Town {k}", country
+    place = rng.choice(list(PLACES))
+    return (place, *PLACES[place])
+
+
+def make_page(hijri_year: int, hijri_month: int, rng: random.Random,
+              towns: int = 0) -> SyntheticPage:
+    start = civil_start(hijri_year, hijri_month)
+    days = []
+    for offset in (-1, 0):
+        reports = []
+        for k in range(rng.randint(4, 20)):
+            place, city, country = _place(rng, towns)
+            # "from" style for one in five (never "from Imam of ...")
+            from_style = rng.random() < 0.2 and not place.startswith("Imam ")
+            who = f"Sr. Name{k} from {place}" if from_style else f"Br. Name{k} (MCW member) {place}"
+            reports.append(Report(who, city, country, rng.choice(STATUSES), rng.randint(5, 40)))
+        days.append(ReportDay(start + timedelta(days=offset), rng.random() < 0.15, reports))
+    page = SyntheticPage(hijri_year, hijri_month, days)
+
+    countries = rng.sample(COUNTRIES, len(COUNTRIES))
+    if page.layout == "list":
+        listed, countries = countries[:10], countries[10:]
+        page.official = [Official(c, start + timedelta(days=n >= 6), rng.choice(METHODS))
+                         for n, c in enumerate(listed)]
+    elif page.layout == "table":
+        listed, countries = countries[:13], countries[13:]
+        page.official = sorted(
+            (Official(c, start + timedelta(days=rng.randint(0, 1)), rng.choice(METHODS))
+             for c in listed[:12]), key=lambda o: o.day)
+        page.official.append(Official(listed[12], None, "Follow Saudi"))
+    page.declarations = [
+        Declaration((countries[0],), start, "initially"),
+        Declaration(tuple(countries[1:4]), start + timedelta(days=1), "offically"),
+    ]
+    return page
+
+
+def generate(count: int, seed: int = 0, unit: str = "pages", towns: int = DEFAULT_TOWNS,
+             years=DEFAULT_YEARS):
+    """Yield SyntheticPages: `count` pages, or pages until `count` reports
+    (unit="reports").  Page i is month i of `years`, cycling, and depends
+    only on (seed, i)."""
+    months = [(y, m) for y in years for m in range(1, 13)]
+    done = i = 0
+    while done < count:
+        year, month = months[i % len(months)]
+        page = make_page(year, month, random.Random(f"{seed}:{i}"), towns)
+        done += 1 if unit == "pages" else page.report_count
+        i += 1
+        yield page
+
+
+def synthetic_pages(years=DEFAULT_YEARS, seed: int = 0) -> list[tuple[int, int, str]]:
+    """(hijri_year, hijri_month, html) for every month of `years`."""
+    n = len(years) * 12
+    return [(p.hijri_year, p.hijri_month, p.html())
+            for p in generate(n, seed, towns=0, years=years)]
+
+
+def text_lines(pages):
+    """Lines of a moonsighting_all_text.txt-style file (see
+    extract_text_from_html.build_lines) for the pages."""
+    year = None
+    for p in pages:
+        if p.hijri_year != year:
+            year = p.hijri_year
+            yield from year_header(year)
+        yield from month_header(p.hijri_year, p.code)
+        yield p.text()
+        yield ""
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+class Score:
+    """True/false positives and misses of found vs expected multisets."""
+
+    def __init__(self):
+        self.tp = self.fp = self.fn = 0
+
+    def add(self, found: Counter, expected: Counter):
+        hit = sum((found & expected).values())
+        self.tp += hit
+        self.fp += sum(found.values()) - hit
+        self.fn += sum(expected.values()) - hit
+
+    @property
+    def precision(self) -> float:
+        return self.tp / (self.tp + self.fp) if self.tp + self.fp else 1.0
+
+    @property
+    def recall(self) -> float:
+        return self.tp / (self.tp + self.fn) if self.tp + self.fn else 1.0
+
+
+def _timed(it, clock: list):
+    """Iterate `it`, adding the time spent inside it to clock[0]."""
+    it = iter(it)
+    while True:
+        t0 = time.perf_counter()
+        item = next(it, None)
+        clock[0] += time.perf_counter() - t0
+        if item is None:
+            return
+        yield item
+
+
+def measure_scan(pages) -> dict:
+    """scan_page over the pages, against entries()."""
+    from scrape_moonsighting_all import scan_page
+
+    score, seconds, n, size = Score(), 0.0, 0, 0
+    for p in pages:
+        html = p.html()
+        t0 = time.perf_counter()
+        entries, _ = scan_page((p.hijri_year, p.hijri_month, html))
+        seconds += time.perf_counter() - t0
+        found = Counter((e["countryId"], date.fromisoformat(e["gregorianStartDate"]))
+                        for e in entries)
+        score.add(found, Counter(p.entries()))
+        n += 1
+        size += len(html)
+    return {"pages": n, "seconds": seconds, "mb": size / 2**20, "score": score}
+
+
+def measure_text(pages, path: Path) -> dict:
+    """The text pass: extract_text + trim per page into a text file at
+    `path`, then iter_rows over the file, against records()."""
+    from extract_table_from_text import iter_content_lines, iter_rows
+    from extract_text_from_html import extract_text, trim_navigation
+
+    flatten, drift, truth = 0.0, 0, []
+    with open(path, "w", encoding="utf-8") as f:
+        year = None
+        for p in pages:
+            html = p.html()
+            t0 = time.perf_counter()
+            text = trim_navigation(extract_text(html))
+            flatten += time.perf_counter() - t0
+            drift += text != p.text()
+            if p.hijri_year != year:
+                year = p.hijri_year
+                f.write("\n".join(year_header(year)) + "\n")
+            f.write("\n".join(month_header(p.hijri_year, p.code) + [text, ""]) + "\n")
+            truth.append(((p.hijri_year, p.hijri_month), Counter(p.records())))
+
+    # Records come out in page order and consecutive pages are different
+    # months, so each run of one (year, month) is one page's output
+    score, clock = Score(), [0.0]
+    with open(path, encoding="utf-8") as f:
+        rows = _timed(iter_rows(iter_content_lines(f)), clock)
+        groups = groupby((r.as_row() for r in rows), key=lambda row: (row[3], row[4]))
+        group = next(groups, None)
+        for key, expected in truth:
+            found = Counter()
+            if group is not None and group[0] == key:
+                found = Counter(group[1])
+                group = next(groups, None)
+            score.add(found, expected)
+        while group is not None:
+            score.add(Counter(group[1]), Counter())
+            group = next(groups, None)
+    with open(path, encoding="utf-8") as f:
+        lines = sum(1 for _ in f)
+    return {"pages": len(truth), "flatten": flatten, "drift": drift, "seconds": clock[0],
+            "rows": score.tp + score.fp, "lines": lines, "score": score}
+
+
+def measure(scales, seed: int, unit: str, towns: int) -> list[str]:
+    out = [f"{'scale':>9s} {'pages':>8s} | {'scan pg/s':>9s} {'MB/s':>6s} {'P':>6s} {'R':>6s} | "
+           f"{'flat pg/s':>9s} {'rows/s':>8s} {'P':>6s} {'R':>6s}   per-item cost vs first"]
+    base = None
+    with tempfile.TemporaryDirectory(prefix="synthetic_corpus_") as tmp:
+        for scale in scales:
+            scan = measure_scan(generate(scale, seed, unit, towns))
+            text = measure_text(generate(scale, seed, unit, towns), Path(tmp) / "text.txt")
+            cost = (scan["seconds"] / scan["pages"], text["seconds"] / max(text["lines"], 1))
+            base = base or cost
+            s, t = scan["score"], text["score"]
+            out.append(
+                f"{scale:9d} {scan['pages']:8d} | {scan['pages'] / scan['seconds']:9.0f} "
+                f"{scan['mb'] / scan['seconds']:6.1f} {s.precision:6.3f} {s.recall:6.3f} | "
+                f"{text['pages'] / text['flatten']:9.0f} {text['rows'] / text['seconds']:8.0f} "
+                f"{t.precision:6.3f} {t.recall:6.3f}   "
+                f"scan x{cost[0] / base[0]:.2f}  text x{cost[1] / base[1]:.2f}")
+            if text["drift"]:
+                out.append(f"{'':9s} ! {text['drift']} pages flattened differently from "
+                           f"SyntheticPage.text()")
+    return out
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def _int_list(s: str) -> list[int]:
+    return [int(x) for x in s.split(",") if x.strip()]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Synthetic moonsighting pages.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    arch = sub.add_parser("archive", help="write the pages into a page archive")
+    arch.add_argument("dir", type=Path)
+    arch.add_argument("--from-year", type=int, default=DEFAULT_YEARS.start)
+    arch.add_argument("--to-year", type=int, default=DEFAULT_YEARS.stop - 1)
+    arch.add_argument("--seed", type=int, default=0)
+
+    text = sub.add_parser("text", help="write a text file for extract_table_from_text.py")
+    text.add_argument("out", type=Path)
+    size = text.add_mutually_exclusive_group()
+    size.add_argument("--pages", type=int, default=len(DEFAULT_YEARS) * 12)
+    size.add_argument("--reports", type=int)
+    text.add_argument("--seed", type=int, default=0)
+    text.add_argument("--towns", type=int, default=DEFAULT_TOWNS,
+                      help=f"distinct generated reporter towns (default {DEFAULT_TOWNS})")
+
+    meas = sub.add_parser("measure", help="throughput and accuracy per corpus size")
+    meas.add_argument("--scales", type=_int_list, default=list(DEFAULT_SCALES),
+                      help="comma-separated corpus sizes (default %(default)s)")
+    meas.add_argument("--unit", choices=["pages", "reports"], default="pages")
+    meas.add_argument("--seed", type=int, default=0)
+    meas.add_argument("--towns", type=int, default=DEFAULT_TOWNS,
+                      help=f"distinct generated reporter towns (default {DEFAULT_TOWNS})")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "archive":
+        pages = synthetic_pages(range(args.from_year, args.to_year + 1), args.seed)
+        with PageArchive(args.dir) as archive:
+            for year, month, html in pages:
+                archive.put(year, MONTH_CODES[month - 1], html)
+            archive.save()
+        print(f"{len(pages)} pages -> {args.dir}")
+    elif args.cmd == "text":
+        unit, count = ("reports", args.reports) if args.reports else ("pages", args.pages)
+        tmp = args.out.with_name(args.out.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for line in text_lines(generate(count, args.seed, unit, args.towns)):
+                f.write(line + "\n")
+        tmp.replace(args.out)
+        print(f"{count} {unit} -> {args.out}")
+    else:
+        print(f"Scales in {args.unit}; P/R = precision/recall against the ground truth "
+              f"(scan: start dates, text: table rows)")
+        print("\n".join(measure(args.scales, args.seed, args.unit, args.towns)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
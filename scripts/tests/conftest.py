@@ -0,0 +1,11 @@
+import sys
+from pathlib import Path
+
+# The scripts import each other as siblings, as when run from scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def pytest_addoption(parser):
+    parser.addoption("--page-archive", metavar="DIR", default=None,
+                     help="also check the parser backends on this page archive "
+                          "(e.g. scripts/moonsighting_archive)")
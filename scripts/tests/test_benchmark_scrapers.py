@@ -0,0 +1,38 @@
+"""
+Every benchmark_scrapers.py case on a small synthetic corpus (list,
+announcement and table layouts): all variants of a case give the same
+output, and the committed baseline only names cases and variants that
+still exist.  Timing is left to the script itself.
+
+Usage:
+  python -m pytest scripts/tests/test_benchmark_scrapers.py
+"""
+
+import json
+
+import pytest
+
+import benchmark_scrapers as bench
+from synthetic_corpus import LIST_LAYOUT_LAST_YEAR, TABLE_LAYOUT_FIRST_YEAR, synthetic_pages
+
+
+@pytest.fixture(scope="module")
+def pages():
+    return synthetic_pages(years=range(LIST_LAYOUT_LAST_YEAR, TABLE_LAYOUT_FIRST_YEAR + 1))
+
+
+@pytest.mark.parametrize("name", sorted(bench.CASES))
+def test_variants_agree(name, pages):
+    variants = bench.CASES[name](pages, 1)
+    outputs = {label: fn() for label, fn in variants.items()}
+    (first, expected), *rest = outputs.items()
+    for label, out in rest:
+        assert out == expected, f"{name}: {label} differs from {first}"
+
+
+def test_baseline_names_current_cases(pages):
+    runs = json.loads(bench.BASELINE_JSON.read_text(encoding="utf-8"))["runs"]
+    assert [run["corpus"]["name"] for run in runs] == ["synthetic"]
+    keys = {f"{name}/{label}" for name, case in bench.CASES.items()
+            for label in case(pages[:12], 1)}
+    assert set(runs[0]["results"]) == keys
@@ -0,0 +1,135 @@
+"""
+CountryMatcher must pick the same winner as the linear scans it replaced:
+the first key in list order, whichever key the regex happens to match.
+The reference loops below are those scans, verbatim in behaviour.
+
+Usage:
+  python -m pytest scripts/tests/test_country_matcher.py
+"""
+
+import pytest
+
+import scrape_moonsighting_all as scrape_all
+from country_matcher import CountryMatcher
+from extract_table_from_text import COUNTRIES_LONGEST_FIRST, KNOWN_COUNTRIES
+from page_document import PageDocument
+from synthetic_corpus import synthetic_pages
+
+
+# ---------------------------------------------------------------------------
+# The loops CountryMatcher replaced
+# ---------------------------------------------------------------------------
+def loop_lookup(keys, text):
+    if text in keys:
+        return text
+    for key in keys:
+        if key in text or text in key:
+            return key
+    return None
+
+
+def loop_first_contained(keys, text):
+    return next((k for k in keys if k in text), None)
+
+
+def loop_first_containing(keys, text):
+    return next((k for k in keys if text in k), None)
+
+
+def loop_first_prefix(keys, text):
+    return next((k for k in keys if text == k or text.startswith(k)), None)
+
+
+MATCHERS = {
+    "COUNTRY_MAP": list(scrape_all.COUNTRY_MAP),
+    "KNOWN_COUNTRIES": KNOWN_COUNTRIES,
+    "COUNTRIES_LONGEST_FIRST": COUNTRIES_LONGEST_FIRST,
+}
+
+
+@pytest.fixture(scope="module")
+def corpus_lines():
+    lines = {line for _, _, html in synthetic_pages(years=range(1430, 1448, 3))
+             for line in PageDocument(html).lines}
+    return sorted(lines)
+
+
+# ---------------------------------------------------------------------------
+# Pinned winners
+# ---------------------------------------------------------------------------
+@pytest.mark.parametrize("text, expected", [
+    ("Nigeria (Sighting)", "Niger"),         # "Niger" comes first in KNOWN_COUNTRIES
+    ("Niger", "Niger"),
+    ("Saudi Arabia (Calculations)", "Saudi Arabia"),
+    ("South Africa", "South Africa"),
+    ("Somewhere else", None),
+])
+def test_first_prefix_keeps_list_order(text, expected):
+    assert CountryMatcher(KNOWN_COUNTRIES).first_prefix(text) == expected
+    assert loop_first_prefix(KNOWN_COUNTRIES, text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Abuja, Nigeria", "Nigeria"),           # longest name first: not "Niger"
+    ("Niamey, Niger", "Niger"),
+    ("Cape Town, South Africa", "South Africa"),
+    ("Leeds, United Kingdom", "United Kingdom"),
+    ("Port of Spain, Trinidad & Tobago", "Trinidad & Tobago"),
+    ("nowhere in particular", None),
+])
+def test_first_contained_longest_first(text, expected):
+    assert CountryMatcher(COUNTRIES_LONGEST_FIRST).first_contained(text) == expected
+    assert loop_first_contained(COUNTRIES_LONGEST_FIRST, text) == expected
+
+
+def test_first_contained_is_list_order_not_match_order():
+    m = CountryMatcher(["Sudan", "South Sudan", "South"])
+    # "South Sudan" starts earlier in the text, but "Sudan" is first in order
+    assert m.first_contained("Juba, South Sudan") == "Sudan"
+    m = CountryMatcher(["South", "South Sudan"])
+    assert m.first_contained("South Sudan") == "South"
+
+
+def test_first_containing_keeps_list_order():
+    m = CountryMatcher(["united states", "united kingdom", "states"])
+    assert m.first_containing("united") == "united states"
+    assert m.first_containing("states") == "united states"
+    assert m.first_containing("kingdom") == "united kingdom"
+    assert m.first_containing("canada") is None
+
+
+def test_lookup_prefers_exact_then_earliest_either_way():
+    m = CountryMatcher(["saudi arabia", "saudi", "arabia"])
+    assert m.lookup("saudi") == "saudi"                      # exact
+    assert m.lookup("kingdom of saudi arabia") == "saudi arabia"
+    assert m.lookup("saud") == "saudi arabia"                # text in key
+    m = CountryMatcher(["uk", "ukraine"])
+    assert m.lookup("ukraine") == "ukraine"                  # exact beats order
+    assert m.lookup("ukrainian") == "uk"                     # "uk" first in order
+    assert m.lookup("krain") == "ukraine"                    # only "text in key"
+
+
+def test_edge_cases():
+    assert CountryMatcher([]).lookup("egypt") is None
+    assert CountryMatcher([]).first_prefix("egypt") is None
+    m = CountryMatcher(["egypt", "", "egypt"])               # duplicates dropped
+    assert m.keys == ["egypt", ""]
+    assert m.first_contained("morocco") == ""
+    assert m.first_prefix("morocco") == ""
+    assert m.first_containing("a\x00b") is None
+
+
+# ---------------------------------------------------------------------------
+# Same answers as the loops on every line of the synthetic corpus
+# ---------------------------------------------------------------------------
+@pytest.mark.parametrize("name", MATCHERS)
+def test_matches_loops_on_corpus(name, corpus_lines):
+    keys = MATCHERS[name]
+    m = CountryMatcher(keys)
+    texts = corpus_lines + [line.lower() for line in corpus_lines] + list(keys) \
+        + [k[1:-1] for k in keys]
+    for text in texts:
+        assert m.lookup(text) == loop_lookup(keys, text), text
+        assert m.first_contained(text) == loop_first_contained(keys, text), text
+        assert m.first_containing(text) == loop_first_containing(keys, text), text
+        assert m.first_prefix(text) == loop_first_prefix(keys, text), text
@@ -0,0 +1,158 @@
+"""
+date_tokens.py against the regex cascades it replaced: the same shape wins
+in the same order, an invalid first match hands over to the next shape,
+and the text pass keeps its case rules.  The old patterns are kept below
+as the reference.
+
+Usage:
+  python -m pytest scripts/tests/test_date_tokens.py
+"""
+
+import re
+from datetime import date
+
+import pytest
+
+import date_tokens
+from page_document import PageDocument
+from sighting_records import GREG_MONTH_NUMS
+from synthetic_corpus import generate, synthetic_pages, text_lines
+
+MONTHS = '|'.join(GREG_MONTH_NUMS)
+WEEKDAYS = '|'.join(date_tokens.WEEKDAYS)
+MONTH_NAMES_LOWER = {name.lower(): num for name, num in GREG_MONTH_NUMS.items()}
+
+
+# ---------------------------------------------------------------------------
+# The cascades date_tokens replaced
+# ---------------------------------------------------------------------------
+OLD_SCRAPER_PATTERNS = (
+    re.compile(r"(?P<month>[A-Za-z]+)\s+(?P<day>\d{1,2}),?\s+(?P<year>\d{4})\s*\(", re.IGNORECASE),
+    re.compile(r"(?:" + WEEKDAYS + r"),?\s+(?P<day>\d{1,2})\s+(?P<month>[A-Za-z]+)\s+(?P<year>\d{4})",
+               re.IGNORECASE),
+    re.compile(r"(?P<month>[A-Za-z]+)\s+(?P<day>\d{1,2}),?\s+(?P<year>\d{4})", re.IGNORECASE),
+)
+OLD_RE_DATE = re.compile(r'^(' + MONTHS + r')\s+(\d{1,2}),\s+(\d{4})\s+\(')
+OLD_RE_DATE_EU = re.compile(r'^(?:' + WEEKDAYS + r'),?\s+(\d{1,2})\s+(' + MONTHS + r')\s+(\d{4})')
+OLD_RE_DECL_DATE = re.compile(r'(?:on\s+)?(?:' + WEEKDAYS + r'),?\s+(' + MONTHS + r')\s+(\d{1,2}),?\s+(\d{4})')
+OLD_RE_BLOCK_DATE = re.compile(r'(' + MONTHS + r')\s+(\d{1,2}),?\s+(\d{4})')
+
+
+def old_first_date(text):
+    for pattern in OLD_SCRAPER_PATTERNS:
+        m = pattern.search(text)
+        if m:
+            mn = m.group("month").lower()
+            if mn in MONTH_NAMES_LOWER:
+                try:
+                    return date(int(m.group("year")), MONTH_NAMES_LOWER[mn], int(m.group("day")))
+                except ValueError:
+                    pass
+    return None
+
+
+def old_header_date(line):
+    m = OLD_RE_DATE.match(line)
+    if m:
+        return int(m.group(3)), GREG_MONTH_NUMS[m.group(1)], int(m.group(2))
+    m = OLD_RE_DATE_EU.match(line)
+    if m:
+        return int(m.group(3)), GREG_MONTH_NUMS[m.group(2)], int(m.group(1))
+    return None
+
+
+def old_month_day(pattern, text):
+    m = pattern.search(text)
+    return None if m is None else (int(m.group(3)), GREG_MONTH_NUMS[m.group(1)], int(m.group(2)))
+
+
+def ymd(tok):
+    return None if tok is None else (tok.year, tok.month, tok.day)
+
+
+# ---------------------------------------------------------------------------
+# Table-driven cases
+# ---------------------------------------------------------------------------
+@pytest.mark.parametrize("text, expected", [
+    ("August 22, 2009 (Saturday):", date(2009, 8, 22)),
+    ("August 22 2009(Saturday)", date(2009, 8, 22)),
+    ("Friday, 20 July 2012:", date(2012, 7, 20)),
+    ("monday 3 june 2019", date(2019, 6, 3)),                  # any case
+    ("May 27, 2017", date(2017, 5, 27)),
+    ("to be on Tuesday, December 30, 2008.", date(2008, 12, 30)),
+    # A month-day with "(" wins over an earlier one without
+    ("Expected May 27, 2017; seen August 22, 2009 (Saturday)", date(2009, 8, 22)),
+    # ... and a weekday day-month over an earlier plain month-day
+    ("May 27, 2017 or Friday, 20 July 2012", date(2012, 7, 20)),
+    # The first match of a shape is not a date: next shape, not next match
+    ("February 30, 2020 (Sunday) or March 1, 2020 (Monday)", None),
+    ("Shawwal 1, 1438 AH: Saturday, June 26, 2017", None),
+    ("Sunday, 31 June 2015 then June 26, 2017", date(2017, 6, 26)),
+    ("no date here", None),
+])
+def test_first_date(text, expected):
+    assert date_tokens.first_date(text) == expected
+    assert old_first_date(text) == expected
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("August 30, 2011 (Tuesday)", (2011, 8, 30)),
+    ("August 30, 2011  (Tuesday):", (2011, 8, 30)),
+    ("Friday, 20 July 2012:", (2012, 7, 20)),
+    ("Friday 20 July 2012", (2012, 7, 20)),
+    ("February 30, 2011 (Sunday)", (2011, 2, 30)),             # fields as written
+    ("August 30 2011 (Tuesday)", None),                         # no comma
+    ("August 30, 2011", None),                                  # no "("
+    ("August 30, 2011(Tuesday)", None),                         # no space before "("
+    ("august 30, 2011 (Tuesday)", None),                        # lower-case month
+    ("friday, 20 July 2012", None),                             # lower-case weekday
+    ("20 July 2012:", None),                                    # no weekday
+    ("Friday, August 30, 2011 (Tuesday)", None),                # weekday, month-day
+    ("Reported August 30, 2011 (Tuesday)", None),               # not at the start
+    ("Augustine (MCW member) Leeds, UK reported:", None),
+])
+def test_header_date(line, expected):
+    assert ymd(date_tokens.header_date(line)) == expected
+    assert old_header_date(line) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("declared Shawwal 1 to be on Tuesday, December 30, 2008.", (2008, 12, 30)),
+    ("to be on Tuesday December 30 2008", (2008, 12, 30)),
+    ("to be on December 30, 2008.", None),                      # no weekday
+    ("to be on tuesday, december 30, 2008.", None),             # lower case
+    ("to be on Tuesday, 30 December 2008.", None),              # day-month
+    ("Friday, 20 July 2012 or Tuesday, December 30, 2008", (2008, 12, 30)),
+])
+def test_weekday_date(text, expected):
+    assert ymd(date_tokens.weekday_date(text)) == expected
+    assert old_month_day(OLD_RE_DECL_DATE, text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Shawwal 1, 1438 AH: Saturday, June 26, 2017", (2017, 6, 26)),
+    ("Declaration: June 26 2017", (2017, 6, 26)),
+    ("Declaration: june 26, 2017", None),                       # lower case
+    ("Declaration: 26 June 2017", None),                        # day-month
+    ("June 31, 2017 then July 1, 2017", (2017, 6, 31)),         # fields as written
+])
+def test_month_date(text, expected):
+    assert ymd(date_tokens.month_date(text)) == expected
+    assert old_month_day(OLD_RE_BLOCK_DATE, text) == expected
+
+
+# ---------------------------------------------------------------------------
+# Same answers as the cascades on the synthetic corpus
+# ---------------------------------------------------------------------------
+def test_matches_cascades_on_corpus():
+    page_lines = [line for _, _, html in synthetic_pages(years=range(1430, 1448, 2))
+                  for line in PageDocument(html).lines]
+    dump_lines = [line for chunk in text_lines(generate(300, seed=1))
+                  for line in chunk.split('\n')]
+    for text in page_lines:
+        assert date_tokens.first_date(text) == old_first_date(text), text
+    assert sum(date_tokens.header_date(line) is not None for line in dump_lines) > 300
+    for line in dump_lines:
+        assert ymd(date_tokens.header_date(line)) == old_header_date(line), line
+        assert ymd(date_tokens.weekday_date(line)) == old_month_day(OLD_RE_DECL_DATE, line), line
+        assert ymd(date_tokens.month_date(line)) == old_month_day(OLD_RE_BLOCK_DATE, line), line
@@ -0,0 +1,285 @@
+"""
+Tests for download_moonsighting_pages.py against a local http.server
+stand-in for moonsighting.com: concurrency, the per-host rate limit,
+404 and stub handling, and the FetchStats summary main() reports.
+
+Usage:
+  python -m pytest scripts/tests/test_download_moonsighting_pages.py
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import download_moonsighting_pages as dl
+from page_archive import PageArchive
+
+FULL_PAGE = "<html><body>" + "<p>Crescent sighting report.</p>" * 40 + "</body></html>"
+STUB_PAGE = "<html><body>Coming soon</body></html>"
+
+
+# ---------------------------------------------------------------------------
+# Fixture server
+# ---------------------------------------------------------------------------
+class PageHandler(BaseHTTPRequestHandler):
+    """Serves server.pages by path with an ETag; anything else is a 404.
+    str bodies go out as UTF-8, bytes bodies as ISO-8859-1."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.hits.append((time.monotonic(), self.path))
+        try:
+            time.sleep(server.delay)
+            body = server.pages.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            etag = f'"{len(body)}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            if isinstance(body, bytes):
+                data, charset = body, "iso-8859-1"
+            else:
+                data, charset = body.encode("utf-8"), "utf-8"
+            self.send_response(200)
+            self.send_header("Content-Type", f"text/html; charset={charset}")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    httpd.daemon_threads = True
+    httpd.pages = {}
+    httpd.delay = 0.0
+    httpd.lock = threading.Lock()
+    httpd.active = 0
+    httpd.max_active = 0
+    httpd.hits = []
+    httpd.base_url = f"http://127.0.0.1:{httpd.server_address[1]}/{{year}}{{code}}.html"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    """(fetch, archive, meta_store, stats): fetch(url, year, code, conditional=False)."""
+    archive = PageArchive(tmp_path / "archive")
+    meta_store = dl.FetchMetaStore(tmp_path / dl.META_FILENAME)
+    session = dl.make_session(4)
+    limiter = dl.HostRateLimiter(rate=1000.0, burst=100)
+    stats = dl.FetchStats()
+
+    def fetch(url, year, code, conditional=False):
+        return dl.fetch_page(session, limiter, stats, meta_store, archive,
+                             url, year, code, conditional)
+
+    yield fetch, archive, meta_store, stats
+    session.close()
+    archive.close()
+
+
+def page_path(year, code):
+    return f"/{year}{code}.html"
+
+
+# ---------------------------------------------------------------------------
+# fetch_page
+# ---------------------------------------------------------------------------
+def test_fetch_page_outcomes(server, fetcher):
+    fetch, archive, meta_store, stats = fetcher
+    server.pages[page_path(1446, "rmd")] = FULL_PAGE
+    url = server.base_url.format(year=1446, code="rmd")
+
+    assert fetch(url, 1446, "rmd") == ("changed", len(FULL_PAGE), None)
+    assert archive.get(1446, "rmd") == FULL_PAGE
+    assert meta_store.get(url)["etag"] == f'"{len(FULL_PAGE)}"'
+
+    # Same bytes again: nothing new is archived
+    assert fetch(url, 1446, "rmd") == ("unchanged", len(FULL_PAGE), None)
+    assert len(archive.history(1446, "rmd")) == 1
+
+    # Conditional GET with the stored ETag
+    assert fetch(url, 1446, "rmd", conditional=True) == ("not-modified", 0, None)
+    assert meta_store.get(url)["lastStatus"] == 304
+
+    missing = server.base_url.format(year=1430, code="muh")
+    outcome, size, err = fetch(missing, 1430, "muh")
+    assert (outcome, size) == ("error", 0)
+    assert "404" in str(err)
+    assert archive.latest(1430, "muh") is None
+    assert meta_store.get(missing) == {}
+
+    assert stats.summary()["requests"] == 4
+
+
+def test_unchanged_means_same_as_the_archive(server, fetcher):
+    fetch, archive, meta_store, _ = fetcher
+    server.pages[page_path(1439, "rmd")] = FULL_PAGE
+    url = server.base_url.format(year=1439, code="rmd")
+    assert fetch(url, 1439, "rmd")[0] == "changed"
+
+    # The archive is restored from another snapshot; the meta still has
+    # the digest of the page the server sends
+    older = FULL_PAGE.replace("Crescent", "Hilal")
+    archive.put(1439, "rmd", older)
+    assert fetch(url, 1439, "rmd")[0] == "changed"
+    assert archive.get(1439, "rmd") == FULL_PAGE
+    assert meta_store.get(url)["sha256"] == archive.latest(1439, "rmd")["sha256"]
+
+
+def test_meta_digest_matches_archive_for_other_charsets(server, fetcher):
+    fetch, archive, meta_store, _ = fetcher
+    page = FULL_PAGE.replace("report", "r\u00e9sum\u00e9")
+    server.pages[page_path(1442, "shw")] = page.encode("iso-8859-1")
+    url = server.base_url.format(year=1442, code="shw")
+
+    assert fetch(url, 1442, "shw")[0] == "changed"
+    assert archive.get(1442, "shw") == page
+    stored = archive.latest(1442, "shw")
+    assert meta_store.get(url)["sha256"] == stored["sha256"]
+    assert meta_store.get(url)["size"] == stored["size"]
+    assert fetch(url, 1442, "shw")[0] == "unchanged"
+
+
+def test_stub_pages_are_archived_and_refetched(server, fetcher):
+    fetch, archive, meta_store, _ = fetcher
+    server.pages[page_path(1431, "shw")] = STUB_PAGE
+    url = server.base_url.format(year=1431, code="shw")
+
+    assert fetch(url, 1431, "shw")[0] == "changed"
+    stored = archive.latest(1431, "shw")
+    assert stored["size"] <= dl.MIN_PAGE_BYTES
+    # A past year is frozen, except while only a stub is on disk
+    assert dl.needs_fetch(meta_store.get(url), stored, 1431, 1447, 1, 24.0) == "fetch"
+
+    server.pages[page_path(1431, "shw")] = FULL_PAGE
+    assert fetch(url, 1431, "shw")[0] == "changed"
+    assert archive.get(1431, "shw") == FULL_PAGE
+    stored = archive.latest(1431, "shw")
+    assert dl.needs_fetch(meta_store.get(url), stored, 1431, 1447, 1, 24.0) == "skip"
+
+
+def test_workers_fetch_concurrently(server, fetcher):
+    fetch, _, _, stats = fetcher
+    server.delay = 0.1
+    targets = [(1440, code) for code in dl.MONTH_CODES[:8]]
+    for year, code in targets:
+        server.pages[page_path(year, code)] = FULL_PAGE
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(fetch, server.base_url.format(year=year, code=code), year, code)
+                   for year, code in targets]
+        outcomes = [f.result()[0] for f in futures]
+    stats.stop()
+
+    assert outcomes == ["changed"] * len(targets)
+    assert server.max_active > 1
+    # Four workers over eight 0.1 s requests: well under the serial 0.8 s
+    assert stats.summary()["elapsed_s"] < 0.6
+
+
+# ---------------------------------------------------------------------------
+# HostRateLimiter
+# ---------------------------------------------------------------------------
+def test_rate_limit_spaces_requests_per_host(server, tmp_path):
+    rate, burst, n = 20.0, 2, 8
+    for code in dl.MONTH_CODES[:n]:
+        server.pages[page_path(1441, code)] = FULL_PAGE
+    archive = PageArchive(tmp_path / "archive")
+    meta_store = dl.FetchMetaStore(tmp_path / dl.META_FILENAME)
+    session = dl.make_session(4)
+    limiter = dl.HostRateLimiter(rate, burst)
+    stats = dl.FetchStats()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda code: dl.fetch_page(
+            session, limiter, stats, meta_store, archive,
+            server.base_url.format(year=1441, code=code), 1441, code, False),
+            dl.MONTH_CODES[:n]))
+    session.close()
+
+    times = sorted(t for t, _ in server.hits)
+    # The burst goes out at once; the rest are paced at `rate` per second
+    assert times[-1] - times[0] >= (n - burst) / rate * 0.9
+    assert list(limiter.buckets) == [f"127.0.0.1:{server.server_address[1]}"]
+
+
+def test_rate_limit_buckets_are_per_host():
+    limiter = dl.HostRateLimiter(rate=1.0, burst=1)
+    t0 = time.monotonic()
+    limiter.acquire("http://a.example/1430muh.html")
+    limiter.acquire("http://b.example/1430muh.html")
+    assert time.monotonic() - t0 < 0.5
+    assert sorted(limiter.buckets) == ["a.example", "b.example"]
+
+
+# ---------------------------------------------------------------------------
+# FetchStats / main
+# ---------------------------------------------------------------------------
+def test_fetch_stats_summary():
+    stats = dl.FetchStats()
+    assert stats.summary()["requests"] == 0
+    assert stats.summary()["latency_p95_s"] == 0.0
+    for i in range(1, 21):
+        stats.record(i / 100, 1024)
+    stats.stop()
+    s = stats.summary()
+    assert s["requests"] == 20
+    assert s["bytes"] == 20 * 1024
+    assert s["latency_mean_s"] == pytest.approx(0.105)
+    assert s["latency_p50_s"] == pytest.approx(0.11)
+    assert s["latency_p95_s"] == pytest.approx(0.20)
+    assert s["latency_max_s"] == pytest.approx(0.20)
+    assert s["kb_per_s"] == pytest.approx(20 / s["elapsed_s"])
+
+
+def test_main_end_to_end(server, tmp_path, capsys):
+    recent = [(year, code) for year in (1446, 1447) for code in dl.MONTH_CODES]
+    for year, code in recent:
+        server.pages[page_path(year, code)] = FULL_PAGE
+    server.pages[page_path(1440, "rmd")] = FULL_PAGE
+    server.pages[page_path(1445, "muh")] = STUB_PAGE
+    argv = ["--base-url", server.base_url, "--archive", str(tmp_path / "archive"),
+            "--jobs", "8", "--rate", "1000", "--burst", "100", "--current-year", "1447"]
+    total = (dl.END_YEAR - dl.START_YEAR + 1) * len(dl.MONTH_CODES)
+    missing = total - len(recent) - 2
+
+    s = dl.main(argv)
+    out = capsys.readouterr().out
+    assert s["requests"] == total
+    assert s["bytes"] == (len(recent) + 1) * len(FULL_PAGE) + len(STUB_PAGE)
+    assert f"Downloaded:   {len(recent) + 2}" in out
+    assert f"Errors:       {missing}" in out
+    assert "1430muh.html         ... ERROR: 404 Client Error" in out
+    assert "Throughput:" in out and "Latency:" in out
+
+    # Second run: full past pages and fresh recent pages are skipped; the
+    # stub and the missing pages are asked for again
+    s = dl.main(argv)
+    out = capsys.readouterr().out
+    assert s["requests"] == missing + 1
+    assert f"Skipped:      {len(recent) + 1}" in out
+    assert "Unchanged:    1" in out
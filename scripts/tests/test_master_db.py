@@ -0,0 +1,91 @@
+"""
+MasterDB CSV round trip: import then export reproduces each CSV byte for
+byte (line endings, quoting, row order), and a file that would not
+round-trip is rejected without touching the table.
+
+Usage:
+  python -m pytest scripts/tests/test_master_db.py
+"""
+
+import pytest
+
+from master_db import CONFLICT_COLUMNS, DATA_DIR, MONTH_START_COLUMNS, TABLES, MasterDB
+
+MONTH_START_ROWS = [
+    "Saudi Arabia,Makkah,1445,9,Ramadan,2024-03-11,2024,Supreme Court,Sighting,,0.9,,a1",
+    'Egypt,Cairo,1445,10,Shawwal,2024-04-10,2024,,Unknown,https://www.moonsighting.com,0.5,'
+    '"moonsighting.com: Altitude > 5°, elongation > 8°",c3',
+    'Türkiye,Ankara,1445,10,Shawwal,,,,,,,"said ""tomorrow""",d4',
+]
+
+
+def csv_bytes(columns, rows, eol):
+    return eol.join([",".join(columns), *rows, ""]).encode("utf-8")
+
+
+@pytest.fixture
+def db(tmp_path):
+    with MasterDB(tmp_path / "test.db") as db:
+        yield db
+
+
+@pytest.mark.parametrize("eol", ["\r\n", "\n"], ids=["crlf", "lf"])
+def test_round_trip_small_csv(db, tmp_path, eol):
+    src = tmp_path / "in.csv"
+    src.write_bytes(csv_bytes(MONTH_START_COLUMNS, MONTH_START_ROWS, eol))
+    assert db.import_csv("month_starts", src) == len(MONTH_START_ROWS)
+    out = tmp_path / "out.csv"
+    db.export_csv("month_starts", out)
+    assert out.read_bytes() == src.read_bytes()
+
+
+def test_round_trip_repo_data(tmp_path):
+    with MasterDB(tmp_path / "test.db") as db:
+        counts = db.import_all(DATA_DIR)
+    # A fresh connection reads back what was committed
+    with MasterDB(tmp_path / "test.db") as db:
+        for table, (name, _) in TABLES.items():
+            db.export_csv(table, tmp_path / name)
+            assert (tmp_path / name).read_bytes() == (DATA_DIR / name).read_bytes()
+    assert counts["month_starts"] > 0
+
+
+def test_non_canonical_numbers_are_rejected(db, tmp_path):
+    src = tmp_path / "in.csv"
+    src.write_bytes(csv_bytes(MONTH_START_COLUMNS, MONTH_START_ROWS, "\n"))
+    db.import_csv("month_starts", src)
+    bad = tmp_path / "bad.csv"
+    bad.write_bytes(csv_bytes(MONTH_START_COLUMNS,
+                              ["Egypt,Cairo,1445,09,Ramadan,,,,,,,,x9"], "\n"))
+    with pytest.raises(ValueError, match="round-trip"):
+        db.import_csv("month_starts", bad)
+    # The previous import is still there
+    assert db.csv_text("month_starts").encode("utf-8") == src.read_bytes()
+
+
+def test_unexpected_header_is_rejected(db, tmp_path):
+    src = tmp_path / "in.csv"
+    src.write_bytes(csv_bytes(MONTH_START_COLUMNS[::-1], [], "\n"))
+    with pytest.raises(ValueError, match="unexpected header"):
+        db.import_csv("month_starts", src)
+
+
+def test_merge_writes_keep_file_order(db, tmp_path):
+    src = tmp_path / "in.csv"
+    src.write_bytes(csv_bytes(MONTH_START_COLUMNS, MONTH_START_ROWS, "\r\n"))
+    db.import_csv("month_starts", src)
+    updated = {"Country": "Türkiye", "City": "Ankara", "HijriYear": 1445, "HijriMonth": 10,
+               "HijriMonthName": "Shawwal", "GregorianStartDate": "2024-04-09",
+               "GregorianYear": "2024", "RecordId": "d4"}
+    inserted = {"Country": "Jordan", "City": "Amman", "HijriYear": 1445, "HijriMonth": 9,
+                "RecordId": "e5"}
+    assert db.upsert_month_starts([updated, inserted]) == 2
+    lines = db.csv_text("month_starts").split("\r\n")
+    assert lines[3] == "Türkiye,Ankara,1445,10,Shawwal,2024-04-09,2024,,,,,,d4"
+    assert lines[4] == "Jordan,Amman,1445,9,,,,,,,,,e5"
+
+    conflicts = [dict.fromkeys(CONFLICT_COLUMNS, "") | {"ConflictId": cid, "ConflictType": "t"}
+                 for cid in ("z", "a", "m")]
+    assert db.replace_conflicts("t", conflicts) == 3
+    assert [line.split(",")[0] for line in db.csv_text("conflicts").split("\n")[1:-1]] \
+        == ["z", "a", "m"]
@@ -0,0 +1,122 @@
+"""
+MasterStore on a small hand-edited-style CSV: an update rewrites only the
+changed row, line endings and quoting are kept, unchanged stores are not
+written, and a failed save leaves the file as it was.
+
+Usage:
+  python -m pytest scripts/tests/test_master_store.py
+"""
+
+import csv
+
+import pytest
+
+from master_store import MasterStore, record_id
+
+HEADER = ("Country,City,HijriYear,HijriMonth,HijriMonthName,GregorianStartDate,GregorianYear,"
+          "Authority,Method,SourceURL,ConfidenceScore,Notes,RecordId")
+ROWS = [
+    "Saudi Arabia,Makkah,1445,9,Ramadan,2024-03-11,2024,Supreme Court,Sighting,,0.9,,a1",
+    "Egypt,Cairo,1445,9,Ramadan,,,,,,,,b2",
+    'Egypt,Cairo,1445,10,Shawwal,2024-04-10,2024,,Unknown,https://www.moonsighting.com,0.5,'
+    '"moonsighting.com: Altitude > 5°, elongation > 8°",c3',
+    "Türkiye,Ankara,1445,10,Shawwal,2024-04-09,2024,Diyanet,Calculation,,0.7,,d4",
+]
+
+
+def write_csv(path, eol):
+    path.write_bytes(eol.join([HEADER, *ROWS, ""]).encode("utf-8"))
+    return path.read_bytes()
+
+
+@pytest.fixture(params=["\r\n", "\n"], ids=["crlf", "lf"])
+def master(request, tmp_path):
+    path = tmp_path / "master.csv"
+    return path, write_csv(path, request.param), request.param
+
+
+def test_update_rewrites_only_that_row(master):
+    path, before, eol = master
+    store = MasterStore(path)
+    assert store.lineterminator == eol
+    assert store.update(("Egypt", 1445, 9), {"GregorianStartDate": "2024-03-11",
+                                             "GregorianYear": "2024"})
+    assert store.save()
+
+    after = path.read_bytes()
+    old_lines, new_lines = before.split(eol.encode()), after.split(eol.encode())
+    assert len(new_lines) == len(old_lines)
+    changed = [i for i, (a, b) in enumerate(zip(old_lines, new_lines)) if a != b]
+    assert changed == [2]
+    assert new_lines[2] == "Egypt,Cairo,1445,9,Ramadan,2024-03-11,2024,,,,,,b2".encode()
+    if eol == "\n":
+        assert b"\r" not in after
+    assert not path.with_name(path.name + ".tmp").exists()
+
+
+def test_unchanged_store_is_not_written(master):
+    path, before, _ = master
+    store = MasterStore(path)
+    assert not store.update(("Egypt", 1445, 10), {"Method": "Unknown"})
+    assert not store.dirty
+    # Changed and changed back: nothing to write either
+    store.update(("Egypt", 1445, 10), {"Method": "Sighting"})
+    assert store.dirty
+    store.update(("Egypt", 1445, 10), {"Method": "Unknown"})
+    assert not store.dirty
+    assert store.diff() == []
+
+    path.write_bytes(b"sentinel")
+    assert not store.save()
+    assert path.read_bytes() == b"sentinel"
+
+
+def test_diff_and_upsert_many(master):
+    path, _, _ = master
+    store = MasterStore(path)
+    counts = store.upsert_many([
+        {"Country": "Egypt", "HijriYear": "1445", "HijriMonth": "9",
+         "GregorianStartDate": "2024-03-11"},
+        {"Country": "Saudi Arabia", "HijriYear": 1445, "HijriMonth": 9,
+         "Method": "Sighting"},
+        {"Country": "Jordan", "City": "Amman", "HijriYear": 1445, "HijriMonth": 9,
+         "GregorianStartDate": "2024-03-11"},
+    ])
+    assert counts == {"updated": 1, "unchanged": 1, "inserted": 1}
+    assert store.diff() == [
+        (("Egypt", 1445, 9), "b2", {"GregorianStartDate": ("", "2024-03-11")}),
+        (("Jordan", 1445, 9), record_id("Jordan", "Amman", 1445, 9),
+         {"Country": (None, "Jordan"), "City": (None, "Amman"), "HijriYear": (None, "1445"),
+          "HijriMonth": (None, "9"), "GregorianStartDate": (None, "2024-03-11"),
+          "RecordId": (None, record_id("Jordan", "Amman", 1445, 9))}),
+    ]
+    assert store.save()
+    assert store.diff() == [] and not store.dirty
+
+    reloaded = MasterStore(path)
+    assert len(reloaded) == len(ROWS) + 1
+    assert reloaded.get(("Jordan", 1445, 9))["City"] == "Amman"
+    assert reloaded.get_by_id("b2")["GregorianStartDate"] == "2024-03-11"
+
+
+def test_key_columns_cannot_be_updated(master):
+    store = MasterStore(master[0])
+    with pytest.raises(ValueError):
+        store.update(("Egypt", 1445, 9), {"HijriMonth": "10"})
+    with pytest.raises(KeyError):
+        store.update(("Egypt", 1445, 9), {"NoSuchColumn": "x"})
+
+
+def test_failed_save_leaves_the_file_intact(master, monkeypatch):
+    path, before, _ = master
+    store = MasterStore(path)
+    store.update(("Egypt", 1445, 9), {"GregorianStartDate": "2024-03-11"})
+
+    def fail(self, rows):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(csv.DictWriter, "writerows", fail)
+    with pytest.raises(OSError):
+        store.save()
+    assert path.read_bytes() == before
+    assert store.dirty
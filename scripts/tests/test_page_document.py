@@ -0,0 +1,62 @@
+"""
+Golden check for page_document.py: every installed parser backend must give
+the same text and tables as html.parser, on the synthetic corpus (every
+layout, see synthetic_corpus.py) and, with --page-archive, on a local page
+archive.
+
+Usage:
+  python -m pytest scripts/tests/test_page_document.py [--page-archive DIR]
+"""
+
+from pathlib import Path
+
+import pytest
+
+from page_archive import MONTH_CODES, PageArchive
+from page_document import (BACKEND_ENV, REFERENCE_BACKEND, PageDocument,
+                           available_backends, backend_mismatches, resolve_backend)
+from synthetic_corpus import synthetic_pages
+
+OTHER_BACKENDS = [b for b in available_backends() if b != REFERENCE_BACKEND]
+
+SCRIPT_STYLE = ("<head><style>p {color: red}</style></head><body><p>Seen</p>"
+                "<script>var reported = 'Not Seen';</script><p>Not Seen</p></body>")
+
+
+@pytest.fixture(scope="module")
+def synthetic():
+    return [(f"{year}{MONTH_CODES[month - 1]}", html)
+            for year, month, html in synthetic_pages()]
+
+
+@pytest.mark.parametrize("backend", OTHER_BACKENDS)
+def test_synthetic_pages_match_reference(backend, synthetic):
+    assert backend_mismatches(synthetic, [backend])[backend] == []
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_script_and_style_are_dropped(backend):
+    doc = PageDocument(SCRIPT_STYLE, backend)
+    assert doc.lines == ["Seen", "Not Seen"]
+
+
+@pytest.mark.parametrize("backend", OTHER_BACKENDS)
+def test_archive_pages_match_reference(backend, request):
+    archive_dir = request.config.getoption("--page-archive")
+    if archive_dir is None:
+        pytest.skip("no --page-archive given")
+    with PageArchive(Path(archive_dir)) as archive:
+        if not archive.pages:
+            pytest.skip(f"{archive_dir} holds no pages")
+        pages = [(key, archive.get(int(key[:4]), key[4:])) for key in sorted(archive.pages)]
+    assert backend_mismatches(pages, [backend])[backend] == []
+
+
+def test_resolve_backend(monkeypatch):
+    monkeypatch.delenv(BACKEND_ENV, raising=False)
+    assert resolve_backend() == available_backends()[0]
+    monkeypatch.setenv(BACKEND_ENV, REFERENCE_BACKEND)
+    assert resolve_backend() == REFERENCE_BACKEND
+    assert resolve_backend("auto") == available_backends()[0]
+    with pytest.raises(ValueError, match="not installed"):
+        resolve_backend("html5lib")
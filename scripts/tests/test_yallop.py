@@ -0,0 +1,37 @@
+"""
+The NumPy Yallop engine against the TS-engine fixture
+(packages/calendar-engine/test/fixtures/yallop_q_test.json), with the same
+tolerances and zone rule as yallopFixtures.test.ts, so the two engines
+cannot drift apart without a failing test on either side.
+
+Usage:
+  python -m pytest scripts/tests/test_yallop.py
+"""
+
+import json
+
+import pytest
+
+from yallop import FIXTURE, TOLERANCES, ZONE_LIMITS, check_fixture
+
+
+@pytest.fixture(scope="module")
+def worst():
+    return check_fixture()
+
+
+def test_fixture_rules_match_the_engine():
+    fixture = json.loads(FIXTURE.read_text(encoding="utf-8"))
+    assert fixture["tolerances"] == {field: tol for field, tol in TOLERANCES.values()}
+    assert fixture["zoneLimits"] == dict(ZONE_LIMITS)
+    assert len(fixture["cases"]) > 0
+
+
+@pytest.mark.parametrize("key", TOLERANCES)
+def test_within_tolerance(worst, key):
+    field, tol = TOLERANCES[key]
+    assert worst[key] <= tol, f"{field}: max |diff| {worst[key]:.5f} > {tol}"
+
+
+def test_zones_agree_away_from_limits(worst):
+    assert worst["zone"] == 0
@@ -0,0 +1,307 @@
+"""
+tracing.py
+
+Opt-in timing instrumentation for the scraping scripts
+(scrape_moonsighting_all.py, extract_text_from_html.py,
+extract_table_from_text.py): where the time goes per page, by stage
+(read, parse, text flattening, each extraction strategy) and by regex
+family.
+
+Off by default.  While off, span() returns a shared no-op context manager,
+page() returns at once and no pattern is wrapped, so normal runs pay next
+to nothing.  The scripts turn it on with --trace:
+
+  span(name)                timed block inside the current page
+  page(key, layout=None)    start a page (closes the previous one); spans
+                            and regex time that follow are charged to it
+  end_page()                close it
+  time_patterns(namespace, families)
+                            wrap the module-level compiled regexes named in
+                            `families` so their match/search/finditer/...
+                            time is summed per family and page
+  print_summary(path, top)  write the Chrome trace JSON (chrome://tracing,
+                            Perfetto) and print the slowest pages with
+                            their breakdown, totals per layout and per
+                            span/family
+
+Every page becomes one "X" event (cat "page") whose args hold its layout
+and its per-span and per-family totals in ms; spans are nested "X" events.
+Work done in worker processes is traced there and shipped back with the
+result (collect_call).
+
+Usage:
+  python scripts/scrape_moonsighting_all.py --no-cache --trace [PATH] [--trace-top 15]
+  python scripts/extract_text_from_html.py --trace [PATH]
+  python scripts/extract_table_from_text.py --trace [PATH]
+  python scripts/tracing.py summary TRACE.json [--top 15]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+DEFAULT_TOP = 10
+
+_NULL_SPAN = nullcontext()
+
+
+def _now_us() -> float:
+    return time.perf_counter_ns() / 1000.0
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'start')
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.close_span(self.name, self.start, _now_us())
+        return False
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.current = None     # open page: {'key', 'layout', 'start', 'spans', 'regex'}
+
+    def enable(self):
+        self.enabled = True
+
+    # -- recording ----------------------------------------------------------
+    def _event(self, name, cat, start, end, args=None):
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': round(start, 1),
+                 'dur': round(end - start, 1), 'pid': os.getpid(),
+                 'tid': threading.get_ident() & 0xffff}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def span(self, name: str):
+        return _Span(self, name) if self.enabled else _NULL_SPAN
+
+    def close_span(self, name, start, end):
+        self._event(name, 'span', start, end)
+        if self.current is not None:
+            self.current['spans'][name] += (end - start) / 1000.0
+
+    def page(self, key: str, layout: str = None):
+        if not self.enabled:
+            return
+        self.end_page()
+        self.current = {'key': key, 'layout': layout, 'start': _now_us(),
+                        'spans': defaultdict(float), 'regex': defaultdict(float)}
+
+    def set_layout(self, layout: str):
+        if self.current is not None:
+            self.current['layout'] = layout
+
+    def end_page(self):
+        page, self.current = self.current, None
+        if page is None:
+            return
+        rounded = lambda d: {k: round(v, 3) for k, v in sorted(d.items())}
+        self._event(page['key'], 'page', page['start'], _now_us(),
+                    {'layout': page['layout'], 'spans': rounded(page['spans']),
+                     'regex': rounded(page['regex'])})
+
+    def add_regex(self, family: str, ns: int):
+        if self.current is not None:
+            self.current['regex'][family] += ns / 1e6
+
+    def drain(self) -> list[dict]:
+        self.end_page()
+        events, self.events = self.events, []
+        return events
+
+
+TRACER = Tracer()
+span = TRACER.span
+page = TRACER.page
+end_page = TRACER.end_page
+set_layout = TRACER.set_layout
+
+
+def enabled() -> bool:
+    return TRACER.enabled
+
+
+def enable():
+    TRACER.enable()
+
+
+def collect_call(fn, arg):
+    """fn(arg) in a worker process with tracing on; returns (result, events)
+    so the parent can merge the worker's events (see merge_events)."""
+    TRACER.enable()
+    result = fn(arg)
+    return result, TRACER.drain()
+
+
+def merge_events(events: list[dict]):
+    TRACER.events.extend(events)
+
+
+# ---------------------------------------------------------------------------
+# Regex timing
+# ---------------------------------------------------------------------------
+class TimedPattern:
+    """A compiled pattern whose matching time goes to a family of the
+    current page.  Everything else is delegated to the pattern."""
+
+    def __init__(self, pattern: re.Pattern, family: str, tracer: Tracer = TRACER):
+        self.pattern = pattern
+        self.family = family
+        self.tracer = tracer
+
+    def __getattr__(self, name):
+        return getattr(self.pattern, name)
+
+    def _timed(method):
+        def call(self, *args, **kwargs):
+            t0 = time.perf_counter_ns()
+            try:
+                return getattr(self.pattern, method)(*args, **kwargs)
+            finally:
+                self.tracer.add_regex(self.family, time.perf_counter_ns() - t0)
+        call.__name__ = method
+        return call
+
+    match = _timed('match')
+    search = _timed('search')
+    fullmatch = _timed('fullmatch')
+    findall = _timed('findall')
+    split = _timed('split')
+    sub = _timed('sub')
+    subn = _timed('subn')
+    del _timed
+
+    def finditer(self, *args, **kwargs):
+        it = self.pattern.finditer(*args, **kwargs)
+        while True:
+            t0 = time.perf_counter_ns()
+            m = next(it, None)
+            self.tracer.add_regex(self.family, time.perf_counter_ns() - t0)
+            if m is None:
+                return
+            yield m
+
+
+def time_patterns(namespace: dict, families: dict):
+    """Replace the compiled patterns named in families ({family: (global
+    name, ...)}) in a module namespace (its globals()) with TimedPatterns."""
+    for family, names in families.items():
+        for name in names:
+            pattern = namespace[name]
+            if isinstance(pattern, re.Pattern):
+                namespace[name] = TimedPattern(pattern, family)
+
+
+# ---------------------------------------------------------------------------
+# Summary
+# ---------------------------------------------------------------------------
+def page_events(events: list[dict]) -> list[dict]:
+    """Page events, with the events of one page key merged (a page read in
+    the parent and scanned in a worker is traced as two)."""
+    merged = {}
+    for e in events:
+        if e.get('cat') != 'page':
+            continue
+        args = e.get('args', {})
+        m = merged.setdefault(e['name'], {'name': e['name'], 'dur': 0.0, 'args': {
+            'layout': None, 'spans': defaultdict(float), 'regex': defaultdict(float)}})
+        m['dur'] += e['dur']
+        m['args']['layout'] = args.get('layout') or m['args']['layout']
+        for kind in ('spans', 'regex'):
+            for k, v in args.get(kind, {}).items():
+                m['args'][kind][k] += v
+    return list(merged.values())
+
+
+def summarize(events: list[dict], top: int = DEFAULT_TOP) -> list[str]:
+    pages = sorted(page_events(events), key=lambda e: e['dur'], reverse=True)
+    if not pages:
+        return ["No pages traced."]
+    lines = [f"Slowest {min(top, len(pages))} of {len(pages)} pages:"]
+    for e in pages[:top]:
+        args = e['args']
+        parts = {**args['spans'], **{f"re:{k}": v for k, v in args['regex'].items()}}
+        detail = '  '.join(f"{k} {v:.1f}" for k, v in sorted(parts.items(), key=lambda kv: -kv[1])[:6])
+        lines.append(f"  {e['name']:12s} {args['layout'] or '-':14s} "
+                     f"{e['dur'] / 1000:8.1f} ms   {detail}")
+
+    by_layout = defaultdict(list)
+    for e in pages:
+        by_layout[e['args']['layout'] or '-'].append(e['dur'] / 1000)
+    lines.append("\nBy layout:            pages    total ms   mean ms")
+    for layout, durs in sorted(by_layout.items(), key=lambda kv: -sum(kv[1])):
+        lines.append(f"  {layout:18s} {len(durs):7d} {sum(durs):11.1f} {sum(durs) / len(durs):9.2f}")
+
+    totals = defaultdict(float)
+    for e in pages:
+        for k, v in e['args']['spans'].items():
+            totals[k] += v
+        for k, v in e['args']['regex'].items():
+            totals[f"re:{k}"] += v
+    lines.append("\nTotals over all pages (ms; re:* = regex families, inside the spans):")
+    for name, ms in sorted(totals.items(), key=lambda kv: -kv[1]):
+        lines.append(f"  {name:24s} {ms:10.1f}")
+    return lines
+
+
+def write_trace(path: Path, events: list[dict]):
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'}),
+                   encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def print_summary(path: Path, top: int = DEFAULT_TOP):
+    """Write everything traced so far to `path` and print the summary."""
+    events = TRACER.drain()
+    write_trace(path, events)
+    print(f"\nTrace written to {path} ({len(events)} events)")
+    print('\n'.join(summarize(events, top)))
+
+
+def add_arguments(ap: argparse.ArgumentParser, default_path: Path):
+    """--trace [PATH] and --trace-top N, as used by the scraping scripts."""
+    ap.add_argument("--trace", type=Path, nargs="?", const=default_path, metavar="PATH",
+                    help=f"record a Chrome trace (default path {default_path.name})")
+    ap.add_argument("--trace-top", type=int, default=DEFAULT_TOP, metavar="N",
+                    help=f"slowest pages listed after a traced run (default {DEFAULT_TOP})")
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Summaries of scraper traces.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    summ = sub.add_parser("summary", help="slowest pages of a saved trace")
+    summ.add_argument("trace", type=Path)
+    summ.add_argument("--top", type=int, default=DEFAULT_TOP)
+    args = ap.parse_args(argv)
+
+    trace = json.loads(args.trace.read_text(encoding='utf-8'))
+    print('\n'.join(summarize(trace['traceEvents'], args.top)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
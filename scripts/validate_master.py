@@ -0,0 +1,192 @@
+"""
+validate_master.py
+
+Plausibility checks for the GregorianStartDate of every master row,
+against astronomy and the neighbouring months, vectorized over the whole
+CSV with NumPy.
+
+Checks (ConflictType):
+  BeforeConjunction   day 1 is on or before the UTC day of the month's
+                      conjunction: the crescent cannot have been seen yet
+  LateStart           day 1 is more than LATE_START_DAYS after the
+                      conjunction day (a missed month, or the wrong one)
+  MonthLength         the next month of the same country starts other than
+                      29 or 30 days later (reported on the earlier month)
+
+Conjunction days come from the lunation index (lunation_index.py; build it
+first with `lunation_index.py build`).  Every violation is written to the
+violations report and to
+docs/data-collection/conflicting_declarations_template.csv as a conflict
+row (ResolutionStatus Open, PreferredRecordId = the master row).  Conflict
+rows of these types from an earlier run are replaced; other rows in the
+file are kept.  With --db the SQLite copy's conflicts table is updated too.
+
+Usage:
+  python scripts/validate_master.py [--report scripts/master_violations.csv]
+                                    [--no-conflicts] [--db [PATH]]
+"""
+
+import argparse
+import csv
+import hashlib
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from lunation_index import LunationIndex, jdns
+from master_db import CONFLICT_COLUMNS, CONFLICTS_CSV, DB_PATH, MasterDB
+from master_store import MASTER_CSV
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+REPORT_CSV = SCRIPTS_DIR / "master_violations.csv"
+
+LATE_START_DAYS = 3
+MONTH_LENGTHS = (29, 30)
+CHECKS = ('BeforeConjunction', 'LateStart', 'MonthLength')
+
+REPORT_COLUMNS = ['Country', 'City', 'HijriYear', 'HijriMonth', 'GregorianStartDate',
+                  'Check', 'Detail', 'RecordId']
+
+
+def load_master(path: Path = MASTER_CSV) -> tuple[list[dict], dict]:
+    """Master rows and their columns as arrays: country codes, Hijri month
+    index (12 * (year - 1) + month - 1) and start JDN (-1 if blank)."""
+    with open(path, encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    countries, codes = np.unique([r['Country'] for r in rows], return_inverse=True)
+    years = np.array([r['HijriYear'] for r in rows], dtype=np.int64)
+    months = np.array([r['HijriMonth'] for r in rows], dtype=np.int64)
+    starts = np.array([r['GregorianStartDate'].strip() or 'NaT' for r in rows],
+                      dtype='datetime64[D]')
+    has_start = ~np.isnat(starts)
+    start_jdn = np.where(has_start, jdns(np.where(has_start, starts, np.datetime64(0, 'D'))), -1)
+    return rows, {'country': codes, 'countries': countries,
+                  'month_index': 12 * (years - 1) + months - 1, 'start': start_jdn}
+
+
+def find_violations(cols: dict, index: LunationIndex) -> list[tuple[int, str, str]]:
+    """(row number, check, detail) for every violation, in row order."""
+    start, month_index = cols['start'], cols['month_index']
+    has_start = start >= 0
+    conj = np.asarray(index.conjunction)[month_index]
+    age = start - conj
+    found = []
+
+    for i in np.flatnonzero(has_start & (age <= 0)):
+        found.append((i, 'BeforeConjunction',
+                      f"conjunction day is {age[i] * -1} day(s) after the start"
+                      if age[i] < 0 else "starts on the conjunction day"))
+    for i in np.flatnonzero(has_start & (age > LATE_START_DAYS)):
+        found.append((i, 'LateStart', f"starts {age[i]} days after the conjunction day"))
+
+    # Neighbouring months: sort by (country, month index) and compare each
+    # row with the next one when that is the following month
+    order = np.lexsort((month_index, cols['country']))
+    cur, nxt = order[:-1], order[1:]
+    adjacent = ((cols['country'][cur] == cols['country'][nxt])
+                & (month_index[nxt] == month_index[cur] + 1)
+                & has_start[cur] & has_start[nxt])
+    length = start[nxt] - start[cur]
+    bad = adjacent & ~np.isin(length, MONTH_LENGTHS)
+    for i, n in zip(cur[bad], length[bad]):
+        found.append((i, 'MonthLength', f"{n} days long (next month starts {n} days later)"))
+
+    found.sort(key=lambda v: (v[0], CHECKS.index(v[1])))
+    return found
+
+
+def conflict_rows(rows: list[dict], violations) -> list[dict]:
+    out = []
+    for i, check, detail in violations:
+        row = rows[i]
+        cid = hashlib.sha1(f"{row['RecordId']}|{check}".encode('utf-8')).hexdigest()[:16]
+        out.append({
+            'ConflictId': cid,
+            **{c: row.get(c, '') for c in ('Country', 'City', 'HijriYear', 'HijriMonth',
+                                           'Authority', 'Method', 'GregorianStartDate',
+                                           'SourceURL', 'ConfidenceScore')},
+            'ConflictType': check,
+            'ResolutionStatus': 'Open',
+            'PreferredRecordId': row['RecordId'],
+            'Notes': detail,
+        })
+    return out
+
+
+def write_csv(path: Path, columns, rows, lineterminator='\n'):
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, lineterminator=lineterminator)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, path)
+
+
+def update_conflicts_csv(path: Path, conflicts: list[dict]) -> int:
+    """Replace this validator's rows in the conflicts CSV; keep the rest."""
+    with open(path, encoding='utf-8', newline='') as f:
+        first = f.readline()
+        f.seek(0)
+        kept = [r for r in csv.DictReader(f) if r['ConflictType'] not in CHECKS]
+    lineterminator = '\r\n' if first.endswith('\r\n') else '\n'
+    write_csv(path, CONFLICT_COLUMNS, kept + conflicts, lineterminator)
+    return len(kept)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Plausibility checks for master start dates.")
+    ap.add_argument("--csv", type=Path, default=MASTER_CSV)
+    ap.add_argument("--report", type=Path, default=REPORT_CSV)
+    ap.add_argument("--conflicts", type=Path, default=CONFLICTS_CSV)
+    ap.add_argument("--no-conflicts", action="store_true",
+                    help="only write the report, leave the conflicts CSV alone")
+    ap.add_argument("--db", type=Path, nargs="?", const=DB_PATH,
+                    help="also replace these conflict types in the SQLite copy")
+    args = ap.parse_args(argv)
+
+    try:
+        index = LunationIndex()
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 1
+    t0 = time.perf_counter()
+    rows, cols = load_master(args.csv)
+    violations = find_violations(cols, index)
+    elapsed = time.perf_counter() - t0
+
+    checked = int(np.sum(cols['start'] >= 0))
+    print(f"Checked {checked} start dates in {len(rows)} rows in {elapsed * 1000:.0f} ms")
+    counts = Counter(check for _, check, _ in violations)
+    for check in CHECKS:
+        print(f"  {check:18s} {counts[check]}")
+
+    write_csv(args.report, REPORT_COLUMNS, [
+        {'Country': rows[i]['Country'], 'City': rows[i]['City'],
+         'HijriYear': rows[i]['HijriYear'], 'HijriMonth': rows[i]['HijriMonth'],
+         'GregorianStartDate': rows[i]['GregorianStartDate'], 'Check': check,
+         'Detail': detail, 'RecordId': rows[i]['RecordId']}
+        for i, check, detail in violations])
+    print(f"Report: {args.report}")
+
+    conflicts = conflict_rows(rows, violations)
+    if not args.no_conflicts:
+        kept = update_conflicts_csv(args.conflicts, conflicts)
+        print(f"Conflicts: {args.conflicts} ({len(conflicts)} validator rows, {kept} others kept)")
+    if args.db:
+        with MasterDB(args.db) as db:
+            for check in CHECKS:
+                db.replace_conflicts(check, conflicts)
+        print(f"SQLite copy updated: {args.db}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
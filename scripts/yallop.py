@@ -0,0 +1,394 @@
+"""
+yallop.py
+
+Batch Yallop (1997) q-test: the same computation as computeYallopQTest in
+packages/calendar-engine/src/yallop.ts, evaluated with NumPy over arrays of
+(evening date, latitude, longitude) instead of one observer at a time.
+
+For each row: sunset after 00:00 UTC of the date; moonset (next one if the
+Moon is still up at sunset, else the previous one) and lag; best time =
+sunset + 4/9 lag; then ARCV, ARCL, W', q and the A-F zone at the best time,
+plus moon age and illumination.  Positions come from ephemeris.py.
+
+Agreement with the TS engine is checked against a shared fixture,
+packages/calendar-engine/test/fixtures/yallop_q_test.json, which the vitest
+suite also checks computeYallopQTest against.  The fixture is regenerated
+with the Python port of astronomy-engine (pip install astronomy-engine), the
+library the TS engine uses, following yallop.ts step by step.  TOLERANCES
+below is what `check` enforces; they hold for crescent evenings (W' of a
+few arcminutes; q is steeper in W' near full moon).
+
+  result = yallop_q_test(dates, lats, lons)   # dict of arrays, see RESULT_KEYS
+
+Usage:
+  python scripts/yallop.py score [--output scripts/master_yallop_scores.csv]
+  python scripts/yallop.py check
+  python scripts/yallop.py fixtures        # needs astronomy-engine
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+import ephemeris as eph
+from master_store import MASTER_CSV, ROOT, MasterStore
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+FIXTURE = ROOT / 'packages' / 'calendar-engine' / 'test' / 'fixtures' / 'yallop_q_test.json'
+SCORES_CSV = SCRIPTS_DIR / 'master_yallop_scores.csv'
+
+SD_FACTOR = 0.27245
+EARTH_RADIUS_KM = 6378.14            # yallop.ts parallax radius
+ZONE_LIMITS = [('A', 0.216), ('B', -0.014), ('C', -0.160), ('D', -0.232), ('E', -0.293)]
+
+RESULT_KEYS = ['q', 'zone', 'arcv', 'arcl', 'width', 'lag', 'sunset', 'best_time',
+               'moon_alt', 'sun_alt', 'moon_age', 'illumination']
+
+# result key -> (fixture / YallopResult field, max abs difference)
+TOLERANCES = {
+    'q': ('q', 0.005),
+    'arcv': ('arcvDeg', 0.02),
+    'arcl': ('arclDeg', 0.02),
+    'width': ('crescentWidthArcmin', 0.01),
+    'lag': ('lagMinutes', 0.25),
+    'sunset': ('sunsetUtcIso', 5.0),         # seconds
+    'best_time': ('bestTimeUtcIso', 5.0),     # seconds
+    'moon_alt': ('moonAltitudeDeg', 0.02),
+    'sun_alt': ('sunAltitudeDeg', 0.02),
+    'moon_age': ('moonAgeHours', 0.05),
+    'illumination': ('moonIlluminationFraction', 0.0005),
+}
+
+SCORE_COLUMNS = ['RecordId', 'Country', 'City', 'HijriYear', 'HijriMonth',
+                 'GregorianStartDate', 'DateSource', 'Evening', 'Q', 'Zone',
+                 'ARCV', 'ARCL', 'Width', 'LagMinutes', 'MoonAgeHours']
+
+# Master CSV country -> (latitude, longitude) of its reference city, as in
+# apps/web/src/data/countries.ts
+MASTER_LOCATIONS = {
+    'Saudi Arabia': (21.4225, 39.8262),     # Makkah
+    'Egypt': (30.0444, 31.2357),            # Cairo
+    'Türkiye': (39.9334, 32.8597),          # Ankara
+    'Palestine': (31.7683, 35.2137),        # Jerusalem
+    'Jordan': (31.9454, 35.9284),           # Amman
+    'Morocco': (34.0209, -6.8416),          # Rabat
+    'Libya': (32.8872, 13.1913),            # Tripoli
+    'South Africa': (-25.7479, 28.2293),    # Pretoria
+    'Nigeria': (9.0579, 7.4951),            # Abuja
+    'Malaysia': (3.1390, 101.6869),         # Kuala Lumpur
+    'Pakistan': (33.6844, 73.0479),         # Islamabad
+    'Indonesia': (-6.2088, 106.8456),       # Jakarta
+    'United States': (38.9072, -77.0369),   # Washington DC
+    'Canada': (45.4215, -75.6972),          # Ottawa
+    'Australia': (-35.2809, 149.1300),      # Canberra
+}
+
+
+# ---------------------------------------------------------------------------
+# q-test
+# ---------------------------------------------------------------------------
+def classify_zones(q) -> np.ndarray:
+    """Yallop zone letter per q ('' where q is NaN)."""
+    q = np.asarray(q, dtype=np.float64)
+    zones = np.select([q > limit for _, limit in ZONE_LIMITS],
+                      [zone for zone, _ in ZONE_LIMITS], default='F')
+    return np.where(np.isnan(q), '', zones)
+
+
+def best_time_geometry(dates, lats, lons, table=None) -> dict:
+    """Steps 1-8 of computeYallopQTest (shared with the Odeh V-test):
+    sunset, moonset/lag, best time and the crescent geometry there.
+    Returns float arrays 'sunset' and 'best' (ut), 'lag', 'arcv', 'arcl',
+    'width', 'moon_alt', 'sun_alt', and 'snap', the Snapshot at the best
+    time.  `table` is an optional ephemeris.GeocentricTable covering
+    00:00 UTC of the dates -2 to +4 days.
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    dates, lats, lons = np.broadcast_arrays(dates, np.asarray(lats, dtype=np.float64),
+                                            np.asarray(lons, dtype=np.float64))
+    with np.errstate(invalid='ignore'):
+        start = eph.ut_from_datetime64(dates)
+        sunset = eph.search_set('sun', start, lats, lons, 2.0, table=table)
+
+        at_sunset = eph.Snapshot(sunset, lats, lons, table)
+        moon_up = at_sunset.moon_alt + eph.refraction(at_sunset.moon_alt) > 0
+        next_set = eph.search_set('moon', sunset, lats, lons, 2.0, table=table)
+        prev_set = eph.search_set('moon', sunset, lats, lons, -2.0, table=table)
+        moonset = np.where(moon_up,
+                           np.where(np.isnan(next_set), prev_set, next_set),
+                           np.where(np.isnan(prev_set), next_set, prev_set))
+        lag = np.where(np.isnan(moonset), 0.0, (moonset - sunset) * 1440.0)
+        lag = np.where(np.isnan(sunset), np.nan, lag)
+        best = sunset + 4.0 / 9.0 * lag / 1440.0
+
+        snap = eph.Snapshot(best, lats, lons, table)
+        moon_alt = snap.moon_alt + eph.refraction(snap.moon_alt)
+        sun_alt = snap.sun_alt + eph.refraction(snap.sun_alt)
+        arcl = snap.elongation
+        parallax = np.arcsin(EARTH_RADIUS_KM / snap.moon_dist)
+        sd = SD_FACTOR * parallax / eph.DEG
+        sd_topo = sd * (1 + np.sin(moon_alt * eph.DEG) * np.sin(parallax))
+        width = sd_topo * (1 - np.cos(arcl * eph.DEG)) * 60.0
+    return {'sunset': sunset, 'best': best, 'lag': lag, 'arcv': moon_alt - sun_alt,
+            'arcl': arcl, 'width': width, 'moon_alt': moon_alt, 'sun_alt': sun_alt,
+            'snap': snap}
+
+
+def q_value(arcv, width):
+    """Yallop q from ARCV (degrees) and W' (arcminutes)."""
+    return (arcv - (11.8371 - 6.3226 * width + 0.7319 * width ** 2
+                    - 0.1018 * width ** 3)) / 10.0
+
+
+def yallop_q_test(dates, lats, lons) -> dict:
+    """q-test for the evening of each date (UTC calendar day) at each
+    observer; inputs broadcast together.  Returns RESULT_KEYS as arrays:
+    angles in degrees, width in arcminutes, lag in minutes, moon_age in
+    hours, sunset/best_time as datetime64[ms].  Rows without a sunset in
+    the two days after 00:00 UTC are NaN with zone ''.
+    """
+    g = best_time_geometry(dates, lats, lons)
+    with np.errstate(invalid='ignore'):
+        w = g['width']
+        q = q_value(g['arcv'], w)
+        moon_age = (g['best'] - eph.previous_new_moon(g['best'])) * 24.0
+    return {
+        'q': q,
+        'zone': classify_zones(q),
+        'arcv': g['arcv'],
+        'arcl': g['arcl'],
+        'width': w,
+        'lag': g['lag'],
+        'sunset': eph.datetime64_from_ut(g['sunset']).astype('datetime64[ms]'),
+        'best_time': eph.datetime64_from_ut(g['best']).astype('datetime64[ms]'),
+        'moon_alt': g['moon_alt'],
+        'sun_alt': g['sun_alt'],
+        'moon_age': moon_age,
+        'illumination': g['snap'].illumination,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Master rows
+# ---------------------------------------------------------------------------
+ISLAMIC_EPOCH_JDN = 1948439      # civil.ts
+UNIX_EPOCH_JDN = 2440588
+
+
+def civil_month_start(hijri_years, hijri_months) -> np.ndarray:
+    """Day 1 of each Hijri month in the tabular (civil) calendar, as
+    datetime64[D]; the arithmetic of civil.ts hijriCivilToJdn."""
+    y = np.asarray(hijri_years, dtype=np.int64)
+    m = np.asarray(hijri_months, dtype=np.int64)
+    jdn = ((59 * (m - 1) + 1) // 2 + (y - 1) * 354 + (3 + 11 * y) // 30
+           + ISLAMIC_EPOCH_JDN)
+    return np.datetime64('1970-01-01', 'D') + (jdn - UNIX_EPOCH_JDN).astype('timedelta64[D]')
+
+
+def master_evenings(rows):
+    """(evening dates, lats, lons, date sources) for master rows: the
+    evening before GregorianStartDate, or before the civil-calendar start
+    where the row has no date yet."""
+    rows = list(rows)
+    years = np.array([int(r['HijriYear']) for r in rows])
+    months = np.array([int(r['HijriMonth']) for r in rows])
+    recorded = np.array([r['GregorianStartDate'].strip() or 'NaT' for r in rows],
+                        dtype='datetime64[D]')
+    has_date = ~np.isnat(recorded)
+    starts = np.where(has_date, recorded, civil_month_start(years, months))
+    lats, lons = np.array([MASTER_LOCATIONS[r['Country']] for r in rows], dtype=np.float64).T
+    sources = np.where(has_date, 'master', 'civil')
+    return starts - np.timedelta64(1, 'D'), lats, lons, sources
+
+
+def write_scores(path: Path, rows, evenings, sources, result) -> int:
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(SCORE_COLUMNS)
+        for i, row in enumerate(rows):
+            writer.writerow([
+                row['RecordId'], row['Country'], row['City'], row['HijriYear'],
+                row['HijriMonth'], row['GregorianStartDate'], sources[i], evenings[i],
+                f"{result['q'][i]:.4f}", result['zone'][i],
+                f"{result['arcv'][i]:.3f}", f"{result['arcl'][i]:.3f}",
+                f"{result['width'][i]:.4f}", f"{result['lag'][i]:.1f}",
+                f"{result['moon_age'][i]:.2f}",
+            ])
+    os.replace(tmp, path)
+    return len(rows)
+
+
+# ---------------------------------------------------------------------------
+# Fixture (astronomy-engine reference)
+# ---------------------------------------------------------------------------
+FIXTURE_LUNATIONS = ['1981-06-01', '1995-02-01', '2008-09-01', '2024-03-01', '2031-11-01']
+
+
+def reference_q_test(day: str, lat: float, lon: float) -> dict | None:
+    """computeYallopQTest for one observer, line for line, with the Python
+    port of astronomy-engine.  Keys are the YallopResult fields."""
+    import math
+    from datetime import timezone
+
+    import astronomy as A
+
+    def iso(t):
+        return t.Utc().astimezone(timezone.utc).isoformat(timespec='milliseconds') \
+            .replace('+00:00', 'Z')
+
+    start = A.Time.Make(*map(int, day.split('-')), 0, 0, 0)
+    observer = A.Observer(lat, lon, 0)
+    sunset = A.SearchRiseSet(A.Body.Sun, observer, A.Direction.Set, start, 2)
+    if sunset is None:
+        return None
+    # yallop.ts works in JS Dates, i.e. whole milliseconds
+    sunset = A.Time(round(sunset.ut * 86400e3) / 86400e3)
+    moon_eq = A.Equator(A.Body.Moon, sunset, observer, True, True)
+    moon_hor = A.Horizon(sunset, observer, moon_eq.ra, moon_eq.dec, A.Refraction.Normal)
+    next_set = A.SearchRiseSet(A.Body.Moon, observer, A.Direction.Set, sunset, 2)
+    prev_set = A.SearchRiseSet(A.Body.Moon, observer, A.Direction.Set, sunset, -2)
+    moonset = (next_set or prev_set) if moon_hor.altitude > 0 else (prev_set or next_set)
+    lag = round((moonset.ut - sunset.ut) * 86400e3) / 60000 if moonset else 0.0
+    best = A.Time(round((sunset.ut * 86400e3 + 4 / 9 * lag * 60000)) / 86400e3)
+
+    sun_eq = A.Equator(A.Body.Sun, best, observer, True, True)
+    sun_hor = A.Horizon(best, observer, sun_eq.ra, sun_eq.dec, A.Refraction.Normal)
+    moon_eq = A.Equator(A.Body.Moon, best, observer, True, True)
+    moon_hor = A.Horizon(best, observer, moon_eq.ra, moon_eq.dec, A.Refraction.Normal)
+    arcv = moon_hor.altitude - sun_hor.altitude
+    arcl = A.AngleBetween(A.GeoVector(A.Body.Moon, best, True), A.GeoVector(A.Body.Sun, best, True))
+    parallax = math.asin(EARTH_RADIUS_KM / (moon_eq.dist * eph.AU_KM))
+    sd_topo = SD_FACTOR * math.degrees(parallax) * (
+        1 + math.sin(math.radians(moon_hor.altitude)) * math.sin(parallax))
+    width = sd_topo * (1 - math.cos(math.radians(arcl))) * 60
+    q = q_value(arcv, width)
+    conjunction = A.SearchMoonPhase(0, best, -40)
+    return {
+        'q': q,
+        'zone': str(classify_zones(q)),
+        'crescentWidthArcmin': width,
+        'arcvDeg': arcv,
+        'arclDeg': arcl,
+        'bestTimeUtcIso': iso(best),
+        'sunsetUtcIso': iso(sunset),
+        'lagMinutes': lag,
+        'moonAltitudeDeg': moon_hor.altitude,
+        'sunAltitudeDeg': sun_hor.altitude,
+        'moonAgeHours': (best.ut - conjunction.ut) * 24,
+        'moonIlluminationFraction': A.Illumination(A.Body.Moon, best).phase_fraction,
+    }
+
+
+def fixture_cases() -> list[tuple[str, float, float]]:
+    """The conjunction evening and the one after, for each FIXTURE_LUNATIONS
+    month, at every master reference city."""
+    import astronomy as A
+    cases = []
+    for month in FIXTURE_LUNATIONS:
+        new_moon = A.SearchMoonPhase(0, A.Time.Make(*map(int, month.split('-')), 0, 0, 0), 40)
+        day0 = np.datetime64(new_moon.Utc().date().isoformat(), 'D')
+        for day in (day0, day0 + 1):
+            for lat, lon in MASTER_LOCATIONS.values():
+                cases.append((str(day), lat, lon))
+    return cases
+
+
+def build_fixture(path: Path = FIXTURE) -> int:
+    cases = []
+    for day, lat, lon in fixture_cases():
+        result = reference_q_test(day, lat, lon)
+        if result is not None:
+            cases.append({'date': day, 'latitude': lat, 'longitude': lon, **result})
+    doc = {
+        'description': 'computeYallopQTest outputs (see scripts/yallop.py); zone must '
+                       'match unless q is within the q tolerance of a zone limit',
+        'tolerances': {field: tol for field, tol in TOLERANCES.values()},
+        'zoneLimits': dict(ZONE_LIMITS),
+        'cases': cases,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(doc, indent=1, ensure_ascii=False) + '\n', encoding='utf-8')
+    os.replace(tmp, path)
+    return len(cases)
+
+
+def check_fixture(path: Path = FIXTURE) -> dict:
+    """Max abs difference per TOLERANCES key between yallop_q_test and the
+    fixture, plus 'zone': the number of zone disagreements that are not
+    explained by the fixture's q sitting within the q tolerance of one of
+    its zoneLimits (the rule yallopFixtures.test.ts applies too)."""
+    fixture = json.loads(Path(path).read_text(encoding='utf-8'))
+    cases = fixture['cases']
+    result = yallop_q_test([c['date'] for c in cases], [c['latitude'] for c in cases],
+                           [c['longitude'] for c in cases])
+    worst = {}
+    for key, (field, _) in TOLERANCES.items():
+        if field.endswith('UtcIso'):
+            expected = np.array([c[field].rstrip('Z') for c in cases], dtype='datetime64[ms]')
+            diff = (result[key] - expected).astype(np.float64) / 1000.0
+        else:
+            diff = result[key] - np.array([c[field] for c in cases], dtype=np.float64)
+        worst[key] = float(np.max(np.abs(diff)))
+    q_ref = np.array([c['q'] for c in cases])
+    near_limit = np.min(np.abs(q_ref[:, None] - list(fixture['zoneLimits'].values())),
+                        axis=1) <= fixture['tolerances']['q']
+    zones_ref = np.array([c['zone'] for c in cases])
+    worst['zone'] = int(np.sum((result['zone'] != zones_ref) & ~near_limit))
+    return worst
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Batch Yallop q-test.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    score = sub.add_parser("score", help="score every master row in one call")
+    score.add_argument("--csv", type=Path, default=MASTER_CSV)
+    score.add_argument("--output", type=Path, default=SCORES_CSV)
+    for name, text in (("check", "compare against the TS-engine fixture"),
+                       ("fixtures", "regenerate the fixture with astronomy-engine")):
+        p = sub.add_parser(name, help=text)
+        p.add_argument("--fixture", type=Path, default=FIXTURE)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "score":
+        rows = MasterStore(args.csv).rows
+        evenings, lats, lons, sources = master_evenings(rows)
+        t0 = time.perf_counter()
+        result = yallop_q_test(evenings, lats, lons)
+        elapsed = time.perf_counter() - t0
+        write_scores(args.output, rows, evenings, sources, result)
+        zones, counts = np.unique(result['zone'], return_counts=True)
+        print(f"Scored {len(rows)} rows in {elapsed:.2f}s "
+              f"({np.sum(sources == 'master')} with a recorded start date)")
+        for zone, n in zip(zones, counts):
+            print(f"  zone {zone or '-'}: {n}")
+        print(f"Saved to {args.output}")
+    elif args.cmd == "fixtures":
+        n = build_fixture(args.fixture)
+        print(f"Wrote {n} cases to {args.fixture}")
+    elif args.cmd == "check":
+        worst = check_fixture(args.fixture)
+        failed = worst.pop('zone') > 0
+        for key, (field, tol) in TOLERANCES.items():
+            bad = worst[key] > tol
+            failed |= bad
+            print(f"  {field:26s} max |diff| {worst[key]:10.5f}  "
+                  f"(tolerance {tol}){'  FAIL' if bad else ''}")
+        print("FAIL" if failed else "OK")
+        return 1 if failed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())